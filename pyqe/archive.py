@@ -0,0 +1,189 @@
+""" On-disk format of parsed results
+
+Results of read_out_file, read_data_file and PWBase.run (nested
+dictionaries of numbers, strings, lists and numpy arrays) are saved
+as an uncompressed zip (npz) archive:
+
+ header.json    - {'format', 'version', 'results'} where results is
+                  the structure with each array replaced by
+                  {'__pyqe_array__': member, 'type': 'array'}
+ arrays/N.npy   - arrays in the npy format
+
+Flat lists (and tuples) of at least array_threshold numbers of one
+type (eigenvalues, occupations, ...) are stored as arrays too, with
+type 'list' ('tuple'), and are restored as lists on load. Other
+tuples load as lists. Dictionaries with keys starting
+with '__pyqe_' are stored as {'__pyqe_dict__': dictionary} so they
+are not mistaken for markers.
+
+Members are stored uncompressed so arrays are loaded by memory
+mapping the archive instead of reading (or re-parsing) it.
+
+save_results(qe.run(), "run.npz")
+results = load_results("run.npz")
+results['data-file']['charge-density']  # np.memmap
+"""
+import json
+import struct
+import zipfile
+
+import numpy as np
+
+
+archive_format = "pyqe-results"
+archive_version = 2
+
+# Numeric lists with at least this many elements are stored as arrays
+array_threshold = 16
+
+# Keys of the markers in header.json
+array_marker = "__pyqe_array__"
+dict_marker = "__pyqe_dict__"
+marker_prefix = "__pyqe_"
+
+
+def _list_array(value):
+    """Returns the array of the flat list (or tuple) value of numbers
+    of a single type (so that it restores exactly), else None
+
+    """
+    if len(value) < array_threshold:
+        return None
+    number_type = type(value[0])
+    if number_type not in (int, float, bool) or \
+       not all(type(item) is number_type for item in value):
+        return None
+    return np.array(value)
+
+
+def _encode(value, arrays):
+    """Returns the json structure of value appending its arrays to
+    arrays
+
+    """
+    if isinstance(value, dict):
+        encoded = {}
+        for key, item in value.items():
+            if not isinstance(key, str):
+                error_str = "key {0} of results must be a string"
+                raise Exception(error_str.format(repr(key)))
+            encoded[key] = _encode(item, arrays)
+        if any(key.startswith(marker_prefix) for key in encoded):
+            return {dict_marker: encoded}
+        return encoded
+
+    array, array_type = None, "array"
+    if isinstance(value, np.ndarray):
+        array = value
+    elif isinstance(value, (list, tuple)):
+        array, array_type = _list_array(value), type(value).__name__
+    if array is not None and not array.dtype.hasobject:
+        name = "arrays/{0}.npy".format(len(arrays))
+        arrays.append((name, array))
+        return {array_marker: name, "type": array_type}
+
+    if isinstance(value, np.ndarray):
+        return _encode(value.tolist(), arrays)
+    if isinstance(value, (list, tuple)):
+        return [_encode(item, arrays) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _decode(value, load):
+    if isinstance(value, dict):
+        if array_marker in value:
+            array = load(value[array_marker])
+            if value.get("type") == "list":
+                return array.tolist()
+            if value.get("type") == "tuple":
+                return tuple(array.tolist())
+            return array
+        if dict_marker in value:
+            value = value[dict_marker]
+        return {key: _decode(item, load) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item, load) for item in value]
+    return value
+
+
+def save_results(results, filename):
+    """Saves results (nested dictionaries) to the archive filename
+
+    """
+    arrays = []
+    header = {"format": archive_format,
+              "version": archive_version,
+              "results": _encode(results, arrays)}
+
+    with zipfile.ZipFile(filename, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        archive.writestr("header.json", json.dumps(header))
+        for name, array in arrays:
+            with archive.open(name, "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, array, allow_pickle=False)
+
+
+def _member_offset(f, info):
+    """Returns the offset in the archive of the data of member info
+    (after its local file header)
+
+    """
+    f.seek(info.header_offset)
+    local_header = f.read(30)
+    if local_header[:4] != b"PK\x03\x04":
+        error_str = "bad local header of {0}"
+        raise Exception(error_str.format(info.filename))
+    name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+    return info.header_offset + 30 + name_length + extra_length
+
+
+def _map_array(filename, f, info):
+    """Memory maps the npy member info of the archive filename
+
+    """
+    if info.compress_type != zipfile.ZIP_STORED:
+        error_str = "member {0} is compressed and cannot be memory mapped"
+        raise Exception(error_str.format(info.filename))
+
+    f.seek(_member_offset(f, info))
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+    if dtype.hasobject:
+        error_str = "member {0} holds python objects"
+        raise Exception(error_str.format(info.filename))
+    if not np.prod(shape, dtype=int):
+        return np.empty(shape, dtype=dtype)
+
+    return np.memmap(filename, dtype=dtype, mode="r", offset=f.tell(),
+                     shape=shape, order="F" if fortran_order else "C")
+
+
+def load_results(filename, mmap=True):
+    """Loads the results saved in the archive filename. Arrays are
+    read only memory maps of the archive (or read into memory if not
+    mmap).
+
+    """
+    with zipfile.ZipFile(filename, "r") as archive:
+        header = json.loads(archive.read("header.json").decode())
+        if header.get("format") != archive_format:
+            error_str = "{0} is not a pyqe results archive"
+            raise Exception(error_str.format(filename))
+        if header.get("version", 0) != archive_version:
+            error_str = "archive version {0} is not the supported version {1}"
+            raise Exception(error_str.format(header["version"], archive_version))
+
+        if mmap:
+            with open(filename, "rb") as f:
+                return _decode(header["results"],
+                               lambda name: _map_array(filename, f, archive.getinfo(name)))
+
+        def load(name):
+            with archive.open(name) as f:
+                return np.lib.format.read_array(f, allow_pickle=False)
+        return _decode(header["results"], load)
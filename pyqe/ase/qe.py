@@ -67,6 +67,9 @@ class QE(Calculator):
             (1, 1, 1) - gamma point
             (n1, n2, n3) - Morstead Packing
             [[k1, k2, k3] ... ] - List of kpoints
+            {'size': (n1, n2, n3), 'offset': (s1, s2, s3)} - Monkhorst Pack
+            {'density': <kpoints per 1/angstrom>, 'even': True/False} -
+                Monkhorst Pack grid from reciprocal lattice lengths
         prefix: (self.label is meaningless at moment)
             str - string to append to output files
         pseudo:
@@ -88,6 +91,9 @@ class QE(Calculator):
             automagically via ASE Atoms)
         debug:
             if True will print input and output QE files
+        launcher:
+            pyqe.launch.Launcher used to run pw.x (eg. executable
+            pyqe.fakepw.command() to run without Quantum Espresso)
 
         AUTOMATICALLY SET KEYPAIRS:
         Set so we can always extract stress and forces:
@@ -150,8 +156,8 @@ class QE(Calculator):
 
         # Setup Atom Positions
         self._pw.system.add_keypair(('nat', len(self.atoms)))
-        for atom in self.atoms:
-            self._pw.atomic_positions.add_atom_position(atom.symbol, atom.position, option='angstrom')
+        self._pw.atomic_positions.set_positions(
+            self.atoms.get_chemical_symbols(), self.atoms.positions, option='angstrom')
         
         # Setup Atom Psuedo Potentials
         from itertools import groupby
@@ -221,9 +227,8 @@ class QE(Calculator):
 
             if isinstance(kpts, dict):
                 if kpts.get('density'):
-                    from ase.calculator.calculator import kptdensity2monkhorstpack
-                    self._pw.k_points.from_list(kptdensity2monkhorstpack(
-                        kpts['density'], kpts.get('even', False)))
+                    self._pw.set_kpoint_density(
+                        kpts['density'], kpts.get('even', False), kpts.get('offset', [0, 0, 0]))
                 elif kpts.get('size'):
                     self._pw.k_points.from_monkhorst_pack(
                         kpts['size'], kpts.get('offset', [0, 0, 0]))
@@ -249,9 +254,10 @@ class QE(Calculator):
         """Preforms calculation.
 
         """
+        launcher = self.parameters.get('launcher')
         if self.parameters.get('debug'):
-            return self._pw.run(infile="in", outfile="out", errfile="err")
-        return self._pw.run()
+            return self._pw.run(infile="in", outfile="out", errfile="err", launcher=launcher)
+        return self._pw.run(launcher=launcher)
 
     def _calculation_required(self, atoms, property_name):
         # TODO need to do better check on results (using cached idea)
@@ -0,0 +1,302 @@
+""" Benchmarks of pyqe parsing and input generation
+
+Runs offline (no pw.x) on synthetic outputs and save directories
+(see pyqe.synthetic) and on trimmed pw.x outputs (pyqe/data), checks
+the results against the synthetic runs and the values printed in the
+pw.x outputs and reports the throughput and peak (python) memory of
+each benchmark.
+
+The synthetic charge-density.dat files are written in the layout
+read_charge_density_file assumes (not checked against pw.x files), so
+their cases measure parsing speed and self-consistency only.
+
+python -m pyqe.benchmark --size medium --repeat 5 --json results.json
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+
+sizes = {
+    "small": {"nat": 2, "ntyp": 1, "nks": 4, "nbnd": 8,
+              "nsteps": 3, "niter": 6, "nr": (24, 24, 24)},
+    "medium": {"nat": 16, "ntyp": 2, "nks": 20, "nbnd": 48,
+               "nsteps": 10, "niter": 10, "nr": (48, 48, 48)},
+    "large": {"nat": 64, "ntyp": 4, "nks": 60, "nbnd": 160,
+              "nsteps": 30, "niter": 12, "nr": (96, 96, 96)},
+}
+
+
+# Trimmed pw.x outputs in data_dir and values printed in them
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+reference_outputs = {
+    "si.scf.out": {
+        "header": {"number atoms/cell": 2,
+                   "number atom types": 1,
+                   "number kpoints": 10,
+                   "number of Kohn Sham states": 4,
+                   "kinetic-energy cutoff": 18.0,
+                   "number electrons": 8.0,
+                   "lattice parameter": 10.2,
+                   "FFT dimensions": [20, 20, 20]},
+        "total energy": -15.79747179,
+        "scf iterations": 5,
+        "wall time": 0.22,
+    },
+}
+
+
+def measure(function, repeat=5, nbytes=None):
+    """Times repeat calls of function() and traces the peak memory
+    of one call. Returns a dictionary:
+
+     - best, mean       : seconds per call
+     - calls per second : from the best call
+     - MB per second    : nbytes processed per second (if nbytes)
+     - peak memory      : bytes allocated by python during a call
+    """
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    result = {"best": best,
+              "mean": sum(times) / len(times),
+              "calls per second": 1.0 / best if best else float("inf"),
+              "peak memory": peak}
+    if nbytes:
+        result["MB per second"] = nbytes / best / 1e6 if best else float("inf")
+    return result
+
+
+def expect(name, value, expected, tolerance=1e-6):
+    """Raises an Exception if value is not expected (within
+    tolerance for numbers and arrays)
+
+    """
+    if isinstance(expected, (float, np.ndarray)):
+        equal = np.shape(value) == np.shape(expected) and \
+            np.allclose(value, expected, rtol=0.0, atol=tolerance)
+    else:
+        equal = value == expected
+    if not equal:
+        error_str = "benchmark check {0}: {1} != expected {2}"
+        raise Exception(error_str.format(name, value, expected))
+
+
+def check_output(run):
+    """Returns a function checking read_out_file results of the
+    SyntheticRun run
+
+    """
+    nsteps, calculation = run.nsteps, run.calculation
+    energy = run.energy - 0.01 * (nsteps - 1)
+    expected_header = {"number atoms/cell": run.nat,
+                       "number atom types": run.ntyp,
+                       "number kpoints": run.nks,
+                       "number of Kohn Sham states": run.nbnd,
+                       "kinetic-energy cutoff": run.ecutwfc,
+                       "number electrons": run.nelec}
+
+    def check(results):
+        for key, expected in expected_header.items():
+            expect(key, results["header"][key], expected)
+        if calculation == "bands":
+            return
+        expect("total energy", results["calculation"]["total energy"], energy)
+        if calculation != "scf":
+            expect("ionic steps", len(results["calculation"]["iterations"]), nsteps)
+    return check
+
+
+def check_reference_output(expected):
+    """Returns a function checking read_out_file results of a pw.x
+    output against the values printed in it (see reference_outputs)
+
+    """
+    def check(results):
+        for key, value in expected["header"].items():
+            expect(key, results["header"][key], value)
+        calculation = results["calculation"]
+        expect("total energy", calculation["total energy"], expected["total energy"])
+        expect("scf iterations", len(calculation["scf convergence"]["iteration"]),
+               expected["scf iterations"])
+        expect("wall time", results["timing"]["PWSCF"][0]["wall"], expected["wall time"])
+    return check
+
+
+def check_density(density, nr, mean):
+    expect("charge density shape", density.shape, tuple(nr))
+    expect("charge density mean", density.mean(), mean, 1e-6 * mean)
+
+
+def benchmarks(size, directory, seed=0):
+    """Returns [name, function, nbytes, check] of each benchmark of
+    size with synthetic files written to directory. check(result)
+    raises an Exception if the result of function is wrong (or is
+    None).
+
+    """
+    from pyqe.espresso import PWBase
+    from pyqe.io import read_out_file, read_data_file, write_cube, read_cube, \
+        read_charge_density_file, read_in_string
+    from pyqe.synthetic import SyntheticRun, calculations
+
+    parameters = dict(sizes[size])
+    nr = parameters.pop("nr")
+
+    cases = []
+    for calculation in calculations:
+        run = SyntheticRun(calculation, seed=seed, **parameters)
+        check = check_output(run)
+        output_str = run.output()
+        cases.append(["read_out_file[{0}]".format(calculation),
+                      lambda output_str=output_str: read_out_file(output_str),
+                      len(output_str), check])
+
+    # pw.x outputs (same for all sizes)
+    for filename, expected in sorted(reference_outputs.items()):
+        with open(os.path.join(data_dir, filename)) as f:
+            output_str = f.read()
+        cases.append(["read_out_file[{0}]".format(filename),
+                      lambda output_str=output_str: read_out_file(output_str),
+                      len(output_str), check_reference_output(expected)])
+
+    run = SyntheticRun("scf", seed=seed, **parameters)
+    data_file = run.write_save_directory(os.path.join(directory, "pwscf.save"), nr)
+    charge_file = os.path.join(directory, "pwscf.save", "charge-density.dat")
+    save_bytes = sum(os.path.getsize(os.path.join(root, filename))
+                     for root, dirnames, filenames in os.walk(os.path.dirname(data_file))
+                     for filename in filenames)
+    mean = run.nelec / run.alat**3
+
+    def check_data_file(data):
+        check_density(data["charge-density"], nr, mean)
+        expect("kpoints", len(data["kpoints"]), run.nks)
+        expect("bands", [len(kpoint["eigenvalues"]) for kpoint in data["kpoints"]],
+               [run.nbnd] * run.nks)
+
+    cases.append(["read_data_file", lambda: read_data_file(data_file), save_bytes,
+                  check_data_file])
+    cases.append(["read_charge_density_file", lambda: read_charge_density_file(charge_file),
+                  os.path.getsize(charge_file), lambda density: check_density(density, nr, mean)])
+
+    # cube files (bohr and angstrom) read back to the same density and crystal
+    density = read_charge_density_file(charge_file)
+    cell = run.alat / 2.0 * np.array([[-1.0, 0.0, 1.0], [0.0, 1.0, 1.0], [-1.0, 1.0, 0.0]])
+    positions = np.dot(run.positions, cell)
+    symbols = [run.species[i][0] for i in run.species_index]
+
+    def check_cube(cube_file):
+        cube = read_cube(cube_file)
+        expect("cube density", cube["density"], density, 1e-5 * density.max())
+        expect("cube cell", cube["cell"], cell, 1e-4)
+        expect("cube positions", cube["positions"], positions, 1e-4)
+        expect("cube numbers", cube["numbers"], [14 if symbol == "Si" else 32 for symbol in symbols])
+
+    for units, angstrom in (("bohr", False), ("angstrom", True)):
+        cube_file = os.path.join(directory, "density-{0}.cube".format(units))
+        cases.append(["write_cube[{0}]".format(units),
+                      lambda cube_file=cube_file, angstrom=angstrom: write_cube(
+                          cube_file, density, cell, positions, symbols, angstrom=angstrom) or cube_file,
+                      density.nbytes, check_cube])
+
+    qe = PWBase()
+    qe.control.add_keypairs({"calculation": "scf", "prefix": "pwscf"})
+    qe.system.add_keypairs({"ibrav": 1, "celldm(1)": run.alat, "nat": run.nat,
+                            "ntyp": run.ntyp, "ecutwfc": run.ecutwfc})
+    for symbol, valence, mass in run.species:
+        qe.atomic_species.add_atom_type(symbol, mass, "{0}.pz-vbc.UPF".format(symbol))
+    qe.atomic_positions.set_positions(
+        [run.species[i][0] for i in run.species_index], run.positions, "alat")
+    qe.k_points.from_list(run.kpoints, run.weights, "tpiba")
+    input_str = qe.to_string()
+
+    cases.append(["PWBase.__init__", PWBase, None, None])
+    cases.append(["PWBase.to_string", qe.to_string, len(input_str),
+                  lambda rendered: expect("rendered input", rendered, input_str)])
+    # parse -> render round trip gives back the input
+    cases.append(["read_in_string", lambda: read_in_string(input_str), len(input_str),
+                  lambda parsed: expect("input round trip", parsed.to_string(), input_str)])
+    return cases
+
+
+def run_benchmarks(size="small", repeat=5, pattern=None, seed=0):
+    """Runs the benchmarks of size whose name contains pattern. The
+    result of each benchmark is checked before it is timed. Returns a
+    list of measure results with their 'name' and 'size'.
+
+    """
+    if size not in sizes:
+        error_str = "size {0} must be one of {1}"
+        raise Exception(error_str.format(size, sorted(sizes)))
+
+    directory = tempfile.mkdtemp(prefix="pyqe-benchmark-")
+    try:
+        results = []
+        for name, function, nbytes, check in benchmarks(size, directory, seed):
+            if pattern and pattern not in name:
+                continue
+            if check:
+                check(function())
+            result = measure(function, repeat, nbytes)
+            result.update({"name": name, "size": size})
+            results.append(result)
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def format_results(results):
+    """Returns the results as a text table
+
+    """
+    lines = ["{0:32s} {1:>8s} {2:>12s} {3:>12s} {4:>10s} {5:>12s}".format(
+        "benchmark", "size", "best (ms)", "calls/s", "MB/s", "peak (MB)")]
+    for result in results:
+        mb_per_second = result.get("MB per second")
+        lines.append("{0:32s} {1:>8s} {2:12.3f} {3:12.1f} {4:>10s} {5:12.2f}".format(
+            result["name"], result["size"], result["best"] * 1e3,
+            result["calls per second"],
+            "-" if mb_per_second is None else "{0:.1f}".format(mb_per_second),
+            result["peak memory"] / 1e6))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pyqe parsing and input generation")
+    parser.add_argument("--size", choices=sorted(sizes), action="append",
+                        help="size of the synthetic runs (repeatable, default small)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per benchmark")
+    parser.add_argument("--filter", default=None, help="only benchmarks containing this string")
+    parser.add_argument("--json", default=None, help="write the results to this json file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.size or ["small"]:
+        results.extend(run_benchmarks(size, args.repeat, args.filter))
+
+    print(format_results(results))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+""" Bulk parsing of many pw.x outputs
+
+Walks directories for pw.x outputs, parses them with a process pool
+(one file per task, failures are recorded per file) and writes the
+results as (gzip compressed) JSON lines or a compressed NPZ archive.
+
+python -m pyqe.bulk /data/runs -o results.jsonl.gz --processes 64
+"""
+import argparse
+import fnmatch
+import gzip
+import json
+import os
+import re
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+
+def find_files(paths, patterns=("*.out",)):
+    """Yields the files matching patterns in paths (files or
+    directories walked recursively, in sorted order)
+
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            yield os.path.abspath(path)
+            continue
+        for root, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if any(fnmatch.fnmatch(filename, pattern) for pattern in patterns):
+                    yield os.path.abspath(os.path.join(root, filename))
+
+
+def map_files(function, filenames, processes=None, chunksize=8):
+    """Yields function(filename) for each filename computed by a pool
+    of processes (default all cores) in completion order. Workers
+    read the files themselves so only results are sent back.
+
+    """
+    filenames = list(filenames)
+    if processes == 1 or len(filenames) < 2:
+        for filename in filenames:
+            yield function(filename)
+        return
+
+    pool = Pool(processes)
+    try:
+        for result in pool.imap_unordered(function, filenames, chunksize):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def save_data_file(path, output_str):
+    """Returns the data-file.xml of the save directory written by the
+    pw.x output path (relative to the output) or None
+
+    """
+    match = re.search(r"Writing output data file\s+(\S+)", output_str)
+    if match:
+        data_file = os.path.join(os.path.dirname(path), match.group(1), "data-file.xml")
+        if os.path.isfile(data_file):
+            return data_file
+    return None
+
+
+def parse_file(path, read_save=False):
+    """Parses the pw.x output path. Returns {'path', 'results'} or
+    {'path', 'error'} if parsing failed. If read_save the save
+    directory written by the run (relative to the output) is read
+    into results['data-file'].
+
+    """
+    from pyqe.io import read_out_file, read_data_file
+
+    try:
+        with open(path) as f:
+            output_str = f.read()
+        results = read_out_file(output_str)
+
+        if read_save:
+            data_file = save_data_file(path, output_str)
+            if data_file:
+                results["data-file"] = read_data_file(data_file)
+        return {"path": path, "results": results}
+    except Exception as error:
+        return {"path": path, "error": "{0}: {1}".format(type(error).__name__, error)}
+
+
+def parse_file_with_save(path):
+    return parse_file(path, True)
+
+
+def parse_files(paths, patterns=("*.out",), processes=None, chunksize=8,
+                read_save=False):
+    """Yields the parsed records (see parse_file) of the pw.x outputs
+    in paths (see find_files) using a pool of processes
+
+    """
+    function = parse_file_with_save if read_save else parse_file
+    return map_files(function, find_files(paths, patterns), processes, chunksize)
+
+
+def to_builtin(value):
+    """Converts numpy arrays and scalars (recursively) to python
+    lists and numbers for json
+
+    """
+    if isinstance(value, dict):
+        return {key: to_builtin(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_builtin(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def write_jsonl(records, filename):
+    """Writes records one JSON object per line (gzip compressed if
+    filename ends with .gz). Returns the number of records written.
+
+    """
+    opener = gzip.open if filename.endswith(".gz") else open
+    written = 0
+    with opener(filename, "wt") as f:
+        for record in records:
+            f.write(json.dumps(to_builtin(record)))
+            f.write("\n")
+            written += 1
+    return written
+
+
+def read_jsonl(filename):
+    """Yields the records of a (gzip compressed) JSON lines file
+
+    """
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, "rt") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def flatten(value, prefix, arrays):
+    """Flattens nested dictionaries into arrays {'a/b/c': array}.
+    Values that are not numeric arrays are stored as json strings.
+
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flatten(item, "{0}/{1}".format(prefix, key), arrays)
+        return
+
+    try:
+        array = np.asarray(value)
+        if array.dtype.kind not in "biufc":
+            raise ValueError
+    except (ValueError, TypeError):
+        array = np.array(json.dumps(to_builtin(value)))
+    arrays[prefix] = array
+
+
+def write_npz(records, filename):
+    """Writes records into a compressed npz archive. Each record i is
+    flattened into arrays 'i/results/...' (see flatten), the paths
+    into 'paths' and errors into 'errors'. Returns the number of
+    records written.
+
+    """
+    arrays = {}
+    paths, errors = [], []
+    for i, record in enumerate(records):
+        paths.append(record["path"])
+        errors.append(record.get("error", ""))
+        if "results" in record:
+            flatten(record["results"], "{0}/results".format(i), arrays)
+    arrays["paths"] = np.array(paths)
+    arrays["errors"] = np.array(errors)
+    np.savez_compressed(filename, **arrays)
+    return len(paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse many pw.x outputs in parallel")
+    parser.add_argument("paths", nargs="+", help="pw.x outputs or directories")
+    parser.add_argument("-o", "--output", required=True,
+                        help="results file (.jsonl, .jsonl.gz or .npz)")
+    parser.add_argument("--pattern", action="append",
+                        help="filename pattern of outputs (repeatable, default *.out)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default all cores)")
+    parser.add_argument("--chunksize", type=int, default=8)
+    parser.add_argument("--save", action="store_true",
+                        help="also read the save directory of each run")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    failed = []
+
+    def records():
+        for record in parse_files(args.paths, tuple(args.pattern or ["*.out"]),
+                                  args.processes, args.chunksize, args.save):
+            if "error" in record:
+                failed.append(record)
+            yield record
+
+    if args.output.endswith(".npz"):
+        count = write_npz(records(), args.output)
+    else:
+        count = write_jsonl(records(), args.output)
+
+    elapsed = time.time() - start
+    for record in failed:
+        sys.stderr.write("{0}: {1}\n".format(record["path"], record["error"]))
+    print("{0} files ({1} failed) in {2:.2f}s ({3:.1f} files/s)".format(
+        count, len(failed), elapsed, count / elapsed if elapsed else 0.0))
+    return 1 if failed and len(failed) == count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
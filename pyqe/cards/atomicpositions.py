@@ -2,6 +2,10 @@
 Card: Atomic Positions
 
 """
+import numpy as np
+
+import pyqe.config as config
+
 
 class AtomicPositions:
     """
@@ -34,33 +38,129 @@ class AtomicPositions:
                  equivalent atoms. The other variables that control
                  this option are uniqueb, origin_choice, and
                  rhombohedral.
+
+    Atoms are stored as arrays (see set_positions for bulk setting)
+    with optional if_pos force constraint flags.
     """
-    options = ("alat", "bhor", "crystal", "crystal_sg", "angstrom")
+    options = ("alat", "bohr", "crystal", "crystal_sg", "angstrom")
 
     def __init__(self):
         self.name = "ATOMIC_POSITIONS"
         self.option = None
-        self.atom_positions = []
+        # Array representation of atoms:
+        # species       - list of unique chemical symbols
+        # species_index - (N,) index into species of each atom
+        # positions     - (N,3) position of each atom
+        # if_pos        - (N,3) force constraint mask (None = all free)
+        self.species = []
+        self.species_index = np.zeros(0, dtype=int)
+        self.positions = np.zeros((0, 3))
+        self.if_pos = None
 
-    def add_atom_position(self, symbol, position, option="alat"):
+    def num_atoms(self):
         """
-        Add atom position:
-        symbol    (1-2) characters
-        position  [x, y, z]
+        returns the number of atoms defined
+        """
+        return len(self.species_index)
+
+    @property
+    def symbols(self):
+        """
+        chemical symbol of each atom
+        """
+        return [self.species[i] for i in self.species_index]
+
+    @property
+    def atom_positions(self):
+        """
+        list of (symbol, position) of each atom (read only, use
+        set_positions or the positions array to move atoms)
         """
+        positions = self.positions.view()
+        positions.flags.writeable = False
+        return [(self.species[i], position) for i, position in
+                zip(self.species_index, positions)]
+
+    def validate_option(self, option):
+        if option not in AtomicPositions.options:
+            error_str = "ATOMIC_POSITIONS {0} not valid option".format(option)
+            raise Exception(error_str)
+
+    def validate_symbol(self, symbol):
         if len(symbol) > 2:
             error_str = "Chemical Symbol 1-2 Characters [{0}]".format(symbol)
             raise Exception(error_str)
 
+    def add_atom_position(self, symbol, position, option="alat", if_pos=None):
+        """
+        Add atom position:
+        symbol    (1-2) characters
+        position  [x, y, z]
+        if_pos    [x, y, z] 0/False to fix the component (default free)
+
+        For many atoms use set_positions.
+        """
+        self.validate_symbol(symbol)
+
         if not len(position) == 3:
             raise Exception("Must be vector len 3")
 
-        if option not in AtomicPositions.options:
-            error_str = "CELL_PARAMETERS {0} not valid option".format(self.option)
-            raise Exception(error_str)
+        if if_pos is not None and not len(if_pos) == 3:
+            raise Exception("if_pos must be vector len 3")
+
+        self.validate_option(option)
+
+        if symbol not in self.species:
+            self.species.append(symbol)
+
+        if if_pos is not None and self.if_pos is None:
+            self.if_pos = np.ones((self.num_atoms(), 3), dtype=bool)
+
+        if self.if_pos is not None:
+            if if_pos is None:
+                if_pos = [True, True, True]
+            self.if_pos = np.concatenate([self.if_pos, np.array([if_pos], dtype=bool)])
+
+        self.option = option
+        self.species_index = np.append(self.species_index, self.species.index(symbol))
+        self.positions = np.concatenate([self.positions, np.array([position], dtype=float)])
+
+    def set_positions(self, symbols, positions, option="alat", if_pos=None):
+        """
+        Sets (replaces) all atom positions:
+        symbols   (N,) chemical symbols (1-2) characters
+        positions (N,3) positions
+        if_pos    (N,3) boolean mask 0/False to fix the component
+                  (default None all free)
+        """
+        positions = np.array(positions, dtype=float)
+        if not positions.ndim == 2 or not positions.shape[1] == 3:
+            raise Exception("positions must be array shape (N,3)")
+
+        if not len(symbols) == len(positions):
+            raise Exception("Must be one symbol per position")
+
+        if if_pos is not None:
+            if_pos = np.array(if_pos, dtype=bool)
+            if not if_pos.shape == positions.shape:
+                raise Exception("if_pos must be array shape (N,3)")
+
+        self.validate_option(option)
+
+        species = {}
+        species_index = np.empty(len(symbols), dtype=int)
+        for i, symbol in enumerate(symbols):
+            index = species.get(symbol)
+            if index is None:
+                self.validate_symbol(symbol)
+                index = species.setdefault(symbol, len(species))
+            species_index[i] = index
 
         self.option = option
-        self.atom_positions.append([symbol, position])
+        self.species = list(species)
+        self.species_index = species_index
+        self.positions = positions
+        self.if_pos = if_pos
 
     def validate(self):
         """
@@ -71,12 +171,41 @@ class AtomicPositions:
             error_str = "ATOMIC_POSITIONS {0} not valid (should never happen)".format(self.option)
             raise Exception(error_str)
 
+        if not self.positions.shape == (self.num_atoms(), 3):
+            raise Exception("ATOMIC_POSITIONS positions must be array shape (N,3)")
+
+        if self.if_pos is not None and not self.if_pos.shape == self.positions.shape:
+            raise Exception("ATOMIC_POSITIONS if_pos must be array shape (N,3)")
+
+        if self.num_atoms() and not 0 <= self.species_index.min() <= self.species_index.max() < len(self.species):
+            raise Exception("ATOMIC_POSITIONS species index out of range")
+
+    def to_string(self, space=None):
+        if space is None:
+            space = config.card_space
+
+        natoms = self.num_atoms()
+        header = "{0} ({1})\n".format(self.name, self.option)
+        if natoms == 0:
+            return header
+
+        # Format all atoms at once with one (repeated) format string.
+        # Positions are written with repr (of python floats) so they
+        # read back exactly.
+        positions = self.positions.tolist()
+        columns = [np.array(self.species, dtype=object)[self.species_index],
+                   [_[0] for _ in positions], [_[1] for _ in positions],
+                   [_[2] for _ in positions]]
+        line_fmt = space + "%s %r %r %r"
+        if self.if_pos is not None:
+            columns.extend(self.if_pos.T.astype(int))
+            line_fmt += " %d %d %d"
+        line_fmt += "\n"
+
+        values = np.empty((natoms, len(columns)), dtype=object)
+        for i, column in enumerate(columns):
+            values[:, i] = column
+        return header + (line_fmt * natoms) % tuple(values.ravel().tolist())
+
     def __str__(self):
-        import pyqe.config as config
-
-        atomicpositions_str = "{0} ({1})\n".format(self.name, self.option)
-        for atom_position in self.atom_positions:
-            symbol = atom_position[0]
-            position_str = " ".join(map(str, atom_position[1]))
-            atomicpositions_str += config.card_space + symbol + " " + position_str + "\n"
-        return atomicpositions_str
+        return self.to_string()
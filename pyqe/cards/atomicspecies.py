@@ -2,6 +2,9 @@
 Card Atomic Species
 
 """
+import pyqe.config as config
+
+
 class AtomicSpecies:
     """
     Card: ATOMIC_SPECIES
@@ -54,10 +57,14 @@ class AtomicSpecies:
         for atom in self.atoms:
             self.validate_atom_type(atom)
 
-    def __str__(self):
-        import pyqe.config as config
+    def to_string(self, space=None):
+        if space is None:
+            space = config.card_space
 
-        atoms_str = "{0}\n".format(self.name)
-        for atom in self.atoms:
-            atoms_str += config.card_space + "{0} {1} {2}\n".format(atom[0], atom[1], atom[2])
-        return atoms_str
+        lines = ["{0}\n".format(self.name)]
+        for symbol, mass, pseudopot in self.atoms:
+            lines.append("{0}{1} {2} {3}\n".format(space, symbol, mass, pseudopot))
+        return "".join(lines)
+
+    def __str__(self):
+        return self.to_string()
@@ -1,12 +1,15 @@
 """Card: Cell Parameters
 
 """
+import pyqe.config as config
+
+
 class CellParameters:
     """
     Card: CELL_PARAMETERS
     Defines the vectors for lattice if ibrav = 0. This Card is optional.
 
-    bohr     : latticle vectors in bhor radii
+    bohr     : latticle vectors in bohr radii
                alat = sqrt(vec1*vec1)
 
     angstrom : lattice vectors in angstroms
@@ -17,7 +20,7 @@ class CellParameters:
 
     DEFAULT: alat
     """
-    options = ["alat", "bhor", "angstrom"]
+    options = ["alat", "bohr", "angstrom"]
 
     def __init__(self):
         self.name = "CELL_PARAMETERS"
@@ -52,16 +55,14 @@ class CellParameters:
             error_str = "CELL_PARAMETER {0} not valid (should never happen)".format(self.option)
             raise Exception(error_str)
 
-    def __str__(self):
-        import pyqe.config as config
+    def to_string(self, space=None):
+        if space is None:
+            space = config.card_space
 
-        cellparameter_str = "{0} ({1})\n".format(self.name, self.option)
-        v1_str = " ".join(map(str, self.lattice_vec[0]))
-        cellparameter_str += config.card_space + v1_str + "\n"
-        v2_str = " ".join(map(str, self.lattice_vec[1]))
-        cellparameter_str += config.card_space + v2_str + "\n"
-        v3_str = " ".join(map(str, self.lattice_vec[2]))
-        cellparameter_str += config.card_space + v3_str + "\n"
-
-        return cellparameter_str
+        lines = ["{0} ({1})\n".format(self.name, self.option)]
+        for vec in self.lattice_vec:
+            lines.append(space + " ".join(map(str, vec)) + "\n")
+        return "".join(lines)
 
+    def __str__(self):
+        return self.to_string()
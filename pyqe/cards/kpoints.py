@@ -1,6 +1,11 @@
 """Card: KPoints
 
 """
+import numpy as np
+
+import pyqe.config as config
+
+
 class KPoints:
     """
     KPoint options (see function for description):
@@ -11,6 +16,9 @@ class KPoints:
      - crystal_b
      - crystal_c
      - gamma
+     - automatic
+
+    Kpoint lists are stored as (N,3) kpoints and (N,) weights arrays.
 
     DEFAULT: tpiba
     """
@@ -19,10 +27,18 @@ class KPoints:
                "crystal", "crystal_b", "crystal_c",
                "gamma", "automatic"]
 
+    list_options = ["tpiba", "tpiba_b", "tpiba_c",
+                    "crystal", "crystal_b", "crystal_c"]
+
     def __init__(self):
         self.name = "K_POINTS"
         self.option = None
+        # [grid, offset] of automatic kpoints
         self.config = None
+        # (N,3) kpoints and (N,) weights of kpoint lists
+        self.kpoints = None
+        self.weights = None
+        self.labels = None
 
     def from_monkhorst_pack(self, grid, offset):
         """
@@ -44,17 +60,136 @@ class KPoints:
 
         self.option = "automatic"
         self.config = [grid, offset]
+        self.kpoints = None
+        self.weights = None
+        self.labels = None
+
+    def from_density(self, cell, density, even=False, offset=(0, 0, 0)):
+        """
+        Automatic ( nk1, nk2, nk3 ) grid (see from_monkhorst_pack)
+        with at least density kpoints per 1/angstrom (including 2 pi)
+        along each reciprocal lattice vector. Consistent densities
+        avoid oversampling small reciprocal directions.
+
+        cell    - (3,3) lattice vectors in bohr (see PWBase.get_cell)
+        density - kpoints per 1/angstrom
+        even    - round grid up to even numbers
+        """
+        from pyqe.lattice import density_monkhorst_pack_grid
+
+        grid = density_monkhorst_pack_grid(cell, density, even)
+        self.from_monkhorst_pack(grid, list(offset))
+
+    def from_irreducible_monkhorst_pack(self, grid, offset, cell_parameters,
+                                        atomic_positions, alat=None,
+                                        symprec=1e-5, time_reversal=True,
+                                        symmetry=True):
+        """
+        Explicit list (crystal) of the irreducible kpoints and weights
+        of the ( nk1, nk2, nk3 ) grid with ( sk1, sk2, sk3 ) offset
+        (see from_monkhorst_pack) reduced by the symmetry operations
+        of the crystal. Useful to know the number of kpoints
+        (cost) of a calculation before running pw.x.
+
+        cell_parameters  - CellParameters card or (3,3) lattice in bohr
+        atomic_positions - AtomicPositions card
+        alat             - celldm(1) in bohr required to convert between
+                           'alat' and other units
+        symmetry         - if False only time reversal is used (nosym)
+        """
+        from pyqe.lattice import to_bohr, irreducible_monkhorst_pack
+
+        if not len(grid) == len(offset) == 3:
+            raise Exception("Must be vector len 3")
+
+        if hasattr(cell_parameters, "lattice_vec"):
+            cell = cell_parameters.lattice_vec
+            cell_option = cell_parameters.option
+        else:
+            cell, cell_option = cell_parameters, "bohr"
+
+        if cell is None:
+            raise Exception("CELL_PARAMETERS lattice required for symmetry")
+
+        positions = atomic_positions.positions
+        positions_option = atomic_positions.option
 
-    def from_list(self, kpoints):
+        # Symmetry is scale invariant (only consistent units are needed)
+        if alat is None and positions_option in (cell_option, "crystal"):
+            alat = 1.0
+
+        cell = to_bohr(cell, cell_option, alat)
+        if positions_option == "crystal":
+            positions = np.array(positions)
+        elif positions_option == "crystal_sg":
+            raise Exception("ATOMIC_POSITIONS crystal_sg not supported")
+        else:
+            positions = np.dot(to_bohr(positions, positions_option, alat), np.linalg.inv(cell))
+
+        kpoints, weights = irreducible_monkhorst_pack(
+            grid, offset, cell, positions, atomic_positions.species_index,
+            symprec, time_reversal, symmetry)
+        self.from_list(kpoints, weights, "crystal")
+
+    def from_band_path(self, cell, density=20.0, path=None, ibrav=None):
+        """
+        Explicit list (crystal) of kpoints along the standard high
+        symmetry path of the bravais lattice for band structure
+        calculations. Labels of the special points along the path are
+        stored as [[index, label], ...] in self.labels and written as
+        comments after their kpoints.
+
+        cell    - (3,3) lattice vectors in bohr (see PWBase.get_cell)
+        density - kpoints per 1/angstrom (including 2 pi)
+        path    - string of special point labels ('|' breaks the path)
+                  eg. 'GXWKGLUWLK|UX' (G is gamma)
+        ibrav   - bravais-lattice index (default found from cell)
+        """
+        from pyqe.lattice import band_path
+
+        cell = np.array(cell, dtype=float)
+        kpoints, labels = band_path(cell, density, path, ibrav)
+
+        # cartesian (1/bohr) -> crystal coordinates
+        self.from_list(np.dot(kpoints, cell.T) / (2 * np.pi), option="crystal")
+        self.labels = labels
+
+    def from_list(self, kpoints, weights=None, option="tpiba"):
         """read k-points in cartesian coordinates,
         in units of 2 pi/a (default)
+
+        kpoints - (N,3) kpoint coordinates
+        weights - (N,) weight of each kpoint (default 1.0). For the _b
+                  and _c options the weight is the number of points
+                  to the next kpoint.
+        option  - tpiba, tpiba_b, tpiba_c, crystal, crystal_b, crystal_c
+
+        tpiba   : cartesian coordinates in units of 2 pi/a
+        crystal : crystal coordinates of the reciprocal lattice vectors
+        *_b     : band structure path through the kpoints
+        *_c     : kpoints define a plane (k0, k1, k2) for contour plots
         """
         # Validate Input
-        if not hasattr(kpoints, "__iter__"):
-            raise Exception("kpoints must be list of kpoints")
+        if option not in KPoints.list_options:
+            error_str = "K_POINTS {0} not valid list option"
+            raise Exception(error_str.format(option))
+
+        kpoints = np.array(kpoints, dtype=float)
+        if not kpoints.ndim == 2 or not kpoints.shape[1] == 3:
+            raise Exception("kpoints must be array shape (N,3)")
+
+        if weights is None:
+            weights = np.ones(len(kpoints))
+        else:
+            weights = np.array(weights, dtype=float)
+            if not weights.shape == (len(kpoints),):
+                raise Exception("Must be one weight per kpoint")
 
-        self.option = "tpiba"
-        self.config = kpoints
+        self.option = option
+        self.config = None
+        self.kpoints = kpoints
+        self.weights = weights
+        self.labels = None
 
     def validate(self):
         """
@@ -65,20 +200,33 @@ class KPoints:
             error_str = "K_POINT {0} not valid (should never happen)".format(self.option)
             raise Exception(error_str)
 
-    def __str__(self):
-        import pyqe.config as config
+        if self.option in KPoints.list_options and \
+           not self.weights.shape == (len(self.kpoints),):
+            raise Exception("K_POINT must be one weight per kpoint")
+
+    def to_string(self, space=None):
+        if space is None:
+            space = config.card_space
 
-        kpoint_str = "{0} ({1})\n".format(self.name, self.option)
+        lines = ["{0} ({1})\n".format(self.name, self.option)]
 
         if self.option == "automatic":
             # A little trick to convert list of int to delimited string
             grid_str = " ".join(map(str, self.config[0]))
             offset_str = " ".join(map(str, self.config[1]))
-            kpoint_str += config.card_space + grid_str + " " + offset_str + "\n"
-        elif self.option in ["tpiba", "tpiba_b", "tpiba_c", "crystal", "crystal_b", "crystal_c"]:
-            kpoint_str += config.card_space + "{0}\n".format(len(self.config))
-            for kpoint in self.config:
-                kpoint_str += config.card_space + "{0} {1} {2} 1.0\n".format(kpoint[0], kpoint[1], kpoint[2])
+            lines.append(space + grid_str + " " + offset_str + "\n")
+        elif self.option in KPoints.list_options:
+            # Format all kpoints at once with one format string
+            # (labels as comments). repr (of python floats) reads back
+            # exactly.
+            nks = len(self.kpoints)
+            lines.append(space + "{0}\n".format(nks))
+            values = np.column_stack([self.kpoints, self.weights])
+            line_fmts = [space + "%r %r %r %r"] * nks
+            for index, label in self.labels or []:
+                line_fmts[index] += " ! " + label.replace("%", "%%")
+            line_fmt = "\n".join(line_fmts) + "\n"
+            lines.append(line_fmt % tuple(values.ravel().tolist()))
         elif self.option == "gamma":
             # Do nothing for gamma point calculation
             pass
@@ -86,4 +234,7 @@ class KPoints:
             error_str = "K_POINT ({0}) not implemeted yet! (should not happen)".format(self.option)
             raise Exception(error_str)
 
-        return kpoint_str
+        return "".join(lines)
+
+    def __str__(self):
+        return self.to_string()
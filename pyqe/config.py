@@ -8,6 +8,14 @@ prefix = []
 # Postfix to apply to end of executing program
 postfix = []
 
+# MPI ranks available to each run. If set pw.x is launched with
+# mpi_command and the parallelization (-nk, -nt, -nd) planned for each
+# input (see pyqe.launch.plan_launch)
+cores = None
+
+# MPI launcher ({np} is replaced by the number of ranks)
+mpi_command = ["mpirun", "-np", "{np}"]
+
 # QE Namelist number of spaces
 namelist_space = "   "
 
@@ -0,0 +1,235 @@
+""" Pre-flight cost estimates of pw.x inputs
+
+Estimates the size of a calculation (plane waves, FFT grid, bands,
+kpoints) from the namelists and cards without running pw.x. The
+memory estimate follows the largest arrays allocated by pw.x
+(wavefunctions, davidson workspace, projectors, FFT grids and
+mixing) and is meant to pick ranks and pools, not to be exact to
+the megabyte.
+
+"""
+import math
+import os
+
+import numpy as np
+
+
+def good_fft_order(n, factors=(2, 3, 5, 7, 11)):
+    """Returns the smallest FFT dimension >= n having only the
+    factors allowed by the FFT libraries used by QE
+
+    """
+    while True:
+        m = n
+        for factor in factors:
+            while m % factor == 0:
+                m //= factor
+        if m == 1:
+            return n
+        n += 1
+
+
+def fft_dimensions(cell, ecut):
+    """Returns the FFT grid (nr1, nr2, nr3) that contains the sphere
+    of G-vectors with |G|^2 <= ecut (Ry) for the cell (bohr)
+
+    """
+    lengths = np.linalg.norm(np.array(cell, dtype=float), axis=1)
+    max_index = (np.sqrt(ecut) * lengths / (2 * np.pi)).astype(int)
+    return [good_fft_order(2 * int(n) + 1) for n in max_index]
+
+
+def number_plane_waves(volume, ecut):
+    """Number of plane waves |k+G|^2 <= ecut (Ry) in a cell of volume
+    (bohr^3). Sphere volume over the reciprocal cell volume.
+
+    """
+    return volume * ecut**1.5 / (6 * np.pi**2)
+
+
+def number_electrons(qe, valence=None):
+    """Number of electrons from the valence of each species and the
+    atoms in ATOMIC_POSITIONS minus tot_charge. Valence of a species
+    is taken from valence {symbol: z_valence} otherwise read from its
+    pseudopotential in pseudo_dir.
+
+    """
+    from pyqe.io import read_upf_valence
+
+    valence = dict(valence or {})
+    pseudo_dir = qe.control.get_current_value("pseudo_dir")
+    for symbol, mass, pseudopot in qe.atomic_species.atoms:
+        if symbol not in valence:
+            filename = os.path.join(pseudo_dir, pseudopot)
+            if not os.path.isfile(filename):
+                error_str = "valence of {0} required (pseudopotential {1} not found)"
+                raise Exception(error_str.format(symbol, filename))
+            valence[symbol] = read_upf_valence(filename)
+
+    positions = qe.atomic_positions
+    counts = np.bincount(positions.species_index, minlength=len(positions.species))
+    nelec = sum(valence[symbol] * count for symbol, count in zip(positions.species, counts))
+    return nelec - qe.system.get_current_value("tot_charge")
+
+
+def number_bands(qe, nelec):
+    """Number of bands: nbnd if set, otherwise the pw.x default
+    (half the electrons for insulators, 20% more and at least 4 more
+    for metals, twice as many for noncollinear calculations)
+
+    """
+    nbnd = qe.system.get_set_value("nbnd")
+    if nbnd:
+        return nbnd
+
+    npol = 2 if qe.system.get_current_value("noncolin") else 1
+    nbnd = int(math.ceil(npol * nelec / 2.0))
+    if qe.system.get_current_value("occupations") in ("smearing", "tetrahedra"):
+        nbnd = max(int(math.ceil(1.2 * npol * nelec / 2.0)), nbnd + 4)
+    return nbnd
+
+
+def number_kpoints(qe):
+    """Number of kpoints pw.x will use (automatic grids are reduced by
+    symmetry, band paths are expanded and LSDA doubles the kpoints)
+
+    """
+    k_points = qe.k_points
+    nosym = qe.system.get_current_value("nosym")
+
+    if k_points.option == "gamma":
+        nks = 1
+    elif k_points.option == "automatic":
+        grid, offset = k_points.config
+        ibrav = qe.system.get_current_value("ibrav")
+        cell_known = ibrav is not None and \
+            (ibrav != 0 or qe.cell_parameters.lattice_vec is not None)
+        if cell_known and qe.atomic_positions.num_atoms():
+            from pyqe.cards import KPoints
+            irreducible = KPoints()
+            irreducible.from_irreducible_monkhorst_pack(
+                grid, offset, qe.get_cell(), qe.atomic_positions,
+                alat=qe.get_celldm()[0] or None, symmetry=not nosym)
+            nks = len(irreducible.kpoints)
+        else:
+            # Symmetry unknown (cell or positions missing): time reversal only
+            nks = (int(np.prod(grid)) + 1) // 2
+    elif k_points.option in ("tpiba_b", "crystal_b"):
+        nks = int(np.sum(k_points.weights[:-1])) + 1
+    elif k_points.option in ("tpiba_c", "crystal_c"):
+        nks = int((k_points.weights[1] + 1) * (k_points.weights[2] + 1))
+    elif k_points.option in ("tpiba", "crystal"):
+        nks = len(k_points.kpoints)
+    else:
+        error_str = "K_POINTS {0} required to estimate cost"
+        raise Exception(error_str.format(k_points.option))
+
+    if qe.system.get_current_value("nspin") == 2:
+        nks *= 2
+    return nks
+
+
+def estimate_cost(qe, nranks=1, npool=1, valence=None):
+    """Estimates the cost of running the input qe (PWBase) with nranks
+    MPI ranks split into npool kpoint pools. Returns a dictionary:
+
+     - volume            : cell volume (bohr^3)
+     - number electrons
+     - number bands
+     - number kpoints    : including spin
+     - plane waves       : wavefunction plane waves per kpoint
+     - G-vectors         : density G-vectors
+     - fft dimensions    : [nr1, nr2, nr3] dense grid
+     - smooth fft dimensions : [nr1s, nr2s, nr3s] wavefunction grid
+     - memory            : total memory of the run (bytes)
+     - memory per rank   : largest memory of a single rank (bytes)
+     - runtime score     : relative cost of one scf iteration
+                           (~ GFLOP, comparable between inputs)
+
+    valence - {symbol: z_valence} used instead of the pseudopotentials
+              (see number_electrons)
+    """
+    from pyqe.lattice import cell_volume
+
+    if nranks < 1 or npool < 1 or nranks % npool:
+        error_str = "nranks {0} must be a multiple of npool {1}"
+        raise Exception(error_str.format(nranks, npool))
+
+    system = qe.system
+    ecutwfc = system.get_current_value("ecutwfc")
+    if ecutwfc is None:
+        raise Exception("ecutwfc required to estimate cost")
+    ecutrho = system.get_current_value("ecutrho")
+
+    cell = qe.get_cell()
+    volume = cell_volume(cell)
+    nat = qe.atomic_positions.num_atoms()
+    nspin = 2 if system.get_current_value("nspin") == 2 else 1
+    npol = 2 if system.get_current_value("noncolin") else 1
+
+    nelec = number_electrons(qe, valence)
+    nbnd = number_bands(qe, nelec)
+    nks = number_kpoints(qe)
+
+    npw = number_plane_waves(volume, ecutwfc)
+    ngm = number_plane_waves(volume, ecutrho)
+    if qe.k_points.option == "gamma":
+        # gamma tricks: real wavefunctions store half the plane waves
+        npw, ngm = npw / 2, ngm / 2
+
+    nr = [system.get_set_value("nr%d" % i) for i in (1, 2, 3)]
+    if not all(nr):
+        nr = fft_dimensions(cell, ecutrho)
+    nrs = [system.get_set_value("nr%ds" % i) for i in (1, 2, 3)]
+    if not all(nrs):
+        nrs = fft_dimensions(cell, min(4.0 * ecutwfc, ecutrho))
+    nrxx, nrxxs = float(np.prod(nr)), float(np.prod(nrs))
+
+    # ~ number of beta projectors (s, p, d channels per atom)
+    nkb = 9 * nat
+    ndim = qe.electrons.get_current_value("diago_david_ndim") or 4
+    mixing_ndim = qe.electrons.get_current_value("mixing_ndim") or 8
+
+    # Distribution of the work: kpoints over pools, G-vectors and
+    # FFT planes over the ranks of a pool
+    ranks_per_pool = nranks // npool
+    nks_pool = int(math.ceil(float(nks) / npool))
+
+    # Bytes (complex 16, real 8) of the distributed arrays
+    wavefunction = 16.0 * npw * npol * nbnd
+    memory_pool = (
+        nks_pool * wavefunction                  # wavefunctions kept in memory
+        + 3 * ndim * wavefunction                # davidson psi, hpsi, spsi
+        + 16.0 * npw * nkb                       # beta projectors
+        + 8.0 * nrxx * nspin * 10                # rho, potentials, work FFT arrays
+        + 16.0 * nrxxs * 4                       # smooth FFT work arrays
+        + 16.0 * ngm * nspin * 2 * mixing_ndim   # broyden mixing
+        + 16.0 * ngm * 4                         # G-vectors, structure factors
+    )
+    # Replicated on every rank: davidson subspace matrices
+    memory_replicated = 3 * 16.0 * (ndim * nbnd * npol)**2
+
+    memory_rank = memory_pool / ranks_per_pool + memory_replicated
+
+    # FLOPs of one scf iteration: FFTs of H|psi> (~3 davidson
+    # iterations), orthogonalization and subspace diagonalization
+    fft_flops = 5.0 * nrxxs * math.log(nrxxs, 2) * 2
+    flops_kpoint = 3 * (nbnd * npol * fft_flops
+                        + 8.0 * npw * npol * nbnd**2
+                        + 8.0 * npw * nkb * nbnd
+                        + 4.0 * (ndim * nbnd)**3 / 3)
+    density_flops = nspin * 5.0 * nrxx * math.log(nrxx, 2) * 4
+
+    return {
+        "volume": float(volume),
+        "number electrons": float(nelec),
+        "number bands": nbnd,
+        "number kpoints": nks,
+        "plane waves": int(npw),
+        "G-vectors": int(ngm),
+        "fft dimensions": nr,
+        "smooth fft dimensions": nrs,
+        "memory": float(npool * memory_pool + nranks * memory_replicated),
+        "memory per rank": float(memory_rank),
+        "runtime score": float((nks * flops_kpoint + density_flops) * 1e-9),
+    }
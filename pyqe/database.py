@@ -0,0 +1,383 @@
+""" SQLite index of pw.x outputs
+
+Parses many pw.x outputs (in parallel) once into a local SQLite
+database with one row per output (composition, cell, cutoffs,
+kpoints, energy, forces, stress, timing) so that questions like "all
+Si runs with ecutwfc > 40" are answered by a query instead of
+re-parsing every file.
+
+db = RunDatabase("runs.sqlite")
+db.index(["/data/runs"], processes=8)
+db.query("ecutwfc > ?", (40,), species=["Si"])
+
+Re-indexing is incremental: files with unchanged size and mtime (or
+content hash) are skipped.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from collections import Counter
+
+import numpy as np
+
+
+# Ry/bohr^3 -> kbar
+ry_bohr3_to_kbar = 147105.08
+
+columns = [
+    ("path", "TEXT PRIMARY KEY"),
+    ("mtime", "REAL"),
+    ("size", "INTEGER"),
+    ("hash", "TEXT"),
+    ("error", "TEXT"),
+    ("calculation", "TEXT"),
+    ("formula", "TEXT"),
+    ("nat", "INTEGER"),
+    ("ntyp", "INTEGER"),
+    ("alat", "REAL"),
+    ("volume", "REAL"),
+    ("cell", "TEXT"),
+    ("ecutwfc", "REAL"),
+    ("ecutrho", "REAL"),
+    ("nks", "INTEGER"),
+    ("nbnd", "INTEGER"),
+    ("nelec", "REAL"),
+    ("fft_dimensions", "TEXT"),
+    ("energy", "REAL"),
+    ("forces", "TEXT"),
+    ("max_force", "REAL"),
+    ("stress", "TEXT"),
+    ("pressure", "REAL"),
+    ("ionic_steps", "INTEGER"),
+    ("scf_iterations", "INTEGER"),
+    ("cpu_time", "REAL"),
+    ("wall_time", "REAL"),
+    ("fermi_energy", "REAL"),
+]
+json_columns = ("cell", "fft_dimensions", "forces", "stress")
+indexed_columns = ("formula", "calculation", "ecutwfc", "energy", "nat")
+
+
+def file_hash(filename):
+    """Returns the blake2b hash of the contents of filename
+
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def chemical_formula(symbols):
+    """Returns the formula ('Ga2O3') of a list of chemical symbols
+    (alphabetical order)
+
+    """
+    counts = Counter(symbols)
+    return "".join("{0}{1}".format(symbol, counts[symbol] if counts[symbol] > 1 else "")
+                   for symbol in sorted(counts))
+
+
+def read_fermi_energy(data_file):
+    """Reads only the fermi energy (Hartree) of data-file.xml (the
+    charge density and eigenvalues are not read)
+
+    """
+    from pyqe.io import qe_xml_tag_value
+    import xml.etree.ElementTree as ET
+
+    tag = ET.parse(data_file).getroot().find("BAND_STRUCTURE_INFO/FERMI_ENERGY")
+    if tag is None:
+        return None
+    return float(qe_xml_tag_value(tag))
+
+
+def calculation_type(output_str):
+    """Returns the calculation (scf, relax, vc-relax, md or bands)
+    of a pw.x output
+
+    """
+    if "Band Structure Calculation" in output_str:
+        return "bands"
+    if "Molecular Dynamics Calculation" in output_str:
+        return "md"
+    if "BFGS Geometry Optimization" in output_str:
+        return "vc-relax" if "new unit-cell volume" in output_str else "relax"
+    return "scf"
+
+
+def path_hash(path):
+    """Returns (path, file_hash(path)) (pool worker)"""
+    return path, file_hash(path)
+
+
+def run_record(path, output_str=None, content_hash=False):
+    """Parses the pw.x output path into a database row (dictionary
+    of columns). Failures are recorded in the 'error' column. If
+    content_hash the 'hash' column is computed from the contents read
+    for parsing.
+
+    """
+    from pyqe.io import read_out_file
+    from pyqe.bulk import save_data_file
+
+    stat = os.stat(path)
+    record = {"path": path, "mtime": stat.st_mtime, "size": stat.st_size}
+    if content_hash:
+        with open(path, "rb") as f:
+            contents = f.read()
+        record["hash"] = hashlib.blake2b(contents, digest_size=16).hexdigest()
+        if output_str is None:
+            output_str = contents.decode(errors="replace")
+    try:
+        if output_str is None:
+            with open(path) as f:
+                output_str = f.read()
+        record.update(output_record(read_out_file(output_str)))
+        record["calculation"] = calculation_type(output_str)
+
+        data_file = save_data_file(path, output_str)
+        if data_file:
+            record["fermi_energy"] = read_fermi_energy(data_file)
+    except Exception as error:
+        record["error"] = "{0}: {1}".format(type(error).__name__, error)
+    return record
+
+
+def run_record_with_hash(path):
+    return run_record(path, content_hash=True)
+
+
+def output_record(results):
+    """Returns the database columns of read_out_file results
+
+    """
+    header = results["header"]
+    calculation = results.get("calculation", {})
+    symbols = [atom[1] for atom in header.get("atom positions", [])]
+    alat = header.get("lattice parameter")
+
+    record = {
+        "formula": chemical_formula(symbols),
+        "nat": header.get("number atoms/cell"),
+        "ntyp": header.get("number atom types"),
+        "alat": alat,
+        "volume": calculation.get("volume", header.get("volume")),
+        "ecutwfc": header.get("kinetic-energy cutoff"),
+        "ecutrho": header.get("charge density cutoff"),
+        "nks": header.get("number kpoints", len(header.get("kpoints", []))),
+        "nbnd": header.get("number of Kohn Sham states"),
+        "nelec": header.get("number electrons"),
+        "fft_dimensions": header.get("FFT dimensions"),
+        "energy": calculation.get("total energy"),
+        "ionic_steps": len(calculation.get("iterations", [])) or (1 if calculation else 0),
+        "symbols": symbols,
+    }
+
+    if "crystal axes" in header and alat:
+        record["cell"] = (np.array(header["crystal axes"]).reshape(3, 3) * alat).tolist()
+
+    if "iterations" in calculation:
+        steps = calculation["iterations"]
+    elif calculation:
+        steps = [calculation]
+    else:
+        steps = []
+    record["scf_iterations"] = int(sum(len(step.get("scf convergence", {}).get("iteration", []))
+                                       for step in steps))
+
+    if "forces" in calculation:
+        forces = [force[2] for force in calculation["forces"]]
+        record["forces"] = forces
+        record["max_force"] = float(np.linalg.norm(forces, axis=1).max())
+
+    if "stress" in calculation:
+        record["stress"] = calculation["stress"]
+        record["pressure"] = float(np.trace(calculation["stress"]) / 3.0 * ry_bohr3_to_kbar)
+
+    pwscf = results.get("timing", {}).get("PWSCF")
+    if pwscf:
+        record["cpu_time"] = pwscf[0]["cpu"]
+        record["wall_time"] = pwscf[0]["wall"]
+    return record
+
+
+class RunDatabase:
+    """
+    SQLite database of parsed pw.x outputs
+
+    Table runs has one row per output (see columns), table species
+    the number of atoms of each chemical symbol per output. Columns
+    cell, fft_dimensions, forces and stress hold json arrays. Units
+    are those of pw.x (bohr, Ry, Ry/bohr, Ry/bohr^3) except pressure
+    (kbar), fermi_energy (Hartree) and times (seconds).
+    """
+    def __init__(self, filename=":memory:"):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.row_factory = sqlite3.Row
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS runs ({0})".format(
+                ", ".join("{0} {1}".format(name, sql_type) for name, sql_type in columns)))
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS species (path TEXT, symbol TEXT, count INTEGER)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS species_symbol ON species (symbol, path)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS species_path ON species (path)")
+            for name in indexed_columns:
+                self.connection.execute(
+                    "CREATE INDEX IF NOT EXISTS runs_{0} ON runs ({0})".format(name))
+
+    def _status(self, path):
+        """Returns 'new', 'changed' (size), 'touched' (same size,
+        other mtime) or 'unchanged' of path since it was indexed
+
+        """
+        row = self.connection.execute(
+            "SELECT mtime, size FROM runs WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return "new"
+
+        stat = os.stat(path)
+        if row["size"] != stat.st_size:
+            return "changed"
+        if row["mtime"] != stat.st_mtime:
+            return "touched"
+        return "unchanged"
+
+    def add_records(self, records):
+        """Inserts (or replaces) parsed records (see run_record)
+
+        """
+        names = [name for name, sql_type in columns]
+        insert = "INSERT OR REPLACE INTO runs ({0}) VALUES ({1})".format(
+            ", ".join(names), ", ".join("?" * len(names)))
+        with self.connection:
+            for record in records:
+                values = []
+                for name in names:
+                    value = record.get(name)
+                    if name in json_columns and value is not None:
+                        value = json.dumps(value)
+                    values.append(value)
+                self.connection.execute(insert, values)
+                self.connection.execute("DELETE FROM species WHERE path = ?", (record["path"],))
+                self.connection.executemany(
+                    "INSERT INTO species (path, symbol, count) VALUES (?, ?, ?)",
+                    [(record["path"], symbol, count) for symbol, count in
+                     Counter(record.get("symbols", [])).items()])
+
+    def index(self, paths, patterns=("*.out",), processes=None, check="mtime",
+              chunksize=16):
+        """Parses the pw.x outputs in paths (files or directories
+        searched for patterns, see pyqe.bulk.find_files) that are new
+        or changed since the last index with a pool of processes
+        (default all cores). check 'hash' also compares the content of
+        files whose mtime changed. Files are read and hashed by the
+        worker processes.
+        Returns {'parsed', 'failed', 'unchanged'}.
+
+        """
+        if check not in ("mtime", "hash"):
+            raise Exception("check must be 'mtime' or 'hash'")
+
+        from pyqe.bulk import find_files, map_files
+
+        stale, touched = [], []
+        unchanged = 0
+        for path in find_files(paths, patterns):
+            status = self._status(path)
+            if status == "unchanged":
+                unchanged += 1
+            elif status == "touched" and check == "hash":
+                touched.append(path)
+            else:
+                stale.append(path)
+
+        # Files only touched are compared by content (hashed by the
+        # workers), identical files just get their new mtime
+        for path, content_hash in map_files(path_hash, touched, processes, chunksize):
+            row = self.connection.execute(
+                "SELECT hash FROM runs WHERE path = ?", (path,)).fetchone()
+            if row["hash"] != content_hash:
+                stale.append(path)
+                continue
+            with self.connection:
+                self.connection.execute("UPDATE runs SET mtime = ? WHERE path = ?",
+                                        (os.stat(path).st_mtime, path))
+            unchanged += 1
+
+        worker = run_record_with_hash if check == "hash" else run_record
+        parsed, failed = 0, 0
+        batch = []
+        for record in map_files(worker, stale, processes, chunksize):
+            if record.get("error"):
+                failed += 1
+            parsed += 1
+            batch.append(record)
+            if len(batch) >= 1000:
+                self.add_records(batch)
+                batch = []
+        self.add_records(batch)
+
+        return {"parsed": parsed, "failed": failed, "unchanged": unchanged}
+
+    def prune(self):
+        """Removes the rows of outputs that no longer exist. Returns
+        the number of rows removed.
+
+        """
+        missing = [row["path"] for row in self.connection.execute("SELECT path FROM runs")
+                   if not os.path.exists(row["path"])]
+        with self.connection:
+            for path in missing:
+                self.connection.execute("DELETE FROM runs WHERE path = ?", (path,))
+                self.connection.execute("DELETE FROM species WHERE path = ?", (path,))
+        return len(missing)
+
+    def query(self, where=None, params=(), species=None, only_species=False,
+              columns=None, errors=False):
+        """Returns the rows (dictionaries, json columns decoded)
+        matching the SQL condition where (with ? params) containing
+        all chemical symbols in species (and no others if
+        only_species). Failed outputs are excluded unless errors.
+
+        db.query("ecutwfc > ? AND energy < ?", (40, -15.0), species=["Si"])
+        """
+        conditions, values = [], []
+        if where:
+            conditions.append("({0})".format(where))
+            values.extend(params)
+        if not errors:
+            conditions.append("error IS NULL")
+        for symbol in species or []:
+            conditions.append("path IN (SELECT path FROM species WHERE symbol = ?)")
+            values.append(symbol)
+        if species and only_species:
+            conditions.append("(SELECT COUNT(*) FROM species WHERE species.path = runs.path) = ?")
+            values.append(len(set(species)))
+
+        sql = "SELECT {0} FROM runs".format(", ".join(columns) if columns else "*")
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+
+        rows = []
+        for row in self.connection.execute(sql, values):
+            row = dict(row)
+            for name in json_columns:
+                if row.get(name) is not None:
+                    row[name] = json.loads(row[name])
+            rows.append(row)
+        return rows
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,178 @@
+""" Analysis of charge densities on the FFT grid
+
+Functions take the density (shape (nr1, nr2, nr3), electrons/bohr^3,
+see pyqe.io.read_charge_density_file) and the cell (lattice vectors
+as rows in bohr, see cell_from_header). Everything is vectorized
+numpy.
+
+cell = cell_from_header(results['header'])
+density = read_charge_density_file("pwscf.save/charge-density.dat")
+integrate(density, cell)                   # number of electrons
+z, rho = axis_coordinates(cell, density.shape, 2), planar_average(density, 2)
+macroscopic_average(rho, axis_length(cell, 2), 5.43 / bohr)
+"""
+import numpy as np
+
+
+def cell_from_header(header):
+    """Returns the cell (bohr) of read_out_header results ('crystal
+    axes' in units of 'lattice parameter')
+
+    """
+    return np.array(header["crystal axes"], dtype=float).reshape(3, 3) * header["lattice parameter"]
+
+
+def integrate(density, cell):
+    """Returns the integral of density over the cell (the number of
+    electrons of a charge density)
+
+    """
+    from pyqe.lattice import cell_volume
+
+    density = np.asarray(density)
+    return density.sum() * cell_volume(cell) / density.size
+
+
+def axis_length(cell, axis=2):
+    """Returns the distance (bohr) between the planes spanned by the
+    other two lattice vectors (|a_axis| for orthogonal cells)
+
+    """
+    from pyqe.lattice import cell_volume
+
+    cell = np.asarray(cell, dtype=float)
+    others = [i for i in range(3) if i != axis]
+    return cell_volume(cell) / np.linalg.norm(np.cross(cell[others[0]], cell[others[1]]))
+
+
+def axis_coordinates(cell, shape, axis=2):
+    """Returns the coordinates (bohr) along the normal of the planes
+    of grid shape along axis
+
+    """
+    n = shape[axis]
+    return np.arange(n) * axis_length(cell, axis) / n
+
+
+def planar_average(density, axis=2):
+    """Returns the average of density over the planes of the grid
+    along axis (shape (nr_axis,))
+
+    """
+    density = np.asarray(density)
+    others = tuple(i for i in range(density.ndim) if i != axis)
+    return density.mean(axis=others)
+
+
+def macroscopic_average(average, length, windows):
+    """Returns the periodic running average of the planar average
+    (period length) over windows (bohr, one or several applied in
+    turn, eg. the two interlayer distances of a superlattice).
+    Computed as a product in reciprocal space.
+
+    """
+    average = np.asarray(average, dtype=float)
+    n = average.shape[-1]
+    q = 2.0 * np.pi * np.fft.rfftfreq(n, d=length / n)
+    transform = np.fft.rfft(average, axis=-1)
+    for window in np.atleast_1d(windows):
+        # box of width window: sin(q w/2) / (q w/2)
+        transform = transform * np.sinc(q * window / (2.0 * np.pi))
+    return np.fft.irfft(transform, n, axis=-1)
+
+
+def _interpolate_axis(density, m, axis):
+    """Fourier interpolates density to m points along axis"""
+    n = density.shape[axis]
+    if m == n:
+        return density
+    if m < n:
+        error_str = "cannot interpolate {0} points to fewer points {1}"
+        raise Exception(error_str.format(n, m))
+
+    transform = np.moveaxis(np.fft.fft(density, axis=axis), axis, 0)
+    padded = np.zeros((m,) + transform.shape[1:], dtype=complex)
+    positive = (n + 1) // 2
+    padded[:positive] = transform[:positive]
+    padded[m - (n - positive):] = transform[positive:]
+    if n % 2 == 0:
+        # split the nyquist frequency so the result stays real
+        padded[n // 2] = 0.5 * transform[n // 2]
+        padded[m - n // 2] = 0.5 * transform[n // 2]
+    interpolated = np.fft.ifft(padded, axis=0).real * (m / n)
+    return np.moveaxis(interpolated, 0, axis)
+
+
+def interpolate_fft(density, shape):
+    """Returns density interpolated to the (finer) grid shape by zero
+    padding its Fourier transform. Exact for densities whose Fourier
+    components fit in the original grid.
+
+    """
+    density = np.asarray(density, dtype=float)
+    if len(shape) != density.ndim:
+        error_str = "shape {0} must have {1} dimensions"
+        raise Exception(error_str.format(shape, density.ndim))
+
+    for axis, m in enumerate(shape):
+        density = _interpolate_axis(density, m, axis)
+    return density
+
+
+def sample(density, cell, points, cartesian=True):
+    """Returns density at points (shape (npoints, 3), bohr or
+    fractional coordinates if not cartesian) by periodic trilinear
+    interpolation
+
+    """
+    density = np.asarray(density)
+    points = np.atleast_2d(np.asarray(points, dtype=float))
+    if cartesian:
+        points = np.dot(points, np.linalg.inv(np.asarray(cell, dtype=float)))
+
+    shape = np.array(density.shape)
+    grid = points * shape
+    lower = np.floor(grid).astype(int)
+    weight = grid - lower
+
+    values = np.zeros(len(points))
+    for corner in np.ndindex(2, 2, 2):
+        corner = np.array(corner)
+        index = (lower + corner) % shape
+        corner_weight = np.prod(np.where(corner, weight, 1.0 - weight), axis=1)
+        values += corner_weight * density[index[:, 0], index[:, 1], index[:, 2]]
+    return values
+
+
+def dipole(density, cell, axis=2, positions=None, charges=None, origin=None):
+    """Returns the dipole moment (e bohr) along axis of a slab from
+    its electron density and optionally its ions (positions in bohr,
+    charges the valences). Coordinates are measured from origin
+    (bohr along the normal, default the minimum of the planar
+    average, ie. the vacuum) so the slab is not cut by the cell.
+
+    """
+    from pyqe.lattice import cell_volume
+
+    cell = np.asarray(cell, dtype=float)
+    average = planar_average(density, axis)
+    length = axis_length(cell, axis)
+    coordinates = axis_coordinates(cell, np.shape(density), axis)
+    if origin is None:
+        origin = coordinates[np.argmin(average)]
+
+    area = cell_volume(cell) / length
+    z = (coordinates - origin) % length
+    moment = -np.sum(z * average) * length / len(average) * area
+
+    if positions is not None:
+        if charges is None:
+            error_str = "charges of the ions are required with positions"
+            raise Exception(error_str)
+        # normal of the planes pointing along cell[axis] (also for
+        # left-handed cells) as the coordinates of the density
+        normal = np.cross(cell[(axis + 1) % 3], cell[(axis + 2) % 3])
+        normal *= np.sign(np.dot(normal, cell[axis])) / np.linalg.norm(normal)
+        ion_z = (np.dot(np.asarray(positions, dtype=float), normal) - origin) % length
+        moment += np.sum(np.asarray(charges, dtype=float) * ion_z)
+    return moment
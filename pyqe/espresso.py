@@ -10,6 +10,9 @@ for details on the input format to pw.x
 '!#' - fortran comment characters
 """
 
+import copy
+import os
+
 from pyqe.cards import AtomicSpecies, AtomicPositions, KPoints, CellParameters
 from pyqe.namelists import Control, System, Electrons, Ions, Cell
 
@@ -25,6 +28,8 @@ class PWBase:
      - run pw.x
     """
 
+    header = "! File Autogenerated from Python QE\n"
+
     def __init__(self):
         self.control = Control()
         self.system = System()
@@ -41,6 +46,13 @@ class PWBase:
         #self.constrains = Card("CONTRAINTS")
         #self.atomicforces = Card("ATOMIC_FORCES")
 
+        self._associate()
+
+    def _associate(self):
+        """ Maps the (lowercase) names of each namelist and card to
+        their objects
+
+        """
         self.namelist_asoc = {
             "control": self.control,
             "system": self.system,
@@ -49,6 +61,53 @@ class PWBase:
             "cell": self.cell
         }
 
+        self.card_asoc = {
+            "atomic_species": self.atomic_species,
+            "atomic_positions": self.atomic_positions,
+            "k_points": self.k_points,
+            "cell_parameters": self.cell_parameters
+        }
+
+    def derive(self, **changes):
+        """ Returns a clone of the input with `changes` applied.
+        Namelist changes are dictionaries of keypairs (as in
+        add_keypairs_to_namelist) while card changes are replacement
+        card objects.
+
+        qe.derive(system={'ecutwfc': 30.0}, k_points=kpoints)
+
+        Namelists are copied cheaply (the key schema and the rendered
+        text of unchanged namelists are shared) and the cards that are
+        not replaced are copied, so modifying the parent or a derived
+        input in place never changes the other.
+
+        """
+        derived = self.__class__.__new__(self.__class__)
+        derived.__dict__.update(self.__dict__)
+        for name, namelist in self.namelist_asoc.items():
+            setattr(derived, name, namelist.copy())
+        replaced = [name.lower() for name in changes]
+        for name, card in self.card_asoc.items():
+            if name not in replaced:
+                setattr(derived, name, copy.deepcopy(card))
+
+        for name, change in changes.items():
+            name = name.lower()
+            if name in self.namelist_asoc:
+                getattr(derived, name).add_keypairs(change)
+            elif name in self.card_asoc:
+                if not isinstance(change, type(self.card_asoc[name])):
+                    error_str = "{0} card must be replaced by {1}"
+                    raise Exception(error_str.format(
+                        name, type(self.card_asoc[name]).__name__))
+                setattr(derived, name, change)
+            else:
+                error_str = "{0} is not valid namelist or card"
+                raise Exception(error_str.format(name))
+
+        derived._associate()
+        return derived
+
     def add_keypairs_to_namelist(self, qe_keypairs):
         """ Adds the respective keys to each namelist 
 
@@ -61,47 +120,129 @@ class PWBase:
                 error_str = "{0} is not valid namelist"
                 raise Exception(error_str.format(name))
 
-    def to_string(self, header=True):
-        qe_str = ""
+    def get_celldm(self):
+        """ Returns [celldm(1), ..., celldm(6)] from the celldm keys or
+        from A, B, C, cosAB, cosAC, cosBC (unset values are 0.0)
+
+        """
+        from pyqe.lattice import bohr
+
+        if self.system.get_set_value("A") is not None:
+            a = self.system.get_set_value("A")
+            b = self.system.get_set_value("B") or 0.0
+            c = self.system.get_set_value("C") or 0.0
+            return [a / bohr, b / a, c / a,
+                    self.system.get_set_value("cosAB") or 0.0,
+                    self.system.get_set_value("cosAC") or 0.0,
+                    self.system.get_set_value("cosBC") or 0.0]
+
+        return [self.system.get_set_value("celldm", (i,)) or 0.0 for i in range(1, 7)]
 
-        if (header == True):
-            qe_str += "! File Autogenerated from Python QE\n"
+    def get_cell(self):
+        """ Returns the lattice vectors (rows) in bohr defined by ibrav
+        (and celldm) or CELL_PARAMETERS if ibrav = 0
 
-        ## NameLists
-        qe_str += self.control.to_string()
-        qe_str += self.system.to_string()
-        qe_str += self.electrons.to_string()
-        qe_str += self.ions.to_string()
-        qe_str += self.cell.to_string()
+        """
+        from pyqe.lattice import to_bohr, ibrav_cell
+
+        ibrav = self.system.get_current_value("ibrav")
+        celldm = self.get_celldm()
+
+        if ibrav == 0:
+            if self.cell_parameters.lattice_vec is None:
+                raise Exception("ibrav = 0 requires CELL_PARAMETERS")
+            return to_bohr(self.cell_parameters.lattice_vec,
+                           self.cell_parameters.option, celldm[0] or None)
+        elif ibrav is None:
+            raise Exception("ibrav must be set to determine cell")
 
-        ## Cards
-        qe_str += str(self.atomic_species)
-        qe_str += str(self.atomic_positions)
-        qe_str += str(self.k_points)
+        return ibrav_cell(ibrav, celldm)
+
+    def set_kpoint_density(self, density, even=False, offset=(0, 0, 0)):
+        """ Sets an automatic kpoint grid with at least density kpoints
+        per 1/angstrom from the cell (see KPoints.from_density)
+
+        """
+        self.k_points.from_density(self.get_cell(), density, even, offset)
+
+    def estimate_cost(self, nranks=1, npool=1, valence=None):
+        """ Estimates plane waves, FFT grid, memory per rank and a
+        relative runtime score before running pw.x (see
+        pyqe.cost.estimate_cost)
+
+        """
+        from pyqe.cost import estimate_cost
+
+        return estimate_cost(self, nranks, npool, valence)
+
+    def components(self):
+        """ Returns the namelists and cards in the order they are
+        written to the input file
+
+        """
+        components = [
+            ## NameLists
+            self.control,
+            self.system,
+            self.electrons,
+            self.ions,
+            self.cell,
+            ## Cards
+            self.atomic_species,
+            self.atomic_positions,
+            self.k_points
+        ]
 
         # Only needed if unitcell is not defined
         # By ibrav
         if self.system.get_current_value("ibrav") == 0:
-            qe_str += str(self.cell_parameters)
+            components.append(self.cell_parameters)
 
         # Not Implemented
-        # qe_str += str(self.occupations)
-        # qe_str += str(self.contraints)
-        # qe_str += str(self.atomic_forces)
-        return qe_str
+        # components.append(self.occupations)
+        # components.append(self.contraints)
+        # components.append(self.atomic_forces)
+        return components
+
+    def to_blocks(self, header=True, namelist_space=None, card_space=None):
+        """ Returns the list of rendered namelist and card strings that
+        make up the input file. Namelists cache their rendered string
+        until their keypairs change.
+
+        namelist_space, card_space - indentation (default pyqe.config)
+        """
+        from pyqe.namelist import Namelist
+
+        blocks = []
+
+        if header:
+            blocks.append(PWBase.header)
 
-    def to_file(self, filename, input_format="fortran"):
+        for component in self.components():
+            if isinstance(component, Namelist):
+                blocks.append(component.to_string(namelist_space))
+            else:
+                blocks.append(component.to_string(card_space))
+
+        return blocks
+
+    def to_string(self, header=True, namelist_space=None, card_space=None):
+        return "".join(self.to_blocks(header, namelist_space, card_space))
+
+    def to_file(self, filename, input_format="fortran",
+                namelist_space=None, card_space=None):
         """ Writes QE configuration to <filename> in format
         specified. Currently only supports the Fortran style. 
 
         """
         if input_format == "fortran":
             with open(filename, "w") as qefile:
-                qefile.write(self.to_string())
+                qefile.writelines(self.to_blocks(True, namelist_space, card_space))
         else:
             raise Exception("xml input specification not supported")
 
-    def run(self, infile="", outfile="", errfile=""):
+    def run(self, infile="", outfile="", errfile="", launcher=None,
+            cancel=None):
         """Runs QE pw.x.
 
         If stdin, stdout, stderr filenames are not defined
@@ -110,33 +251,57 @@ class PWBase:
         If 'infile' is defined the program will run from the
         file rather than stdin via '-i'.
 
+        launcher (pyqe.launch.Launcher) holds the executable, MPI
+        layout, environment, working directory, wall time limit and
+        input spacing of this run (default from pyqe.config). If
+        cores is set the MPI ranks, pools, task groups and
+        diagonalization group are planned for this input (see
+        pyqe.launch.plan_launch). Runs with their own launchers may
+        run concurrently from threads. With launcher scratch each run
+        executes in its own directory (results['workdir'] if kept).
+
+        cancel (threading.Event) stops pw.x when set from another
+        thread. The launcher tracer (pyqe.trace.Tracer) records the
+        time of each stage (render input, pw.x, parsing). CPU time
+        and memory of pw.x are in results['resources'] (see
+        Launcher.execute).
+
+        Failures, timeouts and cancellations raise
+        pyqe.launch.RunError (returncode, CRASH file, output tail,
+        stderr and working directory).
+
         Notice:
         QE will still create the save files in the directory
-        specified by 'outfile' and 'errfile' in control namelist
+        specified by 'outdir' in control namelist (relative to the
+        launcher working directory)
         """
-        from subprocess import Popen, PIPE
-        from time import time
-        from pyqe import config
+        from pyqe.launch import Launcher, RunError
+        from pyqe.trace import span, count
 
-        start_time = time()
-        if infile != "":
-            self.to_file(infile)
+        if launcher is None:
+            launcher = Launcher()
+        tracer = launcher.tracer
 
-            pw_command = config.prefix + ["pw.x", '-i', infile] + config.postfix
-            proc = Popen(pw_command, stdout=PIPE, stderr=PIPE)
-            pw_output = proc.communicate()
-        else:
-            pw_input = self.to_string()
+        with span(tracer, "prepare"):
+            workdir, qe = launcher.prepare(self)
 
-            pw_command = config.prefix + ["pw.x"] + config.postfix
-            proc = Popen(pw_command, stdin=PIPE, stdout=PIPE, stderr=PIPE)
-            pw_output = proc.communicate(pw_input.encode())
+        with span(tracer, "render input"):
+            if infile != "":
+                qe.to_file(infile, namelist_space=launcher.namelist_space,
+                           card_space=launcher.card_space)
 
-        proc.wait()
-        end_time = time()
+                pw_command = launcher.command(qe, os.path.abspath(infile))
+                pw_input = None
+            else:
+                pw_command = launcher.command(qe)
+                pw_input = launcher.render(qe).encode()
+
+        with span(tracer, "pw.x", command=" ".join(pw_command)):
+            execution = launcher.execute(pw_command, pw_input, workdir, cancel)
+        count(tracer, "bytes stdout", len(execution["stdout"]))
 
-        pw_out = pw_output[0].decode()
-        pw_err = pw_output[1].decode()
+        pw_out = execution["stdout"].decode()
+        pw_err = execution["stderr"].decode()
 
         if outfile != "":
             with open(outfile, "w") as f:
@@ -146,25 +311,41 @@ class PWBase:
             with open(errfile, "w") as f:
                 f.write(pw_err)
 
-        if proc.returncode != 0:
-            with open("CRASH", "r") as f:
-                print("Quantum Espresso CRASH FILE:\n{0}".format(f.read()))
-            raise Exception("pw.x CRASHED")
+        if execution["status"] != "completed" or execution["returncode"] != 0:
+            crash = launcher.read_crash(workdir)
+            workdir = launcher.finish(workdir, False)
+            if execution["status"] == "timeout":
+                error_str = "pw.x timed out after {0} seconds".format(launcher.timeout)
+            elif execution["status"] == "cancelled":
+                error_str = "pw.x cancelled"
+            else:
+                error_str = "pw.x CRASHED (returncode {0})".format(execution["returncode"])
+            raise RunError(error_str, pw_command, execution["returncode"],
+                           crash, pw_out, pw_err, workdir)
 
         from pyqe.io import read_out_file, read_data_file
-        results = read_out_file(pw_out)
-
-        # Read save file output
-        prefix = self.control.get_current_value("prefix")
-        outdir = self.control.get_current_value("outdir")
-        if outdir[-1] == '/':
-            data_file = outdir + prefix + '.save/data-file.xml'
-        else:
-            data_file = outdir + '/' + prefix + '.save/data-file.xml'
-        results.update({"data-file": read_data_file(data_file)})
+        try:
+            with span(tracer, "read_out_file"):
+                results = read_out_file(pw_out, tracer)
+
+            # Read save file output
+            prefix = qe.control.get_current_value("prefix")
+            outdir = qe.control.get_current_value("outdir")
+            data_file = os.path.join(workdir or "", outdir, prefix + '.save', 'data-file.xml')
+            with span(tracer, "read_data_file"):
+                results.update({"data-file": read_data_file(data_file, tracer)})
+        except Exception:
+            launcher.finish(workdir, False)
+            raise
 
         # Add run related info
-        results.update({'time': end_time - start_time})
+        results.update({'time': execution["resources"]["wall time"],
+                        'resources': execution["resources"]})
+
+        with span(tracer, "cleanup"):
+            workdir = launcher.finish(workdir, True)
+        if launcher.scratch is not None and workdir is not None:
+            results.update({'workdir': workdir})
 
         return results
 
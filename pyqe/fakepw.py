@@ -0,0 +1,169 @@
+""" A stand-in for pw.x
+
+Reads a pw.x input (stdin or -i), waits and/or computes for a while,
+then prints a synthetic pw.x output and writes the save directory
+(outdir/prefix.save) matching the input (see pyqe.synthetic). Allows
+testing runs, orchestration and caches without Quantum Espresso.
+
+Select it with a launcher:
+
+launcher = Launcher(executable=pyqe.fakepw.command(sleep=1.0))
+qe.run(launcher=launcher)
+
+Options may also be set through the environment (eg. Launcher env):
+PYQE_FAKEPW_SLEEP, PYQE_FAKEPW_COMPUTE, PYQE_FAKEPW_STEPS,
+PYQE_FAKEPW_FAIL. Unknown pw.x arguments (-nk, -nd, ...) are ignored.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+
+def command(sleep=None, compute=None, steps=None, fail=False):
+    """Returns the executable (list) running the fake pw.x. Unset
+    options are taken from the environment.
+
+    sleep   - seconds to sleep
+    compute - seconds to keep a CPU busy
+    steps   - maximum ionic steps of relax, vc-relax and md runs
+    fail    - crash (CRASH file and returncode 1)
+
+    The command puts the directory containing pyqe first on sys.path
+    so it runs from any working directory (eg. scratch directories)
+    also for checkouts that are not installed.
+    """
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    bootstrap = ("import sys; sys.path.insert(0, {0!r}); "
+                 "from pyqe.fakepw import main; sys.exit(main())").format(package_root)
+    executable = [sys.executable, "-c", bootstrap]
+    for option, value in (("--sleep", sleep), ("--compute", compute), ("--steps", steps)):
+        if value is not None:
+            executable.extend([option, str(value)])
+    if fail:
+        executable.append("--fail")
+    return executable
+
+
+def synthetic_run(qe, steps=3, seed=None):
+    """Returns the SyntheticRun matching the input qe (PWBase)
+
+    """
+    from pyqe.synthetic import SyntheticRun, chemical_species
+    from pyqe.cost import number_kpoints, number_bands
+
+    calculation = qe.control.get_current_value("calculation")
+    nstep = qe.control.get_current_value("nstep")
+    positions = qe.atomic_positions
+    nat = max(positions.num_atoms(), 1)
+
+    try:
+        nks = number_kpoints(qe)
+    except Exception:
+        nks = 1
+
+    run = SyntheticRun(calculation, nat=nat, ntyp=1, nks=nks,
+                       nsteps=max(min(nstep, steps), 1),
+                       prefix=qe.control.get_current_value("prefix"),
+                       outdir=qe.control.get_current_value("outdir"),
+                       seed=seed)
+
+    # Atoms of the input (valence from the table or 4)
+    valences = {symbol: valence for symbol, valence, mass in chemical_species}
+    masses = {atom[0]: atom[1] for atom in qe.atomic_species.atoms}
+    if positions.num_atoms():
+        run.species = [[symbol, valences.get(symbol, 4.0), masses.get(symbol, 1.0)]
+                       for symbol in positions.species]
+        run.ntyp = len(run.species)
+        run.species_index = np.array(positions.species_index)
+        run.positions = np.array(positions.positions, dtype=float)
+        run.nelec = sum(run.species[i][1] for i in run.species_index)
+
+    try:
+        run.alat = qe.get_celldm()[0] or \
+            abs(np.linalg.det(qe.get_cell())) ** (1.0 / 3.0)
+    except Exception:
+        pass
+
+    run.ecutwfc = qe.system.get_current_value("ecutwfc") or run.ecutwfc
+    run.ecutrho = qe.system.get_current_value("ecutrho") or 4.0 * run.ecutwfc
+
+    if qe.k_points.kpoints is not None and qe.k_points.option in ("tpiba", "crystal"):
+        run.kpoints = np.array(qe.k_points.kpoints)
+        run.weights = 2.0 * qe.k_points.weights / qe.k_points.weights.sum()
+
+    run.nbnd = number_bands(qe, run.nelec)
+    return run
+
+
+def compute_for(seconds):
+    """Keeps a CPU busy for seconds
+
+    """
+    end = time.time() + seconds
+    matrix = np.random.RandomState(0).uniform(size=(64, 64))
+    while time.time() < end:
+        matrix = np.dot(matrix, matrix)
+        matrix /= np.abs(matrix).max()
+
+
+def main(argv=None):
+    environ = os.environ
+    parser = argparse.ArgumentParser(description="Fake pw.x (see pyqe.fakepw)")
+    parser.add_argument("-i", "-in", "-inp", "-input", dest="input", default=None,
+                        help="input file (default stdin)")
+    parser.add_argument("--sleep", type=float,
+                        default=float(environ.get("PYQE_FAKEPW_SLEEP", 0.0)))
+    parser.add_argument("--compute", type=float,
+                        default=float(environ.get("PYQE_FAKEPW_COMPUTE", 0.0)))
+    parser.add_argument("--steps", type=int,
+                        default=int(environ.get("PYQE_FAKEPW_STEPS", 3)))
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--fail", action="store_true",
+                        default=bool(environ.get("PYQE_FAKEPW_FAIL")))
+    args, unknown = parser.parse_known_args(argv)
+
+    from pyqe.io import read_in_string
+
+    if args.input:
+        with open(args.input) as f:
+            input_str = f.read()
+    else:
+        input_str = sys.stdin.read()
+
+    try:
+        qe = read_in_string(input_str)
+    except Exception as error:
+        with open("CRASH", "w") as f:
+            f.write(" %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%\n"
+                    "     Error in routine read_namelists (1):\n"
+                    "     {0}\n".format(error))
+        print("     Error reading input: {0}".format(error))
+        return 1
+
+    if args.sleep:
+        time.sleep(args.sleep)
+    if args.compute:
+        compute_for(args.compute)
+
+    if args.fail:
+        with open("CRASH", "w") as f:
+            f.write(" %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%\n"
+                    "     Error in routine c_bands (1):\n"
+                    "     too many bands are not converged\n")
+        print("     Error in routine c_bands (1): too many bands are not converged")
+        return 1
+
+    run = synthetic_run(qe, args.steps, args.seed)
+    output_str = run.output()
+    run.write_save_directory(os.path.join(run.outdir, run.prefix + ".save"))
+
+    sys.stdout.write(output_str)
+    sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
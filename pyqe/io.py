@@ -1,20 +1,25 @@
 """ 
 A module for reading the output and input to Quantum Espresso
 
+read_in_file - reads pw.x input file into PWBase
 read_out_file - reads stdout from pw.x 
+read_out_footer - reads the timing report of pw.x
+pwbase_from_out - builds PWBase from read_out_file results
 read_data_file - reads save file specified in `outfile` from pw.x
 
 other functions are helper functions
 """
 import re
 import os
-import struct
 import numpy as np
 import xml.etree.ElementTree as ET
 
+from pyqe.trace import span, count
+
 # heavily used regex written once to prevent typos
 double_regex = r'[-+]?\d+\.\d+(?:[eE][-+]?\d+)?'
 int_regex = '[+-]?\d+'
+number_regex = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eEdD][-+]?\d+)?'
 
 
 def qe_xml_tag_value(tag):
@@ -35,14 +40,14 @@ def qe_xml_tag_value(tag):
         if size == 1:
             value = value[0]
         else:
-            value.shape = [size / col, col]
+            value.shape = [size // col, col]
     elif _type == "integer":
         value = np.array(
             [int(_) for _ in re.findall(int_regex, tag.text)])
         if size == 1:
             value = value[0]
         else:
-            value.shape = [size / col, col]
+            value.shape = [size // col, col]
     elif _type == "logical":
         if 'F' in tag.text:
             value = False
@@ -55,13 +60,203 @@ def qe_xml_tag_value(tag):
     return value
 
 
-def read_out_file(output_str):
+# pw.x input (fortran namelists and cards)
+comment_regex = re.compile(r"""^((?:[^'"!#\n]|'[^'\n]*'|"[^"\n]*")*)[!#].*$""", re.MULTILINE)
+namelist_regex = re.compile(r"""&(\w+)((?:[^/'"]|'[^']*'|"[^"]*")*)/""")
+keypair_regex = re.compile(
+    r"""([A-Za-z]\w*(?:\s*\([\d\s,]+\))?)\s*=\s*('[^']*'|"[^"]*"|[^\s,'"]+)""")
+card_regex = re.compile(
+    r"^[ \t]*([A-Za-z_]+)[ \t]*(?:[({][ \t]*(\w+)[ \t]*[)}]|(\w+))?[ \t]*$")
+card_names = ("ATOMIC_SPECIES", "ATOMIC_POSITIONS", "K_POINTS",
+              "CELL_PARAMETERS", "OCCUPATIONS", "CONSTRAINTS",
+              "ATOMIC_FORCES", "ATOMIC_VELOCITIES", "ADDITIONAL_K_POINTS",
+              "SOLVENTS", "HUBBARD")
+
+
+def qe_namelist_value(value_str, _type):
+    """
+    Converts fortran namelist value string to type of the key
+    (str, float, int, bool). Handles quoted strings, fortran logicals
+    (.true., .t., T, ...) and 'd' exponents (1.0d-8).
+    """
+    if value_str[0] in "'\"":
+        value_str = value_str[1:-1]
+        if _type is str:
+            return value_str
+
+    try:
+        if _type is bool:
+            logical = value_str.lower().lstrip('.')
+            if logical[:1] in ('t', 'f'):
+                return logical[0] == 't'
+        elif _type is float:
+            return float(value_str.lower().replace('d', 'e'))
+        elif _type is int:
+            return int(value_str)
+        elif _type is str:
+            return value_str
+    except ValueError:
+        pass
+
+    error_str = "value '{0}' can not be converted to type {1}"
+    raise Exception(error_str.format(value_str, _type.__name__))
+
+
+def qe_float(value_str):
+    """Converts fortran float string (1.0d-8) to float"""
+    return float(value_str.lower().replace('d', 'e'))
+
+
+# lowercase key -> key of each namelist class (fortran is case insensitive)
+_namelist_key_names = {}
+
+
+def read_in_namelist(namelist, namelist_str):
+    """Adds the keypairs in the body of a fortran namelist
+    (between &NAME and /) to namelist
+
+    """
+    key_names = _namelist_key_names.get(namelist.__class__)
+    if key_names is None:
+        key_names = {key.lower(): key for key in namelist.keys}
+        _namelist_key_names[namelist.__class__] = key_names
+
+    for key_str, value_str in keypair_regex.findall(namelist_str):
+        key, index = namelist.parse_key(key_str)
+
+        keyinfo = namelist.get_key_info(key_names.get(key.lower(), key))
+        if not keyinfo:
+            error_str = "{0} key: '{1}' invalid name"
+            raise Exception(error_str.format(namelist.name, key))
+
+        if index:
+            key_str = "{0}({1})".format(keyinfo.key, ','.join(map(str, index)))
+        else:
+            key_str = keyinfo.key
+        namelist.add_keypair((key_str, qe_namelist_value(value_str, keyinfo.type)))
+
+
+def read_in_cards(qe, cards_str):
+    """Adds the cards (ATOMIC_SPECIES, ATOMIC_POSITIONS, K_POINTS,
+    CELL_PARAMETERS) following the namelists to qe
+
+    """
+    cards = []
+    for line in cards_str.splitlines():
+        values = line.split()
+        if not values:
+            continue
+
+        match = card_regex.match(line)
+        if match and match.group(1).upper() in card_names:
+            name = match.group(1).upper()
+            option = match.group(2) or match.group(3)
+            cards.append([name, option.lower() if option else None, []])
+        elif cards:
+            cards[-1][2].append(values)
+        else:
+            error_str = "line '{0}' not part of any card"
+            raise Exception(error_str.format(line.strip()))
+
+    for name, option, lines in cards:
+        if name == "ATOMIC_SPECIES":
+            for symbol, mass, pseudopot in lines:
+                qe.atomic_species.add_atom_type(symbol, qe_float(mass), pseudopot)
+        elif name == "ATOMIC_POSITIONS":
+            symbols = [values[0] for values in lines]
+            positions = [[qe_float(_) for _ in values[1:4]] for values in lines]
+            if_pos = None
+            if any(len(values) > 4 for values in lines):
+                if_pos = [[int(_) for _ in values[4:7]] if len(values) > 4 else [1, 1, 1]
+                          for values in lines]
+            qe.atomic_positions.set_positions(symbols, positions, option or "alat", if_pos)
+        elif name == "K_POINTS":
+            option = option or "tpiba"
+            if option == "automatic":
+                values = [int(_) for _ in lines[0]]
+                qe.k_points.from_monkhorst_pack(values[0:3], values[3:6])
+            elif option == "gamma":
+                qe.k_points.option = "gamma"
+            else:
+                nks = int(lines[0][0])
+                kpoints = [[qe_float(_) for _ in values[0:3]] for values in lines[1:nks+1]]
+                weights = [qe_float(values[3]) for values in lines[1:nks+1]]
+                qe.k_points.from_list(kpoints, weights, option)
+        elif name == "CELL_PARAMETERS":
+            vecs = [[qe_float(_) for _ in values] for values in lines[0:3]]
+            qe.cell_parameters.add_lattice_vec(*vecs, option=option or "alat")
+        else:
+            error_str = "card {0} not implemented"
+            raise Exception(error_str.format(name))
+
+
+def read_in_string(input_str, validate=False):
+    """Reads a pw.x input (fortran namelists followed by cards) and
+    returns the populated PWBase. Keypairs and cards are validated
+    (domain and range) as they are added. If `validate` the complete
+    configuration is validated (see PWBase.validate) which checks
+    the directories exist on this machine.
+
+    """
+    from pyqe.espresso import PWBase
+
+    qe = PWBase()
+
+    input_str = comment_regex.sub(r"\1", input_str)
+
+    end = 0
+    for match in namelist_regex.finditer(input_str):
+        namelist = qe.namelist_asoc.get(match.group(1).lower())
+        if namelist is None:
+            error_str = "{0} is not valid namelist"
+            raise Exception(error_str.format(match.group(1)))
+
+        read_in_namelist(namelist, match.group(2))
+        end = match.end()
+
+    read_in_cards(qe, input_str[end:])
+
+    if validate:
+        qe.validate()
+
+    return qe
+
+
+def read_in_file(filename, validate=False):
+    """Reads pw.x input file `filename` (see read_in_string)
+
+    """
+    with open(filename) as f:
+        return read_in_string(f.read(), validate)
+
+
+def read_upf_valence(filename):
+    """Reads the number of valence electrons (z_valence) of a UPF
+    (v1 or v2) pseudopotential file
+
+    """
+    with open(filename) as f:
+        upf_str = f.read()
+
+    match = re.search(r'z_valence\s*=\s*"\s*([-+.\deEdD]+)\s*"', upf_str) or \
+        re.search(r'([-+.\deEdD]+)\s+Z valence', upf_str)
+    if not match:
+        error_str = "z_valence not found in pseudopotential {0}"
+        raise Exception(error_str.format(filename))
+    return qe_float(match.group(1))
+
+
+def read_out_file(output_str, tracer=None):
     """
     This functions takes the output file and breaks it into chunks for
     easier parsing. After file is broken into chunks functions are
     used to parse the section for information 
 
+    tracer (pyqe.trace.Tracer) records the time spent in each section
+    and the bytes parsed.
     """
+    count(tracer, "bytes parsed", len(output_str))
+
     # Determine if a force/stress/normal calculation was done
     # a differnt regex much be used for each type... I know right?!?!
     if re.search("entering subroutine stress \.\.\.", output_str):
@@ -95,6 +290,33 @@ def read_out_file(output_str):
         r"Largest temporary arrays",
         re.DOTALL)
 
+    footer_regex = re.compile(
+        "init_run     :"
+        ".+?$",
+        re.DOTALL)
+
+    header_str = output_str[:header_regex.search(output_str).end()]
+    footer_str = output_str[footer_regex.search(output_str).start():]
+
+    with span(tracer, "read_out_header"):
+        header = read_out_header(header_str)
+    with span(tracer, "read_out_footer"):
+        timing = read_out_footer(footer_str)
+
+    results = {"header": header,
+               "footer": footer_str,
+               "timing": timing}
+
+    with span(tracer, "read_out_calculation"):
+        read_out_steps(output_str, results, scf_block_regex, footer_regex)
+    return results
+
+
+def read_out_steps(output_str, results, scf_block_regex, footer_regex):
+    """Adds the calculation (scf, relax, vc-relax, md) found in
+    output_str to results
+
+    """
     bfgs_regex = re.compile(
         "BFGS Geometry Optimization"
         ".+?"
@@ -126,21 +348,11 @@ def read_out_file(output_str):
         re.DOTALL)
 
     final_bfgs_block_regex = re.compile(
-        "Final enthalpy"
+        "Final (?:enthalpy|energy)"
         ".+?"
         "End final coordinates",
         re.DOTALL)
 
-    footer_regex = re.compile(
-        "init_run     :"
-        ".+?$",
-        re.DOTALL)
-
-    header_str = output_str[:header_regex.search(output_str).end()]
-    footer_str = output_str[footer_regex.search(output_str).start():]
-
-    results = {"header": read_out_header(header_str),
-               "footer": footer_str}
 
     # vc-relax or relax calculation (BFGS)
     if bfgs_regex.search(output_str):
@@ -169,7 +381,77 @@ def read_out_file(output_str):
         assert len(scf_step) == 1
         results.update({"calculation": read_out_scf(scf_step[0])})
 
-    return results
+
+timing_regex = re.compile(
+    r"^\s*([\w*:]+)\s*:\s*((?:[\d.]+[hms]\s*)+)CPU\s*((?:[\d.]+[hms]\s*)+)WALL"
+    r"(?:\s*\(\s*(\d+)\s+calls\))?",
+    re.MULTILINE)
+timing_section_regex = re.compile(
+    r"^\s*(?:Called by ([\w*]+):|(General routines|Parallel routines))\s*$",
+    re.MULTILINE)
+
+
+def qe_time(time_str):
+    """Converts a pw.x time '1h23m', '2m 3.45s' or '0.15s' to seconds
+
+    """
+    units = {'h': 3600.0, 'm': 60.0, 's': 1.0}
+    return sum(float(value) * units[unit] for value, unit in
+               re.findall(r"([\d.]+)([hms])", time_str))
+
+
+def read_out_footer(footer_str):
+    """Parses the timing report at the end of pw.x output into
+    {routine: [{'cpu', 'wall', 'calls', 'caller'}, ...]} with times in
+    seconds. A routine has one entry per section it appears in (eg.
+    h_psi called by several routines) in the order of the report.
+    caller is the routine of the "Called by" section (None for the top
+    level, general and parallel routines).
+
+    timing['PWSCF'][0]['wall']  # wall time of the run
+
+    """
+    sections = [(match.start(), match.group(1)) for match in
+                timing_section_regex.finditer(footer_str)]
+
+    timing = {}
+    section = 0
+    caller = None
+    for match in timing_regex.finditer(footer_str):
+        while section < len(sections) and sections[section][0] < match.start():
+            caller = sections[section][1]
+            section += 1
+
+        routine, cpu, wall, calls = match.groups()
+        timing.setdefault(routine, []).append({'cpu': qe_time(cpu),
+                                               'wall': qe_time(wall),
+                                               'calls': int(calls) if calls else 1,
+                                               'caller': caller})
+    return timing
+
+
+def aggregate_timings(timings):
+    """Sums the timing tables (see read_out_footer) of many runs
+    into one table. Entries of a routine with the same caller are
+    summed into the total 'cpu', 'wall' and 'calls' with the number
+    of 'runs' they appeared in.
+
+    """
+    total = {}
+    for timing in timings:
+        for routine, entries in timing.items():
+            routine_total = total.setdefault(routine, [])
+            for values in entries:
+                entry = next((_ for _ in routine_total if _['caller'] == values['caller']), None)
+                if entry is None:
+                    entry = {'cpu': 0.0, 'wall': 0.0, 'calls': 0,
+                             'caller': values['caller'], 'runs': 0}
+                    routine_total.append(entry)
+                entry['cpu'] += values['cpu']
+                entry['wall'] += values['wall']
+                entry['calls'] += values['calls']
+                entry['runs'] += 1
+    return total
 
 
 def read_out_header(header_str):
@@ -188,7 +470,7 @@ def read_out_header(header_str):
         "bravais-lattice index": (
             r"bravais-lattice index\s+=\s+({1})", float),
         "lattice parameter": (
-            r"lattice parameter \(alat\)\s+=\s+({0}) a\.u\.", float),
+            r"lattice parameter \(alat\)\s+=\s+({0})\s+a\.u\.", float),
         "volume": (
             r"unit-cell volume\s+=\s+({0}) \(a\.u\.\)\^3", float),
         "number atoms/cell": (
@@ -198,7 +480,7 @@ def read_out_header(header_str):
         "number electrons": (
             r"number of electrons\s+=\s+({0})", float),
         "number of Kohn Sham states": (
-            r"number of Kohn Sham states\s*=\s+({1})", int),
+            r"number of Kohn[- ]Sham states\s*=\s+({1})", int),
         "kinetic-energy cutoff": (
             r"kinetic-energy cutoff\s+=\s+({0})\s+Ry", float),
         "charge density cutoff": (
@@ -260,6 +542,22 @@ def read_out_header(header_str):
         kpoints.append([match[0], [match[1], match[2], match[3]], match[4]])
     header.update({"kpoints": kpoints})
 
+    match = re.search(r"number of k points=\s*({0})".format(int_regex), header_str)
+    if match:
+        header.update({"number kpoints": int(match.group(1))})
+
+    # Atomic species (symbol, valence, mass)
+    atom_species_regex = r"^\s+(\w+)\s+({0})\s+({0})\s+\w+\(\s*{0}\)\s*$"
+    matches = re.findall(
+        atom_species_regex.format(double_regex),
+        header_str, re.MULTILINE)
+    header.update({"atomic species": [[match[0], float(match[1]), float(match[2])] for match in matches]})
+
+    # Pseudopotential files (symbol -> filename)
+    pseudo_regex = r"PseudoPot\.\s*#\s*{0}\s+for\s+(\w+)\s+read from file:?\s+(\S+)"
+    matches = re.findall(pseudo_regex.format(int_regex), header_str)
+    header.update({"pseudopotentials": {symbol: filename for symbol, filename in matches}})
+
     return header
 
 
@@ -292,9 +590,48 @@ def read_out_scf(scf_block):
         scf_step.update({"stress": [stress[0:3],
                                     stress[3:6],
                                     stress[6:9]]})
+
+    scf_step.update({"scf convergence": read_out_scf_convergence(scf_block)})
     return scf_step
 
 
+scf_iteration_regex = re.compile(r"iteration #\s*(\d+)")
+scf_convergence_regexes = {
+    "beta": re.compile(r"beta\s*=\s*({0})".format(number_regex)),
+    "ethr": re.compile(r"ethr\s*=\s*({0})".format(number_regex)),
+    "cpu time": re.compile(r"total cpu time spent up to now is\s+({0}) secs".format(number_regex)),
+    "energy": re.compile(r"total energy\s+=\s+({0}) Ry".format(number_regex)),
+    "estimated scf accuracy": re.compile(r"estimated scf accuracy\s+<\s+({0}) Ry".format(number_regex)),
+}
+
+
+def read_out_scf_convergence(scf_block):
+    """Reads the convergence trace of an scf cycle. Returns arrays
+    with one value per scf iteration (nan if not printed):
+
+    - iteration
+    - energy (Ry) (total energy, '!' energy for the last iteration)
+    - estimated scf accuracy (Ry)
+    - cpu time (total cpu time spent up to the iteration)
+    - ethr (diagonalization threshold)
+    - beta (mixing beta)
+    """
+    matches = list(scf_iteration_regex.finditer(scf_block))
+
+    ends = [match.start() for match in matches[1:]] + [len(scf_block)]
+    iterations = [int(match.group(1)) for match in matches]
+    convergence = {key: np.full(len(matches), np.nan) for key in scf_convergence_regexes}
+    for i, (match, end) in enumerate(zip(matches, ends)):
+        iteration_str = scf_block[match.end():end]
+        for key, regex in scf_convergence_regexes.items():
+            value = regex.search(iteration_str)
+            if value:
+                convergence[key][i] = qe_float(value.group(1))
+
+    convergence.update({"iteration": np.array(iterations, dtype=int)})
+    return convergence
+
+
 def read_out_iteration(iteration_block):
     """Reads the itterations step
     vc-relax, relax, md
@@ -306,6 +643,7 @@ def read_out_iteration(iteration_block):
         r"\s+({0})\s+({0})\s+({0})"
         r"\s+({0})\s+({0})\s+({0})"
     ).format(double_regex)
+    lattice_units_regex = r"CELL_PARAMETERS\s*\((\w+)(?:=\s*({0}))?\)".format(double_regex)
     ion_position_regex = "([A-Z][a-z]?)\s+({0})\s+({0})\s+({0})".format(double_regex)
 
     iteration_step = {}
@@ -322,10 +660,20 @@ def read_out_iteration(iteration_block):
                                            lattice[3:6],
                                            lattice[6:9]]})
 
+    match = re.search(lattice_units_regex, iteration_block)
+    if match:
+        iteration_step.update({"lattice units": match.group(1)})
+        if match.group(2):
+            iteration_step.update({"lattice alat": float(match.group(2))})
+
     match = re.findall(ion_position_regex, iteration_block)
     if match:
         iteration_step.update({"ion positions": [[_[0], float(_[1]), float(_[2]), float(_[3])] for _ in match]})
 
+    match = re.search(r"ATOMIC_POSITIONS\s*\((\w+)\)", iteration_block)
+    if match:
+        iteration_step.update({"ion positions units": match.group(1)})
+
     return iteration_step
 
 
@@ -356,7 +704,100 @@ def read_out_calculation(iteration_steps):
     return calculation
 
 
-def read_data_file(inputfile):
+def pwbase_from_out(out_results, final_geometry=True, pseudo_dir=None):
+    """Builds a runnable PWBase from the results of read_out_file so a
+    calculation can be re-run (or continued) without its input.
+
+    The cell is written as CELL_PARAMETERS in alat units (ibrav=0,
+    celldm(1)=alat, also for vc-relax cells printed in bohr/angstrom),
+    the k-points as the list printed by pw.x (in crystal coordinates
+    so they remain valid if the cell changes). Species masses and
+    pseudopotentials are read from the header.
+
+    final_geometry - for relax, vc-relax and md outputs use the
+                     lattice and positions of the last iteration
+                     (a restart input) rather than the initial ones.
+    pseudo_dir     - default is directory of pseudopotential files
+                     read by pw.x
+
+    *Namelist keys not printed in the output header (calculation,
+    prefix, occupations, ...) are left to their defaults*
+    """
+    from pyqe.espresso import PWBase
+
+    header = out_results["header"]
+    qe = PWBase()
+
+    qe.system.add_keypairs({
+        "ibrav": 0,
+        "celldm(1)": header["lattice parameter"],
+        "nat": header["number atoms/cell"],
+        "ntyp": header["number atom types"],
+        "ecutwfc": header["kinetic-energy cutoff"],
+        "ecutrho": header["charge density cutoff"],
+    })
+    if "number of Kohn Sham states" in header:
+        qe.system.add_keypair(("nbnd", header["number of Kohn Sham states"]))
+
+    if "convergence threshold" in header:
+        qe.electrons.add_keypair(("conv_thr", header["convergence threshold"]))
+    if "mixing beta" in header:
+        qe.electrons.add_keypair(("mixing_beta", header["mixing beta"]))
+
+    # Species and pseudopotentials
+    pseudopotentials = header.get("pseudopotentials", {})
+    for symbol, valence, mass in header["atomic species"]:
+        pseudo_file = pseudopotentials.get(symbol)
+        if pseudo_file is None:
+            error_str = "pseudopotential file for {0} not found in output"
+            raise Exception(error_str.format(symbol))
+        qe.atomic_species.add_atom_type(symbol, mass, os.path.basename(pseudo_file))
+
+        if pseudo_dir is None:
+            pseudo_dir = os.path.dirname(pseudo_file)
+    if pseudo_dir:
+        qe.control.add_keypair(("pseudo_dir", pseudo_dir))
+
+    # Geometry (positions of header are in alat units)
+    lattice, lattice_option = header["crystal axes"], "alat"
+    positions = [[symbol, position] for index, symbol, position in header["atom positions"]]
+    positions_option = "alat"
+
+    iteration = out_results.get("calculation", {})
+    if final_geometry and "ion positions" in iteration:
+        positions = [[_[0], _[1:4]] for _ in iteration["ion positions"]]
+        positions_option = iteration.get("ion positions units", "alat")
+    if final_geometry and "lattice" in iteration:
+        lattice = [_ for vec in iteration["lattice"] for _ in vec]
+        lattice_option = iteration.get("lattice units", "alat")
+        if lattice_option == "alat" and "lattice alat" in iteration:
+            qe.system.add_keypair(("celldm(1)", iteration["lattice alat"]))
+
+    # pw.x rejects celldm(1) with CELL_PARAMETERS in bohr or angstrom
+    if lattice_option != "alat":
+        from pyqe.lattice import to_bohr
+        alat = qe.system.get_current_value("celldm", (1,))
+        lattice = list(to_bohr(lattice, lattice_option) / alat)
+        lattice_option = "alat"
+
+    qe.cell_parameters.add_lattice_vec(lattice[0:3], lattice[3:6], lattice[6:9], lattice_option)
+    qe.atomic_positions.set_positions(
+        [_[0] for _ in positions], [_[1] for _ in positions], positions_option)
+
+    # KPoints cart. coord. in units 2pi/alat -> crystal
+    nks = header.get("number kpoints", len(header["kpoints"]))
+    if len(header["kpoints"]) < nks:
+        raise Exception("kpoints not listed in output (requires verbosity='high')")
+
+    axes = np.array(header["crystal axes"]).reshape(3, 3)
+    kpoints = np.array([[float(_) for _ in kpoint[1]] for kpoint in header["kpoints"][:nks]])
+    weights = [float(kpoint[2]) for kpoint in header["kpoints"][:nks]]
+    qe.k_points.from_list(np.dot(kpoints, axes.T), weights, "crystal")
+
+    return qe
+
+
+def read_data_file(inputfile, tracer=None):
     """Reads `data-file.xml` file.
 
     Returns a data structure with all the information about the saved run.
@@ -373,9 +814,14 @@ def read_data_file(inputfile):
 
     Implemented:
     CHARGE-DENSITY, EIGENVALUES, EXCHANGE-CORRELATION, BAND-STRUCTURE-INFO
+
+    tracer (pyqe.trace.Tracer) records the time spent reading each
+    file and the bytes read.
     """
-    tree = ET.parse(inputfile)
-    root = tree.getroot()
+    with span(tracer, "read data-file.xml"):
+        count(tracer, "bytes read", os.path.getsize(inputfile))
+        tree = ET.parse(inputfile)
+        root = tree.getroot()
 
     data = {}
 
@@ -397,8 +843,10 @@ def read_data_file(inputfile):
 
     # TAG: CHARGE-DENSITY
     charge_density_file = root.find("CHARGE-DENSITY").attrib.get("iotk_link")
-    data.update({"charge-density": read_charge_density_file(
-            os.path.dirname(inputfile) + '/' + charge_density_file)})
+    charge_density_file = os.path.dirname(inputfile) + '/' + charge_density_file
+    with span(tracer, "read_charge_density_file"):
+        count(tracer, "bytes read", os.path.getsize(charge_density_file))
+        data.update({"charge-density": read_charge_density_file(charge_density_file)})
 
     # TAG: EIGENVALUES (Really K-Point information)
     eigenvalues_tag = root.find("EIGENVALUES")
@@ -410,8 +858,10 @@ def read_data_file(inputfile):
         }
 
         eigenvalue_file = eigenvalue_tag.find("DATAFILE").attrib.get("iotk_link")
-        kpoint.update(read_eigenvalue_file(
-            os.path.dirname(inputfile) + '/' + eigenvalue_file))
+        eigenvalue_file = os.path.dirname(inputfile) + '/' + eigenvalue_file
+        with span(tracer, "read_eigenvalue_file"):
+            count(tracer, "bytes read", os.path.getsize(eigenvalue_file))
+            kpoint.update(read_eigenvalue_file(eigenvalue_file))
 
         kpoints.append(kpoint)
     data.update({"kpoints": kpoints})
@@ -429,9 +879,11 @@ def read_charge_density_file(inputfile):
 
     zaxis_charge_slice
         12 bytes - header (I dont know what it is yet)
-        nr1*nr2 doubles (8 bytes each)
+        nr1*nr2 doubles (8 bytes each, x fastest)
         24 bytes - footer (I dont know what it is yet)
 
+    Returns the density array with shape (nr1, nr2, nr3).
+
     Why on earth did they make Charge density a binary/xml file?!?
     """
     f = open(inputfile, "rb")
@@ -449,14 +901,192 @@ def read_charge_density_file(inputfile):
     ).format(nr1*nr2*8)
 
     matches = re.findall(nrz_regex.encode(), charge_xml_str, re.DOTALL)
+    if len(matches) != nr3:
+        error_str = "{0} has {1} of {2} z slices"
+        raise Exception(error_str.format(inputfile, len(matches), nr3))
+
+    # Slices are stored with x fastest then y then z (fortran order)
+    byte_str = b"".join(match[4] for match in matches)
+    charge_data = np.frombuffer(byte_str, dtype="<f8").reshape((nr1, nr2, nr3), order='F')
+    return charge_data.copy(order='F')
+
+
+chemical_symbols = [
+    'X', 'H', 'He', 'Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne',
+    'Na', 'Mg', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar', 'K', 'Ca',
+    'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn',
+    'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr', 'Rb', 'Sr', 'Y', 'Zr',
+    'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn',
+    'Sb', 'Te', 'I', 'Xe', 'Cs', 'Ba', 'La', 'Ce', 'Pr', 'Nd',
+    'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho', 'Er', 'Tm', 'Yb',
+    'Lu', 'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au', 'Hg',
+    'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn', 'Fr', 'Ra', 'Ac', 'Th',
+    'Pa', 'U', 'Np', 'Pu', 'Am', 'Cm', 'Bk', 'Cf', 'Es', 'Fm',
+    'Md', 'No', 'Lr']
+
+
+def atomic_number(symbol):
+    """Returns the atomic number of symbol ('Si', 'Si1', 'Fe_up')
+    or 0 if it is not a chemical symbol
+
+    """
+    match = re.match("[A-Z][a-z]?", str(symbol))
+    if match and match.group() in chemical_symbols:
+        return chemical_symbols.index(match.group())
+    return 0
+
+
+_values_formats = {}
 
-    data = []
-    for nrz, _type, size, kind, byte_str in matches:
-        data += struct.unpack("d"*nr1*nr2, byte_str)
 
-    charge_data = np.array(data, order='F', ndmin=3)
-    charge_data.shape = [nr1, nr2, nr3]
-    return charge_data
+def _values_format(nvalues, per_line, value_format):
+    """Returns the format string of nvalues written per_line values
+    per line (cached) so a whole slice is formatted by one % operation
+
+    """
+    key = (nvalues, per_line, value_format)
+    if key not in _values_formats:
+        line = value_format * per_line + "\n"
+        last = nvalues % per_line
+        _values_formats[key] = line * (nvalues // per_line) + \
+            (value_format * last + "\n" if last else "")
+    return _values_formats[key]
+
+
+def _atoms(positions, symbols):
+    positions = np.zeros((0, 3)) if positions is None else np.asarray(positions, dtype=float)
+    symbols = symbols if symbols is not None else ['X'] * len(positions)
+    if len(symbols) != len(positions):
+        error_str = "number of symbols {0} does not match number of positions {1}"
+        raise Exception(error_str.format(len(symbols), len(positions)))
+    numbers = [symbol if isinstance(symbol, (int, np.integer)) else atomic_number(symbol)
+               for symbol in symbols]
+    return positions.reshape(-1, 3), numbers
+
+
+def write_cube(outputfile, density, cell, positions=None, symbols=None,
+               comment="pyqe charge density", origin=(0.0, 0.0, 0.0),
+               angstrom=False):
+    """Writes density (shape (nr1, nr2, nr3), electrons/bohr^3) as a
+    gaussian cube file. Written one x slice at a time.
+
+    cell      - lattice vectors (rows) in bohr
+    positions - cartesian positions of the atoms in bohr
+    symbols   - chemical symbols (or atomic numbers) of the atoms
+    angstrom  - write lengths in angstrom (negative numbers of voxels)
+    """
+    nr1, nr2, nr3 = np.shape(density)
+    cell = np.asarray(cell, dtype=float).reshape(3, 3)
+    positions, numbers = _atoms(positions, symbols)
+    origin = np.asarray(origin, dtype=float)
+    sign = 1
+    if angstrom:
+        from pyqe.lattice import bohr
+        cell, positions, origin = cell * bohr, positions * bohr, origin * bohr
+        sign = -1
+
+    with open(outputfile, "w") as f:
+        f.write("{0}\nouter loop x, middle loop y, inner loop z\n".format(comment))
+        f.write("{0:5d} {1:12.6f} {2:12.6f} {3:12.6f}\n".format(len(positions), *origin))
+        for n, vector in zip((nr1, nr2, nr3), cell):
+            f.write("{0:5d} {1:12.6f} {2:12.6f} {3:12.6f}\n".format(sign * n, *(vector / n)))
+        for number, position in zip(numbers, positions):
+            f.write("{0:5d} {1:12.6f} {2:12.6f} {3:12.6f} {4:12.6f}\n".format(
+                number, float(number), *position))
+
+        values_format = _values_format(nr3, 6, " %12.5E") * nr2
+        for i in range(nr1):
+            f.write(values_format % tuple(np.asarray(density[i], dtype=float).ravel().tolist()))
+
+
+def read_cube(inputfile):
+    """Reads a gaussian cube file. Returns a dictionary with the
+    density (shape (nr1, nr2, nr3)), cell (bohr), origin, positions
+    (bohr), atomic numbers and comment.
+
+    """
+    with open(inputfile) as f:
+        comment = f.readline().rstrip("\n")
+        f.readline()
+        natoms, *origin = f.readline().split()[:4]
+        natoms = int(natoms)
+        shape, cell = [], []
+        for i in range(3):
+            n, *vector = f.readline().split()[:4]
+            shape.append(int(n))
+            cell.append([float(_) for _ in vector])
+        if natoms < 0:
+            error_str = "cube files with orbitals (natoms < 0) are not supported"
+            raise Exception(error_str)
+
+        numbers, positions = [], []
+        for i in range(natoms):
+            number, charge, *position = f.readline().split()[:5]
+            numbers.append(int(number))
+            positions.append([float(_) for _ in position])
+
+        density = np.array(f.read().split(), dtype=float)
+
+    # negative numbers of voxels mean the file is in angstrom
+    angstrom = any(n < 0 for n in shape)
+    shape = [abs(n) for n in shape]
+    if density.size != np.prod(shape):
+        error_str = "{0} has {1} values but grid {2}"
+        raise Exception(error_str.format(inputfile, density.size, shape))
+
+    cell = np.array(cell) * np.array(shape)[:, np.newaxis]
+    positions = np.array(positions, dtype=float)
+    origin = np.array(origin, dtype=float)
+    if angstrom:
+        from pyqe.lattice import bohr
+        cell, positions, origin = cell / bohr, positions / bohr, origin / bohr
+    return {"density": density.reshape(shape),
+            "cell": cell,
+            "origin": origin,
+            "positions": positions.reshape(-1, 3),
+            "numbers": numbers,
+            "comment": comment}
+
+
+def write_xsf(outputfile, density, cell, positions=None, symbols=None,
+              name="charge_density"):
+    """Writes the crystal and density (shape (nr1, nr2, nr3)) as an
+    xcrysden XSF file (angstrom, periodic general grid including the
+    end points). Written one z slice at a time.
+
+    cell      - lattice vectors (rows) in bohr
+    positions - cartesian positions of the atoms in bohr
+    symbols   - chemical symbols (or atomic numbers) of the atoms
+    """
+    from pyqe.lattice import bohr
+
+    nr1, nr2, nr3 = np.shape(density)
+    cell = np.asarray(cell, dtype=float).reshape(3, 3) * bohr
+    positions, numbers = _atoms(positions, symbols)
+    positions = positions * bohr
+
+    with open(outputfile, "w") as f:
+        f.write("CRYSTAL\nPRIMVEC\n")
+        for vector in cell:
+            f.write(" {0:14.8f} {1:14.8f} {2:14.8f}\n".format(*vector))
+        f.write("PRIMCOORD\n{0} 1\n".format(len(positions)))
+        for number, position in zip(numbers, positions):
+            f.write("{0:3d} {1:14.8f} {2:14.8f} {3:14.8f}\n".format(number, *position))
+
+        f.write("BEGIN_BLOCK_DATAGRID_3D\n {0}\n BEGIN_DATAGRID_3D_{0}\n".format(name))
+        f.write(" {0} {1} {2}\n".format(nr1 + 1, nr2 + 1, nr3 + 1))
+        f.write(" {0:14.8f} {1:14.8f} {2:14.8f}\n".format(0.0, 0.0, 0.0))
+        for vector in cell:
+            f.write(" {0:14.8f} {1:14.8f} {2:14.8f}\n".format(*vector))
+
+        # x fastest, then y, then z, repeating the first point of each axis
+        ix, iy = np.arange(nr1 + 1) % nr1, np.arange(nr2 + 1) % nr2
+        values_format = _values_format((nr1 + 1) * (nr2 + 1), 6, " %13.6E")
+        for k in range(nr3 + 1):
+            plane = np.asarray(density[:, :, k % nr3], dtype=float)[np.ix_(ix, iy)]
+            f.write(values_format % tuple(plane.ravel(order='F').tolist()))
+        f.write(" END_DATAGRID_3D\nEND_BLOCK_DATAGRID_3D\n")
+
 
 def read_eigenvalue_file(inputfile):
     """Reads the output files for kpoints generated by pw.x
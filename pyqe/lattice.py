@@ -0,0 +1,399 @@
+"""
+Lattice geometry and symmetry helpers
+
+Lattices are (3,3) arrays with the lattice vectors as rows, in bohr
+(QE atomic units) unless stated otherwise. Fractional (crystal)
+coordinates x are converted to cartesian as r = x . cell
+
+bohr - bohr radius in angstrom
+"""
+from itertools import product
+
+import numpy as np
+
+bohr = 0.52917721067
+
+
+def to_bohr(values, option, alat=None):
+    """Converts cartesian values in units of option (bohr, angstrom,
+    alat) to bohr. alat (celldm(1) in bohr) is required for 'alat'.
+
+    """
+    values = np.array(values, dtype=float)
+    if option == "bohr":
+        return values
+    elif option == "angstrom":
+        return values / bohr
+    elif option == "alat":
+        if alat is None:
+            raise Exception("alat (celldm(1)) required for 'alat' units")
+        return values * alat
+
+    error_str = "units {0} can not be converted to bohr"
+    raise Exception(error_str.format(option))
+
+
+def reciprocal_lattice(cell):
+    """Returns the reciprocal lattice vectors b_i (rows) with
+    a_i . b_j = 2 pi delta_ij
+
+    """
+    return 2.0 * np.pi * np.linalg.inv(cell).T
+
+
+def cell_volume(cell):
+    return abs(np.linalg.det(cell))
+
+
+# All integer matrices with entries -1, 0, 1 (candidate rotations)
+_candidate_rotations = None
+
+
+def lattice_point_group(cell, symprec=1e-5):
+    """Returns the rotations (n,3,3) in fractional coordinates
+    (x' = R x) that leave the lattice invariant (R^T G R = G for the
+    metric G). The cell should be reduced (as required by pw.x) so
+    that the rotations only have entries -1, 0, 1.
+
+    """
+    global _candidate_rotations
+    if _candidate_rotations is None:
+        _candidate_rotations = np.array(
+            list(product((0, 1, -1), repeat=9)), dtype=int).reshape(-1, 3, 3)
+        dets = np.round(np.linalg.det(_candidate_rotations))
+        _candidate_rotations = _candidate_rotations[np.abs(dets) == 1]
+
+    cell = np.array(cell, dtype=float)
+    metric = np.dot(cell, cell.T)
+    rotated_metric = np.einsum('nji,jk,nkl->nil',
+                               _candidate_rotations, metric, _candidate_rotations)
+    error = np.abs(rotated_metric - metric).reshape(-1, 9).max(axis=1)
+    return _candidate_rotations[error < symprec * np.trace(metric)]
+
+
+# Offsets of a bin and its 26 neighbours
+_neighbour_bins = np.array(list(product((0, -1, 1), repeat=3)), dtype=int)
+
+
+def _periodic_bins(cell, natoms, symprec):
+    """Returns the number of bins along each axis of the fractional
+    coordinates. Bins are at least symprec wide (cartesian) so an atom
+    within symprec of a position is in its bin or a neighbouring one,
+    and at most about two per atom along each axis.
+
+    """
+    width = symprec * np.linalg.norm(np.linalg.inv(cell), axis=0)
+    most = 2 * int(np.ceil(natoms ** (1.0 / 3.0)))
+    return np.clip(np.floor(1.0 / width), 1, most).astype(int)
+
+
+def _bin_keys(species, bins, index):
+    """Returns the key of the bins (n,3) of atoms of species (n,)"""
+    return ((species * bins[0] + index[:, 0]) * bins[1] + index[:, 1]) * bins[2] + index[:, 2]
+
+
+def _has_match(points, point_species, positions, cell, bins, order, keys,
+               symprec):
+    """Returns whether each point (fractional (n,3) of point_species)
+    is within symprec of an atom of the same species at positions.
+    Atoms are looked up by the sorted keys of their bins so memory
+    grows with the number of points (not the number of pairs).
+
+    """
+    index = np.floor(np.mod(points, 1.0) * bins).astype(int) % bins
+    matched = np.zeros(len(points), dtype=bool)
+    unmatched = np.arange(len(points))
+    for offset in _neighbour_bins:
+        neighbour = _bin_keys(point_species[unmatched], bins, (index[unmatched] + offset) % bins)
+        start = np.searchsorted(keys, neighbour, "left")
+        counts = np.searchsorted(keys, neighbour, "right") - start
+
+        # pairs (point, atom) of the atoms in the neighbouring bin
+        point = np.repeat(unmatched, counts)
+        atom = order[np.arange(counts.sum()) + np.repeat(start - np.cumsum(counts) + counts, counts)]
+        diff = points[point] - positions[atom]
+        diff -= np.round(diff)
+        matched[point[np.linalg.norm(np.dot(diff, cell), axis=1) < symprec]] = True
+
+        unmatched = np.flatnonzero(~matched)
+        if len(unmatched) == 0:
+            break
+    return matched
+
+
+def space_group_operations(cell, positions, numbers, symprec=1e-5):
+    """Returns the space group operations (rotations (n,3,3),
+    translations (n,3)) of the crystal in fractional coordinates.
+    x' = R x + t
+
+    cell      - (3,3) lattice
+    positions - (N,3) fractional positions
+    numbers   - (N,) species of each atom
+    symprec   - distance tolerance (units of cell)
+    """
+    cell = np.array(cell, dtype=float)
+    positions = np.array(positions, dtype=float)
+    species = np.unique(np.asarray(numbers), return_inverse=True)[1].ravel()
+
+    # Atoms sorted by (species, bin of wrapped fractional position)
+    bins = _periodic_bins(cell, len(positions), symprec)
+    keys = _bin_keys(species, bins, np.floor(np.mod(positions, 1.0) * bins).astype(int) % bins)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+
+    def match(points, point_species):
+        return _has_match(points, point_species, positions, cell, bins,
+                          order, keys, symprec)
+
+    # Candidate translations map an atom of the least common species
+    reference = np.flatnonzero(species == np.argmin(np.bincount(species)))
+    # Atoms checked for all candidates at once before the full check
+    probes = np.unique(np.linspace(0, len(positions) - 1, 8).astype(int))
+
+    rotations, translations = [], []
+    for rotation in lattice_point_group(cell, symprec):
+        rotated = np.dot(positions, rotation.T)
+        candidates = positions[reference] - rotated[reference[0]]
+        for probe in probes:
+            candidates = candidates[match(rotated[probe] + candidates,
+                                          np.full(len(candidates), species[probe]))]
+        for translation in candidates:
+            if match(rotated + translation, species).all():
+                rotations.append(rotation)
+                translations.append(translation - np.round(translation))
+                break
+
+    return np.array(rotations), np.array(translations)
+
+
+def monkhorst_pack(grid, offset=(0, 0, 0)):
+    """Returns the (nk1*nk2*nk3,3) Monkhorst-Pack kpoints in crystal
+    coordinates as generated by pw.x (offset 1 shifts by half a step)
+
+    """
+    grid = np.array(grid, dtype=int)
+    offset = np.array(offset, dtype=float)
+    index = np.indices(grid).reshape(3, -1).T
+    return (index + offset / 2.0) / grid
+
+
+def density_monkhorst_pack_grid(cell, density, even=False):
+    """Returns the Monkhorst-Pack grid (nk1, nk2, nk3) with at least
+    density kpoints per 1/angstrom (including 2 pi) along each
+    reciprocal lattice vector (same definition as ASE kpts density).
+
+    cell    - (3,3) lattice in bohr
+    density - kpoints per 1/angstrom
+    even    - round grid up to even numbers
+    """
+    # reciprocal lengths 1/bohr -> 1/angstrom
+    lengths = np.linalg.norm(reciprocal_lattice(cell), axis=1) / bohr
+    grid = np.maximum(1, np.ceil(lengths * density - 1e-8).astype(int))
+    if even:
+        grid += grid % 2
+    return [int(_) for _ in grid]
+
+
+def irreducible_monkhorst_pack(grid, offset, cell, positions, numbers,
+                               symprec=1e-5, time_reversal=True, symmetry=True):
+    """Reduces the Monkhorst-Pack grid to the irreducible kpoints by
+    the symmetry of the crystal (see space_group_operations). If not
+    symmetry only time reversal is used (pw.x nosym).
+
+    Returns: kpoints (n,3) in crystal coordinates and weights (n,)
+             normalized to 1.
+    """
+    grid = np.array(grid, dtype=int)
+    offset = np.array(offset, dtype=float)
+    kpoints = monkhorst_pack(grid, offset)
+
+    if symmetry:
+        rotations, translations = space_group_operations(cell, positions, numbers, symprec)
+    else:
+        rotations = np.identity(3, dtype=int)[None, :, :]
+    # kpoints transform as k' = R^-T k, the group contains R^-1 for each R
+    # so the images of k (rows) are k . R
+    images = np.einsum('kj,nji->nki', kpoints, np.unique(rotations, axis=0))
+    if time_reversal:
+        images = np.concatenate([images, -images])
+
+    # Only operations mapping the grid onto itself reduce the grid
+    steps = images * grid - offset / 2.0
+    on_grid = np.all(np.abs(steps - np.round(steps)) < 1e-6, axis=(1, 2))
+    steps = np.mod(np.round(steps[on_grid]).astype(int), grid)
+    index = np.ravel_multi_index(steps.transpose(2, 0, 1), grid)
+
+    representative = index.min(axis=0)
+    irreducible, counts = np.unique(representative, return_counts=True)
+    return kpoints[irreducible], counts / float(counts.sum())
+
+
+def ibrav_cell(ibrav, celldm):
+    """Returns the lattice (bohr) of pw.x bravais-lattice index ibrav
+    from celldm (list of celldm(1) ... celldm(6)).
+
+    Implemented: 1 (cubic P), 2 (cubic F), 3 (cubic I), 4 (hexagonal),
+    6 (tetragonal P), 8 (orthorhombic P)
+    """
+    a = celldm[0]
+    b_a = celldm[1] if len(celldm) > 1 else 0.0
+    c_a = celldm[2] if len(celldm) > 2 else 0.0
+
+    if ibrav == 1:
+        cell = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
+    elif ibrav == 2:
+        cell = [[-0.5, 0, 0.5], [0, 0.5, 0.5], [-0.5, 0.5, 0]]
+    elif ibrav == 3:
+        cell = [[0.5, 0.5, 0.5], [-0.5, 0.5, 0.5], [-0.5, -0.5, 0.5]]
+    elif ibrav == 4:
+        cell = [[1, 0, 0], [-0.5, np.sqrt(3) / 2, 0], [0, 0, c_a]]
+    elif ibrav == 6:
+        cell = [[1, 0, 0], [0, 1, 0], [0, 0, c_a]]
+    elif ibrav == 8:
+        cell = [[1, 0, 0], [0, b_a, 0], [0, 0, c_a]]
+    else:
+        error_str = "ibrav {0} lattice not implemented"
+        raise Exception(error_str.format(ibrav))
+
+    return a * np.array(cell, dtype=float)
+
+
+# bravais lattice of ibrav
+ibrav_bravais = {1: "cub", 2: "fcc", 3: "bcc", 4: "hex", 6: "tet", 8: "orc"}
+
+
+def bravais_lattice(cell, ibrav=None, tolerance=1e-4):
+    """Returns the bravais lattice (cub, fcc, bcc, hex, tet, orc) of
+    ibrav or by the lengths and angles of the lattice vectors. Cells
+    must be in the orientation used by pw.x (conventional axes along
+    x, y, z and a(1) along x for hexagonal).
+
+    """
+    if ibrav is not None and ibrav != 0:
+        if ibrav not in ibrav_bravais:
+            error_str = "ibrav {0} bravais lattice not implemented"
+            raise Exception(error_str.format(ibrav))
+        return ibrav_bravais[ibrav]
+
+    cell = np.array(cell, dtype=float)
+    lengths = np.linalg.norm(cell, axis=1)
+    cosines = np.array([np.dot(cell[1], cell[2]) / lengths[1] / lengths[2],
+                        np.dot(cell[0], cell[2]) / lengths[0] / lengths[2],
+                        np.dot(cell[0], cell[1]) / lengths[0] / lengths[1]])
+
+    def equal(x, y):
+        return np.all(np.abs(np.array(x) - y) < tolerance * np.max(np.abs(y) + 1.0))
+
+    if equal(lengths, lengths[0]):
+        if equal(cosines, 0.0):
+            return "cub"
+        elif equal(np.abs(cosines), 0.5):
+            return "fcc"
+        elif equal(np.abs(cosines), 1.0 / 3.0):
+            return "bcc"
+    if equal(cosines[0:2], 0.0):
+        if equal(lengths[0], lengths[1]) and equal(abs(cosines[2]), 0.5):
+            return "hex"
+        elif equal(cosines[2], 0.0):
+            if equal(lengths[0], lengths[1]):
+                return "tet"
+            return "orc"
+
+    raise Exception("bravais lattice of cell not recognized")
+
+
+def special_points(bravais, cell):
+    """Returns the high symmetry kpoints {label: k} in cartesian
+    coordinates (1/bohr including 2 pi) of the bravais lattice
+    (G is the gamma point).
+
+    """
+    cell = np.array(cell, dtype=float)
+    lengths = np.linalg.norm(cell, axis=1)
+
+    if bravais == "cub":
+        a = lengths[0]
+        points = {"X": [0, 0.5, 0], "M": [0.5, 0.5, 0], "R": [0.5, 0.5, 0.5]}
+    elif bravais == "fcc":
+        a = lengths[0] * np.sqrt(2)
+        points = {"X": [0, 1, 0], "L": [0.5, 0.5, 0.5], "W": [0.5, 1, 0],
+                  "K": [0.75, 0.75, 0], "U": [0.25, 1, 0.25]}
+    elif bravais == "bcc":
+        a = lengths[0] * 2 / np.sqrt(3)
+        points = {"H": [0, 0, 1], "N": [0.5, 0.5, 0], "P": [0.5, 0.5, 0.5]}
+    elif bravais == "hex":
+        a, c_a = lengths[0], lengths[2] / lengths[0]
+        points = {"M": [0.5, 0.5 / np.sqrt(3), 0], "K": [1 / 3.0, 1 / np.sqrt(3), 0],
+                  "A": [0, 0, 0.5 / c_a], "L": [0.5, 0.5 / np.sqrt(3), 0.5 / c_a],
+                  "H": [1 / 3.0, 1 / np.sqrt(3), 0.5 / c_a]}
+    elif bravais == "tet":
+        a, c_a = lengths[0], lengths[2] / lengths[0]
+        points = {"X": [0, 0.5, 0], "M": [0.5, 0.5, 0], "Z": [0, 0, 0.5 / c_a],
+                  "R": [0, 0.5, 0.5 / c_a], "A": [0.5, 0.5, 0.5 / c_a]}
+    elif bravais == "orc":
+        a, b_a, c_a = lengths[0], lengths[1] / lengths[0], lengths[2] / lengths[0]
+        x, y, z = 0.5, 0.5 / b_a, 0.5 / c_a
+        points = {"X": [x, 0, 0], "Y": [0, y, 0], "Z": [0, 0, z], "S": [x, y, 0],
+                  "U": [x, 0, z], "T": [0, y, z], "R": [x, y, z]}
+    else:
+        error_str = "bravais lattice {0} special points not implemented"
+        raise Exception(error_str.format(bravais))
+
+    points = {label: 2 * np.pi / a * np.array(k, dtype=float) for label, k in points.items()}
+    points["G"] = np.zeros(3)
+    return points
+
+
+# standard band structure paths ('|' breaks the path)
+special_paths = {
+    "cub": "GXMGRX|MR",
+    "fcc": "GXWKGLUWLK|UX",
+    "bcc": "GHNGPH|PN",
+    "hex": "GMKGALHA|LM|KH",
+    "tet": "GXMGZRAZ|XR|MA",
+    "orc": "GXSYGZURTZ|YT|UX|SR",
+}
+
+
+def band_path(cell, density, path=None, ibrav=None):
+    """Returns the kpoints (n,3) along the high symmetry path in
+    cartesian coordinates (1/bohr including 2 pi) and the labels
+    [[index, label], ...] of the special points.
+
+    cell    - (3,3) lattice in bohr
+    density - kpoints per 1/angstrom (including 2 pi) of path
+    path    - string of special point labels ('|' breaks the path)
+              default standard path of the bravais lattice
+    ibrav   - bravais-lattice index (default found from cell)
+    """
+    bravais = bravais_lattice(cell, ibrav)
+    points = special_points(bravais, cell)
+    if path is None:
+        path = special_paths[bravais]
+
+    segments, labels, nks = [], [], 0
+    for branch in path.split('|'):
+        if len(branch) < 2:
+            error_str = "path {0} branch '{1}' needs at least two special points"
+            raise Exception(error_str.format(path, branch))
+        if not all(label in points for label in branch):
+            error_str = "path {0} labels not special points of {1} ({2})"
+            raise Exception(error_str.format(branch, bravais, "".join(sorted(points))))
+
+        start = np.array([points[label] for label in branch[:-1]])
+        end = np.array([points[label] for label in branch[1:]])
+        # segment length in 1/angstrom
+        lengths = np.linalg.norm(end - start, axis=1) / bohr
+        counts = np.maximum(1, np.ceil(lengths * density).astype(int))
+
+        fraction = np.concatenate([np.arange(count) / float(count) for count in counts] + [[1.0]])
+        segment = np.repeat(start, counts, axis=0)
+        segment = np.concatenate([segment, end[-1:]])
+        delta = np.concatenate([np.repeat(end - start, counts, axis=0), np.zeros((1, 3))])
+        segments.append(segment + fraction[:, None] * delta)
+
+        indices = nks + np.concatenate([[0], np.cumsum(counts)])
+        labels.extend([[int(index), label] for index, label in zip(indices, branch)])
+        nks += len(fraction)
+
+    return np.concatenate(segments), labels
@@ -0,0 +1,416 @@
+""" Launching pw.x
+
+Plans the MPI parallelization of pw.x for each input. pw.x
+distributes the work in levels (see the pw.x user guide):
+
+ -nk  pools      : kpoints are divided over pools (almost no
+                   communication, ideal for many kpoints)
+ -nt  task groups: bands are distributed over groups of ranks for
+                   the FFTs (useful when the ranks of a pool
+                   outnumber the planes of the FFT grid)
+ -nd  diagonalization : square grid of ranks for the parallel
+                   subspace diagonalization (useful for many bands)
+
+Within a pool the plane waves and FFT planes are distributed.
+"""
+import fnmatch
+import math
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+
+
+def divisors(n):
+    """Returns the sorted divisors of n
+
+    """
+    return [i for i in range(1, n + 1) if n % i == 0]
+
+
+def plane_wave_speedup(nranks, nplanes):
+    """Model of the speedup of plane wave (G-vector) parallelization
+    over nranks. Communication of the all to all FFT grows with the
+    ranks and no more than nplanes (nr3) ranks share the FFT planes.
+
+    """
+    nranks = min(nranks, nplanes)
+    return nranks / (1.0 + 0.05 * (nranks - 1))
+
+
+def plan_launch(qe, ncores, valence=None, max_pools=None, mpi_command=None):
+    """Plans the pw.x parallelization of input qe (PWBase) on ncores
+    MPI ranks. Returns a dictionary:
+
+     - np      : number of MPI ranks
+     - nk      : number of pools
+     - nt      : number of task groups
+     - nd      : number of ranks of the diagonalization group
+     - prefix  : MPI launcher command (see config.mpi_command)
+     - postfix : pw.x parallelization flags (-nd only if nd > 1)
+
+    The number of pools minimizes the modeled time of the kpoints of
+    the slowest pool (kpoints per pool over the plane wave speedup of
+    the ranks per pool). Ties prefer fewer pools (less memory).
+
+    valence   - {symbol: z_valence} (see pyqe.cost.number_electrons)
+    max_pools - upper limit on the number of pools (memory)
+    mpi_command - MPI launcher (default config.mpi_command)
+    """
+    from pyqe import config
+    from pyqe.cost import fft_dimensions, number_kpoints, \
+        number_electrons, number_bands
+
+    if ncores < 1:
+        error_str = "ncores {0} must be positive"
+        raise Exception(error_str.format(ncores))
+
+    nks = number_kpoints(qe)
+    ecutwfc = qe.system.get_current_value("ecutwfc")
+    if ecutwfc is None:
+        raise Exception("ecutwfc required to plan launch")
+    ecutrho = qe.system.get_current_value("ecutrho")
+    cell = qe.get_cell()
+    nr3 = fft_dimensions(cell, ecutrho)[2]
+    nr3s = fft_dimensions(cell, min(4.0 * ecutwfc, ecutrho))[2]
+
+    try:
+        nbnd = number_bands(qe, number_electrons(qe, valence))
+    except Exception:
+        # pseudopotentials unavailable: fall back to serial diagonalization
+        nbnd = qe.system.get_set_value("nbnd") or 0
+
+    # Pools
+    best = None
+    for nk in divisors(ncores):
+        if nk > nks or (max_pools and nk > max_pools):
+            break
+        ranks_per_pool = ncores // nk
+        estimated_time = math.ceil(float(nks) / nk) / plane_wave_speedup(ranks_per_pool, nr3)
+        if best is None or estimated_time < best[0] * 0.99:
+            best = (estimated_time, nk)
+    nk = best[1]
+    ranks_per_pool = ncores // nk
+
+    # Task groups: keep the ranks doing each FFT within the smooth planes
+    nt = 1
+    for nt in divisors(ranks_per_pool):
+        if ranks_per_pool // nt <= nr3s:
+            break
+
+    # Diagonalization: square grid, ~50 bands per row of ranks
+    nd = 1
+    size = int(math.sqrt(ranks_per_pool))
+    while size > 1:
+        if nbnd >= 50 * size:
+            nd = size * size
+            break
+        size -= 1
+
+    if mpi_command is None:
+        mpi_command = config.mpi_command
+
+    prefix = []
+    if ncores > 1:
+        prefix = [arg.format(np=ncores) for arg in mpi_command]
+
+    postfix = ["-nk", str(nk), "-nt", str(nt)]
+    if nd > 1:
+        # -nd 1 would force serial diagonalization, otherwise pw.x chooses
+        postfix.extend(["-nd", str(nd)])
+
+    return {
+        "np": ncores,
+        "nk": nk,
+        "nt": nt,
+        "nd": nd,
+        "prefix": prefix,
+        "postfix": postfix
+    }
+
+
+class RunError(Exception):
+    """
+    Structured report of a failed pw.x run
+
+    command    - command (list) that was run
+    returncode - exit code of pw.x (None if killed on timeout)
+    crash      - contents of the CRASH file ('' if none)
+    stdout     - last lines of the standard output
+    stderr     - standard error
+    workdir    - working directory of the run (None if removed)
+    """
+    tail_lines = 20
+
+    def __init__(self, message, command, returncode=None, crash="",
+                 stdout="", stderr="", workdir=None):
+        self.command = command
+        self.returncode = returncode
+        self.crash = crash
+        self.stdout = "\n".join(stdout.splitlines()[-RunError.tail_lines:])
+        self.stderr = stderr
+        self.workdir = workdir
+
+        details = [message]
+        if crash:
+            details.append("CRASH:\n" + crash.strip())
+        if workdir:
+            details.append("workdir: " + workdir)
+        Exception.__init__(self, "\n".join(details))
+
+
+class Launcher:
+    """
+    Launch configuration of a pw.x run (see PWBase.run)
+
+    Carries everything a run needs instead of the module globals in
+    pyqe.config so that runs from many threads may each use their own
+    MPI layout, binary and environment. Unset arguments are taken
+    from pyqe.config when the launcher is created.
+
+    executable    - pw.x binary (string or list of arguments)
+    prefix        - arguments before the executable (eg. ['nice'])
+    postfix       - arguments after the executable
+    cores         - MPI ranks, if set the launch is planned for each
+                    input (see plan_launch)
+    mpi_command   - MPI launcher ({np} is replaced by the ranks)
+    env           - environment variables added to os.environ
+    cwd           - working directory of pw.x (default current)
+    timeout       - wall time limit in seconds (default None)
+    kill_grace    - seconds between SIGTERM and SIGKILL when pw.x is
+                    stopped on timeout or cancel
+    namelist_space, card_space - indentation of the input file
+    tracer        - pyqe.trace.Tracer recording the stages of the run
+                    (render, pw.x, parsing) (default None)
+
+    Isolated runs (concurrent runs never share CRASH or save files):
+    scratch       - if set each run executes in a new directory
+                    created in scratch (eg. '/dev/shm' for tmpfs) with
+                    outdir pointing into it (overrides cwd)
+    cleanup       - when the scratch directory is cleaned up
+                    'always', 'on_success' (default) or 'never'
+    retain        - glob patterns (relative to the scratch directory)
+                    of files kept on cleanup, eg.
+                    ['*.save/data-file.xml']. If empty the directory
+                    is removed.
+    """
+    cleanup_policies = ("always", "on_success", "never")
+
+    def __init__(self, executable="pw.x", prefix=None, postfix=None,
+                 cores=None, mpi_command=None, env=None, cwd=None,
+                 timeout=None, namelist_space=None, card_space=None,
+                 scratch=None, cleanup="on_success", retain=None,
+                 kill_grace=10.0, tracer=None):
+        from pyqe import config
+
+        if isinstance(executable, str):
+            executable = [executable]
+
+        self.executable = list(executable)
+        self.prefix = list(config.prefix if prefix is None else prefix)
+        self.postfix = list(config.postfix if postfix is None else postfix)
+        self.cores = config.cores if cores is None else cores
+        self.mpi_command = list(config.mpi_command if mpi_command is None else mpi_command)
+        self.env = dict(env or {})
+        self.cwd = cwd
+        self.timeout = timeout
+        self.kill_grace = kill_grace
+        self.tracer = tracer
+        self.namelist_space = config.namelist_space if namelist_space is None else namelist_space
+        self.card_space = config.card_space if card_space is None else card_space
+
+        if cleanup not in Launcher.cleanup_policies:
+            error_str = "cleanup {0} must be one of {1}"
+            raise Exception(error_str.format(cleanup, Launcher.cleanup_policies))
+
+        self.scratch = scratch
+        self.cleanup = cleanup
+        self.retain = list(retain or [])
+
+    def command(self, qe, infile=None):
+        """Returns the command (list) to run pw.x for the input qe
+        (PWBase). If infile pw.x reads the input from the file via
+        '-i' otherwise from stdin.
+
+        """
+        prefix, postfix = self.prefix, self.postfix
+        if self.cores:
+            plan = plan_launch(qe, self.cores, mpi_command=self.mpi_command)
+            prefix = prefix + plan["prefix"]
+            postfix = plan["postfix"] + postfix
+
+        arguments = ["-i", infile] if infile else []
+        return prefix + self.executable + arguments + postfix
+
+    def environment(self):
+        """Returns the environment of pw.x (None if unchanged)
+
+        """
+        if not self.env:
+            return None
+        env = dict(os.environ)
+        env.update(self.env)
+        return env
+
+    def render(self, qe, header=True):
+        """Returns the input file of qe with the launcher spacing
+
+        """
+        return qe.to_string(header, self.namelist_space, self.card_space)
+
+    def prepare(self, qe):
+        """Returns (workdir, qe) the working directory of the run and
+        the input to run. For scratch runs a new directory is created
+        and the input is derived with outdir inside it and an absolute
+        pseudo_dir.
+
+        """
+        if self.scratch is None:
+            return self.cwd, qe
+
+        workdir = tempfile.mkdtemp(prefix="pyqe-", dir=self.scratch)
+        pseudo_dir = os.path.join(self.cwd or os.getcwd(),
+                                  qe.control.get_current_value("pseudo_dir"))
+        qe = qe.derive(control={"outdir": workdir,
+                                "pseudo_dir": os.path.abspath(pseudo_dir) + "/"})
+        return workdir, qe
+
+    def finish(self, workdir, success):
+        """Cleans up the scratch directory workdir of a run according
+        to the cleanup policy. Returns workdir if (partly) retained
+        otherwise None.
+
+        """
+        if self.scratch is None or workdir is None:
+            return workdir
+
+        if self.cleanup == "never" or \
+           (self.cleanup == "on_success" and not success):
+            return workdir
+
+        if not self.retain:
+            shutil.rmtree(workdir, ignore_errors=True)
+            return None
+
+        for root, dirnames, filenames in os.walk(workdir, topdown=False):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                relpath = os.path.relpath(path, workdir)
+                if not any(fnmatch.fnmatch(relpath, pattern) for pattern in self.retain):
+                    os.remove(path)
+            if root != workdir and not os.listdir(root):
+                os.rmdir(root)
+        return workdir
+
+    def read_crash(self, workdir):
+        """Returns the contents of the CRASH file of a run ('' if none)
+
+        """
+        filename = os.path.join(workdir or ".", "CRASH")
+        if not os.path.isfile(filename):
+            return ""
+        with open(filename) as f:
+            return f.read()
+
+    def execute(self, command, stdin=None, workdir=None, cancel=None):
+        """Runs command (in its own process group) feeding it stdin
+        (bytes) until it exits, the timeout passes or cancel (a
+        threading.Event set from another thread) is set. pw.x is
+        stopped with SIGTERM and after kill_grace seconds SIGKILL.
+        Returns a dictionary:
+
+         - status     : 'completed', 'timeout' or 'cancelled'
+         - returncode : exit code (negative signal if killed)
+         - stdout, stderr : output (bytes)
+         - resources  : {'wall time', 'user time', 'system time',
+                         'max rss' (bytes)} of pw.x and its waited
+                         children (os.wait4)
+        """
+        from subprocess import Popen, PIPE
+
+        start_time = time.time()
+        proc = Popen(command, stdin=PIPE, stdout=PIPE, stderr=PIPE,
+                     cwd=workdir, env=self.environment(),
+                     start_new_session=True)
+
+        # Pipes are served by threads so that pw.x never blocks on a
+        # full pipe while we wait for it
+        output = {proc.stdout: [], proc.stderr: []}
+
+        def read(stream):
+            for chunk in iter(lambda: stream.read(65536), b""):
+                output[stream].append(chunk)
+            stream.close()
+
+        def write(stream):
+            try:
+                if stdin:
+                    stream.write(stdin)
+            except BrokenPipeError:
+                pass
+            finally:
+                try:
+                    stream.close()
+                except BrokenPipeError:
+                    pass
+
+        threads = [threading.Thread(target=read, args=(proc.stdout,)),
+                   threading.Thread(target=read, args=(proc.stderr,)),
+                   threading.Thread(target=write, args=(proc.stdin,))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        deadline = None if self.timeout is None else start_time + self.timeout
+        status, kill_time, delay = "completed", None, 0.001
+        while True:
+            pid, wait_status, rusage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                break
+
+            now = time.time()
+            if kill_time is None:
+                if deadline is not None and now > deadline:
+                    status = "timeout"
+                elif cancel is not None and cancel.is_set():
+                    status = "cancelled"
+                if status != "completed":
+                    self._signal(proc, signal.SIGTERM)
+                    kill_time = now + self.kill_grace
+            elif now > kill_time:
+                self._signal(proc, signal.SIGKILL)
+                kill_time = float("inf")
+
+            # Short runs return quickly, long runs poll every 0.1s
+            time.sleep(delay)
+            delay = min(2 * delay, 0.1)
+        proc.returncode = os.waitstatus_to_exitcode(wait_status)
+        end_time = time.time()
+
+        for thread in threads:
+            thread.join()
+
+        return {
+            "status": status,
+            "returncode": proc.returncode,
+            "stdout": b"".join(output[proc.stdout]),
+            "stderr": b"".join(output[proc.stderr]),
+            "resources": {
+                "wall time": end_time - start_time,
+                "user time": rusage.ru_utime,
+                "system time": rusage.ru_stime,
+                # Linux reports kilobytes
+                "max rss": rusage.ru_maxrss * 1024
+            }
+        }
+
+    def _signal(self, proc, signum):
+        """Sends signum to the process group of pw.x (mpirun and ranks)
+
+        """
+        try:
+            os.killpg(proc.pid, signum)
+        except ProcessLookupError:
+            pass
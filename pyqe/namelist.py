@@ -6,9 +6,25 @@ These are dictionaries with configuration varaibles.
 # TODO implement to check for key "blank" only used when "key" set to true
 """
 import re
-from collections import Callable, defaultdict
+from collections import defaultdict
+from collections.abc import Callable
 
 from pyqe.docs.pwdocs import getPWDocForKey
+import pyqe.config as config
+
+
+def format_keypair(key, index, value):
+    """Returns: namelist string representation of keypair
+
+    key(index) = value
+
+    """
+    if index:
+        key = "{0}({1})".format(key, ','.join(map(str, index)))
+    if isinstance(value, str):
+        return "{0} = '{1}'".format(key, value)
+    return "{0} = {1}".format(key, value)
+
 
 class KeyInfo():
     """
@@ -20,16 +36,27 @@ class KeyInfo():
            range = [ (), (value1, value2, ...), function(value) ]
            config = [ function(global QE object) returns [True/False, str] , None | doc string ]
            doc string = str describing key
+
+    Namelist methods given as default, range or config are stored
+    unbound (their names in methods) and bound to each namelist when
+    called (see Namelist._bind)
     """
     def __init__(self, key, narg, _type, default, _range, config, doc):
         self.key = key
         self.narg = narg
         self.type = _type
-        self.default = default
-        self.range = _range
-        self.config = config
+        self.methods = set()
+        self.default = self._unbind('default', default)
+        self.range = self._unbind('range', _range)
+        self.config = self._unbind('config', config)
         self.doc = doc
 
+    def _unbind(self, name, function):
+        if isinstance(getattr(function, '__self__', None), Namelist):
+            self.methods.add(name)
+            return function.__func__
+        return function
+
     def validate(self):
         """**For Developer**
         Checking the of key description arrays. This is
@@ -172,7 +199,7 @@ class KeyPair():
         # func(value) -> return True/False whether in range
         # (i, j, ...) -> tuple of accepted values
         if isinstance(keyinfo.range, Callable):
-            if not keyinfo.range(self.value):
+            if not namelist._bind(keyinfo, 'range')(self.value):
                 error_str = "'{0}' key '{1}' value '{2}' invalid range"
                 raise Exception(error_str.format(
                     namelist.name, self.key, self.value))
@@ -192,16 +219,7 @@ class KeyPair():
         Returns: namelist string representation of keypair
 
         """
-        keypair_str = "{0}".format(self.key)
-        if self.index:
-            keypair_str += "({0})".format(','.join(map(str, self.index)))
-        keypair_str += " = "
-        if isinstance(self.value, str):
-            keypair_str += "'{0}'".format(self.value)
-        else:
-            keypair_str += "{0}".format(self.value)
-
-        return keypair_str
+        return format_keypair(self.key, self.index, self.value)
 
 
 class Namelist:
@@ -211,11 +229,23 @@ class Namelist:
     keys is a dictionary of KeyInfo
     """
 
+    # KeyInfo schema of each namelist class
+    _schemas = {}
+
     def __init__(self, name, keys):
         self.name = name
         self.keypairs = defaultdict(dict)
-        self.keys = {}
+        # Rendered namelist [space, string] until keypairs change
+        self._rendered = None
 
+        # The KeyInfo schema is built (and validated) once per namelist
+        # class and shared by all instances (methods are stored
+        # unbound, see _bind)
+        self.keys = Namelist._schemas.get(self.__class__)
+        if self.keys is not None:
+            return
+
+        self.keys = {}
         for key, [narg, _type, default, _range, config] in keys.items():
 
             keyinfo = KeyInfo(key,
@@ -227,6 +257,34 @@ class Namelist:
                               getPWDocForKey(name, key))
             keyinfo.validate()
             self.keys.update({key: keyinfo})
+        Namelist._schemas[self.__class__] = self.keys
+
+    def _bind(self, keyinfo, name):
+        """Returns the default, range or config function (name) of
+        keyinfo. Namelist methods are stored unbound in the schema
+        shared by all instances of the class, so they are bound to
+        this namelist in order to see its own keypairs.
+
+        """
+        function = getattr(keyinfo, name)
+        if name in keyinfo.methods:
+            return function.__get__(self)
+        return function
+
+    def copy(self):
+        """Returns a copy of the namelist. The key schema (KeyInfo) is
+        never modified so it is shared with the copy, only the user
+        set keypairs are duplicated.
+
+        """
+        namelist = self.__class__.__new__(self.__class__)
+        namelist.name = self.name
+        namelist.keys = self.keys
+        namelist._rendered = self._rendered
+        namelist.keypairs = defaultdict(dict)
+        for key, values in self.keypairs.items():
+            namelist.keypairs[key] = dict(values)
+        return namelist
 
     def describe_key(self, key):
         key, index = self.parse_key(key)
@@ -278,7 +336,7 @@ class Namelist:
         """
         keyinfo = self.keys.get(key)
         if isinstance(keyinfo.default, Callable):
-            return keyinfo.default()
+            return self._bind(keyinfo, 'default')()
         return keyinfo.default
 
     def validate_config(self, key, qe):
@@ -292,7 +350,7 @@ class Namelist:
         """
         keyinfo = self.keys.get(key)
         if keyinfo.config:
-            result, message = keyinfo.config(qe)
+            result, message = self._bind(keyinfo, 'config')(qe)
             if not result:
                 raise Exception(message)
 
@@ -381,24 +439,32 @@ class Namelist:
         #     print("Warning: Overwritting Key '{0}'".format(key))
 
         self.keypairs[key].update({index: value})
+        self._rendered = None
 
 
-    def to_string(self):
-        if len(self.keypairs) == 0:
-            return ""
+    def to_string(self, space=None):
+        """Returns: namelist string representation. The string is
+        cached until keypairs are added (through add_keypair(s)).
 
-        namelist_str = " &{0}\n".format(self.name)
+        space - indentation of keypairs (default config.namelist_space)
+        """
+        if space is None:
+            space = config.namelist_space
 
-        # Iterate through key value
-        import pyqe.config as config
-        for key, values in self.keypairs.items():
-            for index, value in values.items():
-                keypair = KeyPair(key, index, value)
-                namelist_str += config.namelist_space
-                namelist_str += keypair.to_string()
-                namelist_str += "\n"
-        namelist_str += " /\n"
+        if self._rendered and self._rendered[0] == space:
+            return self._rendered[1]
 
+        if len(self.keypairs) == 0:
+            namelist_str = ""
+        else:
+            lines = [" &{0}\n".format(self.name)]
+            for key, values in self.keypairs.items():
+                for index, value in values.items():
+                    lines.append(space + format_keypair(key, index, value) + "\n")
+            lines.append(" /\n")
+            namelist_str = "".join(lines)
+
+        self._rendered = [space, namelist_str]
         return namelist_str
 
     def __str__(self):
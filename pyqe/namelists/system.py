@@ -13,9 +13,6 @@ def isWithinOneOfZero(value):
 def isBtwZeroOne(value):
     return value >= 0.0 and value <= 1.0
 
-def isGTFour(value):
-    return value > 4
-
 class System(Namelist):
     """System Namelist
 
@@ -102,7 +99,7 @@ class System(Namelist):
             'cosBC': [0, float, None, isWithinOneOfZero, self._checkCosBC],
             'nat': [0, int, None, isPositive, self._checkNat],
             'ntyp': [0, int, None, isPositive, self._checkNtyp],
-            'nbnd': [0, int, None, isGTFour, None], #TODO default nbnd (insulator)
+            'nbnd': [0, int, None, isPositive, None], #TODO default nbnd (insulator)
             'tot_charge': [0, float, 0.0, None, None],
             'tot_magnetization': [0, float, -1.0, isWithinOneOfZero, None],
             'starting_magnetization': [1, float, None, isWithinOneOfZero, None],
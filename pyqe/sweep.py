@@ -0,0 +1,166 @@
+"""
+Parameter sweeps over a base PWBase input
+
+A sweep expands one base input over axes of values. Each axis is
+named either:
+ - "<namelist>.<key>" (eg. "system.ecutwfc", "system.celldm(1)")
+   with a list of keypair values
+ - "<card>" (eg. "k_points") with a list of replacement card objects
+
+Each point of the sweep is a PWBase derived (see PWBase.derive) from
+the base input. When rendering, the cached text of each namelist
+(see Namelist.to_string) is reused until its keypairs change, so only
+the changed namelists and the cards are rendered.
+
+designs:
+cartesian       : every combination of the axes values
+zip             : i-th value of each axis (axes must be equal length)
+latin-hypercube : `samples` points where each axis is stratified
+                  into `samples` bins so that every bin is hit once
+"""
+import os
+import random
+from itertools import product
+
+
+class Sweep:
+    """
+    Sweep of a base PWBase input over axes of values
+
+    sweep = Sweep(qe, {'system.ecutwfc': [20.0, 30.0, 40.0],
+                       'system.smearing': ['gaussian', 'mv']})
+    for point, qe_point in sweep:
+        ...
+    """
+
+    designs = ("cartesian", "zip", "latin-hypercube")
+
+    def __init__(self, base, axes, design="cartesian", samples=None, seed=None):
+        if design not in Sweep.designs:
+            error_str = "sweep design {0} not valid option"
+            raise Exception(error_str.format(design))
+
+        if design == "latin-hypercube" and not samples:
+            raise Exception("latin-hypercube design requires number of samples")
+
+        self.base = base
+        self.design = design
+        self.samples = samples
+        self.seed = seed
+
+        self.axes = []
+        for name, values in axes.items():
+            self.validate_axis(name, values)
+            self.axes.append((name, list(values)))
+
+        if design == "zip" and len(set(len(_[1]) for _ in self.axes)) > 1:
+            raise Exception("zip design requires axes of equal length")
+
+    def validate_axis(self, name, values):
+        """Axis must name a namelist key or a card and have values
+
+        """
+        if '.' in name:
+            namelist = self.base.namelist_asoc.get(name.split('.', 1)[0].lower())
+            if not namelist:
+                error_str = "axis {0} is not valid namelist"
+                raise Exception(error_str.format(name))
+        elif name.lower() not in self.base.card_asoc:
+            error_str = "axis {0} is not valid card"
+            raise Exception(error_str.format(name))
+
+        if len(values) == 0:
+            error_str = "axis {0} has no values"
+            raise Exception(error_str.format(name))
+
+    def __len__(self):
+        if self.design == "cartesian":
+            length = 1
+            for name, values in self.axes:
+                length *= len(values)
+            return length
+        elif self.design == "zip":
+            return len(self.axes[0][1]) if self.axes else 0
+        return self.samples
+
+    def _rows(self):
+        """Generates a tuple of axes values for each point
+
+        """
+        values = [_[1] for _ in self.axes]
+
+        if self.design == "cartesian":
+            for row in product(*values):
+                yield row
+        elif self.design == "zip":
+            for row in zip(*values):
+                yield row
+        else:
+            rng = random.Random(self.seed)
+            columns = []
+            for axis_values in values:
+                strata = list(range(self.samples))
+                rng.shuffle(strata)
+                columns.append([
+                    axis_values[int((stratum + rng.random()) * len(axis_values) / self.samples)]
+                    for stratum in strata])
+            for row in zip(*columns):
+                yield row
+
+    def points(self):
+        """Generates the {axis: value} dictionary of each point
+
+        """
+        names = [_[0] for _ in self.axes]
+        for row in self._rows():
+            yield dict(zip(names, row))
+
+    def derive(self, point):
+        """Returns the PWBase for a {axis: value} point
+
+        """
+        changes = {}
+        for name, value in point.items():
+            if '.' in name:
+                namelist, key = name.split('.', 1)
+                changes.setdefault(namelist.lower(), {}).update({key: value})
+            else:
+                changes[name.lower()] = value
+        return self.base.derive(**changes)
+
+    def __iter__(self):
+        """Lazily generates (point, PWBase) for each point of the sweep
+
+        """
+        for point in self.points():
+            yield point, self.derive(point)
+
+    def to_string(self, qe, header=True, namelist_space=None, card_space=None):
+        """Renders a point of the sweep (see PWBase.to_string). The
+        text of namelists unchanged since the base input was last
+        modified is reused.
+
+        """
+        return qe.to_string(header, namelist_space, card_space)
+
+    def to_directory(self, directory, filename="pw.in", dirname="{0:05d}",
+                     launcher=None):
+        """Writes the input of each point to
+        <directory>/<dirname.format(index)>/<filename> with the input
+        spacing of launcher (pyqe.launch.Launcher, default pyqe.config)
+
+        Returns: list of [path, point] for each written input
+        """
+        written = []
+        for index, (point, qe) in enumerate(self):
+            point_directory = os.path.join(directory, dirname.format(index))
+            os.makedirs(point_directory, exist_ok=True)
+
+            path = os.path.join(point_directory, filename)
+            with open(path, "w") as qefile:
+                if launcher is None:
+                    qefile.write(self.to_string(qe))
+                else:
+                    qefile.write(launcher.render(qe))
+            written.append([path, point])
+        return written
@@ -0,0 +1,438 @@
+""" Synthetic pw.x outputs and save directories
+
+Generates realistic pw.x stdout (scf, relax, vc-relax, md and bands
+calculations) and save directories (data-file.xml, charge-density.dat
+and eigenval.xml files) of any size without running pw.x. Used by
+pyqe.benchmark and pyqe.fakepw.
+
+generate_output - pw.x stdout of a calculation
+write_save_directory - prefix.save directory of a calculation
+"""
+import os
+
+import numpy as np
+
+
+def _write_charge_density_file(outputfile, density):
+    """Writes density (shape (nr1, nr2, nr3)) as a charge-density.dat
+    in the layout pyqe.io.read_charge_density_file assumes: an iotk
+    tag per z slice holding 12 bytes, the nr1*nr2 doubles (x fastest)
+    and 24 bytes. The bytes around each slice are not known and are
+    written as zeros.
+
+    *Not the file pw.x writes* (it is not checked against pw.x files),
+    so synthetic save directories only test pyqe against itself.
+    """
+    nr1, nr2, nr3 = np.shape(density)
+    with open(outputfile, "wb") as f:
+        f.write(b'<?xml version="1.0"?>\n<?iotk version="1.2.0"?>\n'
+                b'<?iotk file_version="1.0"?>\n<?iotk binary="T"?>\n'
+                b'<?iotk qe_syntax="F"?>\n<Root>\n  <CHARGE-DENSITY>\n')
+        f.write('    <INFO nr1="{0}" nr2="{1}" nr3="{2}"/>\n'.format(nr1, nr2, nr3).encode())
+        for k in range(nr3):
+            f.write('    <z.{0} type="real" size="{1}" kind="8">\n'.format(k + 1, nr1 * nr2).encode())
+            f.write(bytes(12))
+            f.write(np.asarray(density[:, :, k], dtype="<f8").tobytes(order='F'))
+            f.write(bytes(24))
+            f.write('\n    </z.{0}>\n'.format(k + 1).encode())
+        f.write(b'  </CHARGE-DENSITY>\n</Root>\n')
+
+
+calculations = ("scf", "relax", "vc-relax", "md", "bands")
+
+chemical_species = [["Si", 4.0, 28.086], ["Ge", 4.0, 72.630],
+                    ["C", 4.0, 12.011], ["O", 6.0, 15.999],
+                    ["Al", 3.0, 26.982], ["Ga", 3.0, 69.723]]
+
+footer_routines = [
+    [None, ["init_run", "electrons", "update_pot", "forces", "stress"]],
+    ["init_run", ["wfcinit", "potinit"]],
+    ["electrons", ["c_bands", "sum_band", "v_of_rho", "newd", "mix_rho"]],
+    ["c_bands", ["init_us_2", "cegterg"]],
+    ["sum_band", ["sum_band:bec", "addusdens"]],
+    ["*egterg", ["h_psi", "s_psi", "g_psi", "cdiaghg"]],
+    ["h_psi", ["add_vuspsi"]],
+    ["General routines", ["calbec", "fft", "ffts", "fftw", "interpolate", "davcio"]],
+    ["Parallel routines", ["fft_scatter"]]
+]
+
+
+class SyntheticRun:
+    """
+    A made up (but self consistent) pw.x run: cell, atoms, kpoints
+    and bands from which the outputs are written.
+
+    calculation - scf, relax, vc-relax, md or bands
+    nat, ntyp   - number of atoms and species
+    nks, nbnd   - number of kpoints and bands
+    nsteps      - ionic steps (relax, vc-relax, md)
+    niter       - scf iterations per ionic step
+    seed        - random seed (same seed same output)
+    """
+    def __init__(self, calculation="scf", nat=2, ntyp=1, nks=2, nbnd=8,
+                 nsteps=3, niter=6, prefix="pwscf", outdir="./", seed=None):
+        if calculation not in calculations:
+            error_str = "calculation {0} must be one of {1}"
+            raise Exception(error_str.format(calculation, calculations))
+
+        if ntyp > min(nat, len(chemical_species)):
+            error_str = "ntyp {0} must be <= nat and <= {1}"
+            raise Exception(error_str.format(ntyp, len(chemical_species)))
+
+        self.calculation = calculation
+        self.nat, self.ntyp = nat, ntyp
+        self.nks, self.nbnd = nks, nbnd
+        self.nsteps = 1 if calculation in ("scf", "bands") else nsteps
+        self.niter = niter
+        self.prefix, self.outdir = prefix, outdir
+        self.rng = np.random.RandomState(seed)
+
+        # simple cubic cell holding nat atoms at the density of silicon
+        self.alat = 10.2 * (nat / 8.0) ** (1.0 / 3.0)
+        self.ecutwfc, self.ecutrho = 30.0, 240.0
+        self.species = chemical_species[:ntyp]
+        self.species_index = np.arange(nat) % ntyp
+        self.positions = self.rng.uniform(0.0, 1.0, (nat, 3))
+        self.kpoints = self.rng.uniform(-0.5, 0.5, (nks, 3))
+        self.weights = np.full(nks, 2.0 / nks)
+        self.nelec = sum(self.species[i][1] for i in self.species_index)
+        self.energy = -7.9 * nat
+
+    def fft_dimensions(self):
+        from pyqe.cost import fft_dimensions
+        return fft_dimensions(np.identity(3) * self.alat, self.ecutrho)
+
+    def header(self):
+        lines = ["\n     Program PWSCF v.5.1 starts on 14Mar2015 at 10:20:29 \n\n"]
+        lines.append("     bravais-lattice index     = {0:12d}\n".format(1))
+        lines.append("     lattice parameter (alat)  = {0:12.4f}  a.u.\n".format(self.alat))
+        lines.append("     unit-cell volume          = {0:12.4f} (a.u.)^3\n".format(self.alat**3))
+        lines.append("     number of atoms/cell      = {0:12d}\n".format(self.nat))
+        lines.append("     number of atomic types    = {0:12d}\n".format(self.ntyp))
+        lines.append("     number of electrons       = {0:12.2f}\n".format(self.nelec))
+        lines.append("     number of Kohn-Sham states= {0:12d}\n".format(self.nbnd))
+        lines.append("     kinetic-energy cutoff     = {0:12.4f}  Ry\n".format(self.ecutwfc))
+        lines.append("     charge density cutoff     = {0:12.4f}  Ry\n".format(self.ecutrho))
+        lines.append("     convergence threshold     =      1.0E-08\n")
+        lines.append("     mixing beta               =       0.7000\n")
+        lines.append("     number of iterations used =            8  plain     mixing\n")
+        lines.append("     Exchange-correlation      = SLA PZ NOGX NOGC ( 1  1  0  0 0 0)\n")
+        if self.nsteps > 1:
+            lines.append("     nstep                     = {0:12d}\n".format(self.nsteps))
+        lines.append("\n     celldm(1)={0:11.6f}  celldm(2)=   0.000000  celldm(3)=   0.000000\n"
+                     "     celldm(4)=   0.000000  celldm(5)=   0.000000  celldm(6)=   0.000000\n\n".format(self.alat))
+        lines.append("     crystal axes: (cart. coord. in units of alat)\n"
+                     "               a(1) = (   1.000000   0.000000   0.000000 )  \n"
+                     "               a(2) = (   0.000000   1.000000   0.000000 )  \n"
+                     "               a(3) = (   0.000000   0.000000   1.000000 )  \n\n")
+        lines.append("     reciprocal axes: (cart. coord. in units 2 pi/alat)\n"
+                     "               b(1) = (  1.000000  0.000000  0.000000 )  \n"
+                     "               b(2) = (  0.000000  1.000000  0.000000 )  \n"
+                     "               b(3) = (  0.000000  0.000000  1.000000 )  \n\n\n")
+
+        for i, (symbol, valence, mass) in enumerate(self.species):
+            lines.append("     PseudoPot. # {0} for {1:2s} read from file:\n"
+                         "     ./{1}.pz-vbc.UPF\n"
+                         "     Pseudo is Norm-conserving, Zval = {2:4.1f}\n\n".format(i + 1, symbol, valence))
+
+        lines.append("     atomic species   valence    mass     pseudopotential\n")
+        for symbol, valence, mass in self.species:
+            lines.append("        {0:2s}            {1:5.2f}   {2:9.5f}     {0:2s}( 1.00)\n".format(symbol, valence, mass))
+
+        lines.append("\n     No symmetry found\n\n   Cartesian axes\n\n"
+                     "     site n.     atom                  positions (alat units)\n")
+        for i, (index, position) in enumerate(zip(self.species_index, self.positions)):
+            lines.append("     {0:5d}           {1:2s}  tau({0:4d}) = ({2:12.7f}{3:12.7f}{4:12.7f}  )\n".format(
+                i + 1, self.species[index][0], *position))
+
+        lines.append("\n     number of k points={0:6d}\n"
+                     "                       cart. coord. in units 2pi/alat\n".format(self.nks))
+        for i, (kpoint, weight) in enumerate(zip(self.kpoints, self.weights)):
+            lines.append("        k({0:5d}) = ({1:12.7f}{2:12.7f}{3:12.7f}), wk = {4:12.7f}\n".format(
+                i + 1, kpoint[0], kpoint[1], kpoint[2], weight))
+
+        nr = self.fft_dimensions()
+        lines.append("\n     Dense  grid: {0:8d} G-vectors     FFT dimensions: ({1:4d},{2:4d},{3:4d})\n\n".format(
+            int(self.alat**3 * self.ecutrho**1.5 / (6 * np.pi**2)), *nr))
+        lines.append("     Largest allocated arrays     est. size (Mb)     dimensions\n"
+                     "        Kohn-Sham Wavefunctions         0.01 Mb (     186,    4)\n"
+                     "     Largest temporary arrays     est. size (Mb)     dimensions\n"
+                     "        Auxiliary wavefunctions         0.05 Mb (     186,   16)\n\n"
+                     "     Initial potential from superposition of free atoms\n\n"
+                     "     total cpu time spent up to now is        0.1 secs\n\n")
+        return "".join(lines)
+
+    def bands(self):
+        lines = []
+        npw = int(self.alat**3 * self.ecutwfc**1.5 / (6 * np.pi**2))
+        for kpoint in self.kpoints:
+            lines.append("          k ={0:7.4f}{1:7.4f}{2:7.4f} ({3:6d} PWs)   bands (ev):\n\n".format(
+                kpoint[0], kpoint[1], kpoint[2], npw))
+            eigenvalues = np.sort(self.rng.uniform(-6.0, 12.0, self.nbnd))
+            for start in range(0, self.nbnd, 8):
+                lines.append("  " + "".join("{0:9.4f}".format(e) for e in eigenvalues[start:start + 8]) + "\n")
+            lines.append("\n")
+        return "".join(lines)
+
+    def scf(self, step, cpu_time, forces, stress):
+        lines = ["     Self-consistent Calculation\n\n"]
+        energy = self.energy - 0.01 * step
+        accuracy = 0.1
+        for iteration in range(1, self.niter + 1):
+            cpu_time += 0.1 * self.nks
+            lines.append("     iteration #{0:3d}     ecut={1:9.2f} Ry     beta={2:5.2f}\n"
+                         "     Davidson diagonalization with overlap\n"
+                         "     ethr = {3:9.2E},  avg # of iterations ={4:5.1f}\n\n"
+                         "     total cpu time spent up to now is {5:10.1f} secs\n\n".format(
+                             iteration, self.ecutwfc, 0.7, accuracy / 10.0, 2.0, cpu_time))
+            if iteration < self.niter:
+                lines.append("     total energy              = {0:17.8f} Ry\n"
+                             "     Harris-Foulkes estimate   = {1:17.8f} Ry\n"
+                             "     estimated scf accuracy    < {2:17.8f} Ry\n\n".format(
+                                 energy + accuracy, energy + 1.1 * accuracy, accuracy))
+                accuracy /= 10.0
+
+        lines.append("     End of self-consistent calculation\n\n")
+        lines.append(self.bands())
+        lines.append("     highest occupied level (ev): {0:10.4f}\n\n".format(6.0))
+        lines.append("!    total energy              = {0:17.8f} Ry\n"
+                     "     Harris-Foulkes estimate   = {0:17.8f} Ry\n"
+                     "     estimated scf accuracy    < {1:17.8f} Ry\n\n"
+                     "     The total energy is the sum of the following terms:\n\n"
+                     "     one-electron contribution = {2:17.8f} Ry\n"
+                     "     hartree contribution      = {3:17.8f} Ry\n"
+                     "     xc contribution           = {4:17.8f} Ry\n"
+                     "     ewald contribution        = {5:17.8f} Ry\n\n"
+                     "     convergence has been achieved in {6:3d} iterations\n\n".format(
+                         energy, accuracy, 0.3 * energy, -0.07 * energy, 0.3 * energy,
+                         1.07 * energy, self.niter))
+
+        if forces:
+            force = self.rng.normal(0.0, 0.01 / (step + 1), (self.nat, 3))
+            lines.append("     Forces acting on atoms (Ry/au):\n\n")
+            for i, (index, f) in enumerate(zip(self.species_index, force)):
+                lines.append("     atom {0:4d} type {1:2d}   force = {2:14.8f}{3:14.8f}{4:14.8f}\n".format(
+                    i + 1, index + 1, *f))
+            lines.append("\n     Total force = {0:12.6f}     Total SCF correction = {1:12.6f}\n\n".format(
+                np.sqrt((force**2).sum()), 0.0))
+
+        if stress:
+            sigma = np.diag(self.rng.normal(0.0, 1e-4 / (step + 1), 3))
+            kbar = sigma * 147105.08
+            lines.append("\n     entering subroutine stress ...\n\n"
+                         "          total   stress  (Ry/bohr**3)                   (kbar)     P={0:12.2f}\n".format(
+                             np.trace(kbar) / 3.0))
+            for row, row_kbar in zip(sigma, kbar):
+                lines.append("  {0:13.8f}{1:13.8f}{2:13.8f}   {3:12.2f}{4:12.2f}{5:12.2f}\n".format(
+                    *np.concatenate([row, row_kbar])))
+            lines.append("\n\n")
+        return "".join(lines)
+
+    def atomic_positions(self):
+        lines = ["ATOMIC_POSITIONS (alat)\n"]
+        for index, position in zip(self.species_index, self.positions):
+            lines.append("{0:2s}    {1:14.9f}{2:14.9f}{3:14.9f}\n".format(
+                self.species[index][0], *position))
+        return "".join(lines)
+
+    def cell_parameters(self):
+        volume = self.alat**3
+        lattice = np.identity(3)
+        lines = ["     new unit-cell volume = {0:12.5f} a.u.^3 ({1:12.5f} Ang^3 )\n"
+                 "     density = {2:12.5f} g/cm^3\n\n"
+                 "CELL_PARAMETERS (alat={3:12.8f})\n".format(
+                     volume, volume * 0.148184711, 2.33, self.alat)]
+        for row in lattice:
+            lines.append("   {0:12.9f}   {1:12.9f}   {2:12.9f}\n".format(*row))
+        lines.append("\n")
+        return "".join(lines)
+
+    def move(self, scale):
+        self.positions += self.rng.normal(0.0, scale, self.positions.shape)
+        if self.calculation == "vc-relax":
+            self.alat *= 1.0 + self.rng.normal(0.0, scale)
+
+    def footer(self, cpu_time):
+        lines = []
+        for caller, routines in footer_routines:
+            if caller in ("General routines", "Parallel routines"):
+                lines.append("     {0}\n".format(caller))
+            elif caller is not None:
+                lines.append("     Called by {0}:\n".format(caller))
+            for routine in routines:
+                time = self.rng.uniform(0.0, cpu_time / 4.0)
+                lines.append("     {0:12s} : {1:10.2f}s CPU {2:10.2f}s WALL ({3:8d} calls)\n".format(
+                    routine, time, time * 1.05, self.rng.randint(1, 10 * self.niter * self.nks + 2)))
+            lines.append("\n")
+        lines.append("     PWSCF        : {0:10.2f}s CPU {1:10.2f}s WALL\n\n\n"
+                     "   This run was terminated on:  10:20:30  14Mar2015            \n\n"
+                     "=------------------------------------------------------------------------------=\n"
+                     "   JOB DONE.\n"
+                     "=------------------------------------------------------------------------------=\n".format(
+                         cpu_time, cpu_time * 1.05))
+        return "".join(lines)
+
+    def output(self):
+        """Returns the pw.x stdout of the run
+
+        """
+        blocks = [self.header()]
+        writing = "     Writing output data file {0}{1}.save/\n".format(self.outdir, self.prefix)
+        cpu_time = 0.1
+
+        if self.calculation == "scf":
+            blocks.append(self.scf(0, cpu_time, True, True))
+            blocks.append(writing + "\n")
+        elif self.calculation == "bands":
+            blocks.append("     Band Structure Calculation\n"
+                          "     Davidson diagonalization with overlap\n\n"
+                          "     ethr =  1.25E-10,  avg # of iterations = 12.0\n\n"
+                          "     total cpu time spent up to now is {0:10.1f} secs\n\n"
+                          "     End of band structure calculation\n\n".format(0.2 * self.nks))
+            blocks.append(self.bands())
+            blocks.append(writing + "\n")
+        elif self.calculation in ("relax", "vc-relax"):
+            stress = self.calculation == "vc-relax"
+            for step in range(self.nsteps):
+                blocks.append(self.scf(step, cpu_time, True, stress))
+                cpu_time += 0.1 * self.niter * self.nks
+                if step == 0:
+                    blocks.append("     BFGS Geometry Optimization\n\n")
+                blocks.append("     number of scf cycles    = {0:3d}\n"
+                              "     number of bfgs steps    = {1:3d}\n\n"
+                              "     energy   new            = {2:18.10f} Ry\n\n"
+                              "     new trust radius        = {3:18.10f} bohr\n"
+                              "     new conv_thr            = {4:18.10f} Ry\n\n".format(
+                                  step + 1, step, self.energy - 0.01 * step, 0.01, 1e-10))
+                if step == self.nsteps - 1:
+                    final = "enthalpy" if stress else "energy  "
+                    blocks.append("     bfgs converged in {0:3d} scf cycles and {1:3d} bfgs steps\n"
+                                  "     (criteria: energy <  1.0E-04 Ry, force <  1.0E-03 Ry/Bohr)\n\n"
+                                  "     End of BFGS Geometry Optimization\n\n"
+                                  "     Final {2} = {3:18.10f} Ry\n"
+                                  "Begin final coordinates\n".format(
+                                      self.nsteps, self.nsteps - 1, final, self.energy - 0.01 * step))
+                self.move(0.001)
+                if stress:
+                    blocks.append(self.cell_parameters())
+                blocks.append(self.atomic_positions())
+                if step == self.nsteps - 1:
+                    blocks.append("End final coordinates\n\n")
+                blocks.append("\n\n" + writing + "\n"
+                              "     NEW-OLD atomic charge density approx. for the potential\n\n")
+        elif self.calculation == "md":
+            blocks.append("     Molecular Dynamics Calculation\n\n")
+            for step in range(self.nsteps):
+                blocks.append(self.scf(step, cpu_time, True, False))
+                cpu_time += 0.1 * self.niter * self.nks
+                self.move(0.001)
+                blocks.append("     Entering Dynamics:    iteration = {0:5d}\n"
+                              "                           time      = {1:8.4f} pico-seconds\n\n".format(
+                                  step + 1, 0.001 * (step + 1)))
+                blocks.append(self.atomic_positions())
+                blocks.append("\n     kinetic energy (Ekin) = {0:14.8f} Ry\n"
+                              "     temperature           = {1:14.8f} K \n"
+                              "     Ekin + Etot (const)   = {2:14.8f} Ry\n\n".format(
+                                  0.001 * step, 300.0, self.energy))
+                blocks.append(writing + "\n")
+            blocks.append("     End of molecular dynamics calculation\n\n")
+
+        blocks.append(self.footer(cpu_time))
+        return "".join(blocks)
+
+    def write_save_directory(self, directory, nr=None):
+        """Writes the save directory (data-file.xml, charge-density.dat
+        and K?????/eigenval.xml) of the run into directory. nr is the
+        (nr1, nr2, nr3) of the charge density (default FFT grid).
+        Returns the path of data-file.xml.
+
+        """
+        if nr is None:
+            nr = self.fft_dimensions()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # Charge density: one z slice per tag (see _write_charge_density_file)
+        x, y, z = np.meshgrid(*[np.arange(n, dtype=float) / n for n in nr], indexing="ij")
+        density = self.nelec / self.alat**3 * (
+            1.0 + 0.5 * np.cos(2 * np.pi * x) * np.cos(2 * np.pi * y) * np.cos(2 * np.pi * z))
+        _write_charge_density_file(os.path.join(directory, "charge-density.dat"), density)
+
+        # Eigenvalues and occupations of each kpoint
+        kpoint_tags = []
+        nocc = int(self.nelec // 2)
+        for ik, (kpoint, weight) in enumerate(zip(self.kpoints, self.weights)):
+            kdir = "K{0:05d}".format(ik + 1)
+            if not os.path.isdir(os.path.join(directory, kdir)):
+                os.makedirs(os.path.join(directory, kdir))
+            eigenvalues = np.sort(self.rng.uniform(-0.25, 0.5, self.nbnd))
+            occupations = (np.arange(self.nbnd) < nocc).astype(float)
+            with open(os.path.join(directory, kdir, "eigenval.xml"), "w") as f:
+                f.write('<?xml version="1.0"?>\n<?iotk version="1.2.0"?>\n'
+                        '<?iotk file_version="1.0"?>\n<?iotk binary="F"?>\n'
+                        '<?iotk qe_syntax="F"?>\n<Root>\n'
+                        '  <INFO nbnd="{0}" ik="{1}" ik_eff="{1}" Units="Hartree"/>\n'
+                        '  <UNITS_FOR_ENERGIES UNITS="Hartree"/>\n'
+                        '  <EIGENVALUES type="real" size="{0}">\n'.format(self.nbnd, ik + 1))
+                f.write("".join("{0:24.15E}\n".format(e) for e in eigenvalues))
+                f.write('  </EIGENVALUES>\n  <OCCUPATIONS type="real" size="{0}">\n'.format(self.nbnd))
+                f.write("".join("{0:24.15E}\n".format(o) for o in occupations))
+                f.write('  </OCCUPATIONS>\n</Root>\n')
+
+            kpoint_tags.append(
+                '    <K-POINT.{0}>\n'
+                '      <K-POINT_COORDS type="real" size="3" columns="3">\n'
+                '{1:24.15E}{2:24.15E}{3:24.15E}\n'
+                '      </K-POINT_COORDS>\n'
+                '      <WEIGHT type="real" size="1">\n{4:24.15E}\n      </WEIGHT>\n'
+                '      <DATAFILE iotk_link="./{5}/eigenval.xml"/>\n'
+                '    </K-POINT.{0}>\n'.format(ik + 1, kpoint[0], kpoint[1], kpoint[2], weight, kdir))
+
+        data_file = os.path.join(directory, "data-file.xml")
+        with open(data_file, "w") as f:
+            f.write('<?xml version="1.0"?>\n<?iotk version="1.2.0"?>\n'
+                    '<?iotk file_version="1.0"?>\n<?iotk binary="F"?>\n'
+                    '<?iotk qe_syntax="F"?>\n<Root>\n'
+                    '  <HEADER>\n    <FORMAT NAME="QEXML">1.4.0</FORMAT>\n'
+                    '    <CREATOR NAME="PWSCF" VERSION="5.1">XML file generated by PWSCF</CREATOR>\n'
+                    '  </HEADER>\n'
+                    '  <BAND_STRUCTURE_INFO>\n'
+                    '    <NUMBER_OF_K-POINTS type="integer" size="1">\n{0}\n    </NUMBER_OF_K-POINTS>\n'
+                    '    <NUMBER_OF_SPIN_COMPONENTS type="integer" size="1">\n1\n    </NUMBER_OF_SPIN_COMPONENTS>\n'
+                    '    <NON-COLINEAR_CALCULATION type="logical" size="1">\nF\n    </NON-COLINEAR_CALCULATION>\n'
+                    '    <NUMBER_OF_ATOMIC_WFC type="integer" size="1">\n{1}\n    </NUMBER_OF_ATOMIC_WFC>\n'
+                    '    <NUMBER_OF_BANDS type="integer" size="1">\n{2}\n    </NUMBER_OF_BANDS>\n'
+                    '    <NUMBER_OF_ELECTRONS type="real" size="1">\n{3:24.15E}\n    </NUMBER_OF_ELECTRONS>\n'
+                    '    <UNITS_FOR_K-POINTS UNITS="2 pi / a"/>\n'
+                    '    <UNITS_FOR_ENERGIES UNITS="Hartree"/>\n'
+                    '    <FERMI_ENERGY type="real" size="1">\n{4:24.15E}\n    </FERMI_ENERGY>\n'
+                    '  </BAND_STRUCTURE_INFO>\n'
+                    '  <EXCHANGE_CORRELATION>\n'
+                    '    <DFT type="character" size="1" len="36">\n'
+                    ' SLA PZ NOGX NOGC ( 1  1  0  0 0 0)\n'
+                    '    </DFT>\n'
+                    '  </EXCHANGE_CORRELATION>\n'
+                    '  <CHARGE-DENSITY iotk_link="./charge-density.dat"/>\n'
+                    '  <EIGENVALUES>\n'.format(self.nks, 4 * self.nat, self.nbnd, self.nelec, 0.2))
+            f.writelines(kpoint_tags)
+            f.write('  </EIGENVALUES>\n</Root>\n')
+
+        return data_file
+
+
+def generate_output(calculation="scf", nat=2, ntyp=1, nks=2, nbnd=8,
+                    nsteps=3, niter=6, seed=None):
+    """Returns synthetic pw.x stdout of calculation (see SyntheticRun)
+
+    """
+    return SyntheticRun(calculation, nat, ntyp, nks, nbnd, nsteps, niter, seed=seed).output()
+
+
+def write_save_directory(directory, nr=(24, 24, 24), nat=2, nks=2, nbnd=8, seed=None):
+    """Writes a synthetic save directory (see
+    SyntheticRun.write_save_directory) and returns the path of
+    data-file.xml
+
+    """
+    return SyntheticRun("scf", nat, 1, nks, nbnd, seed=seed).write_save_directory(directory, nr)
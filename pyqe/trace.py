@@ -0,0 +1,138 @@
+""" Instrumentation of pyqe
+
+A Tracer records spans (named, timed stages such as rendering the
+input, running pw.x and parsing its output) and counters (eg. bytes
+parsed). Pass one to a Launcher (or to the pyqe.io readers) and
+export it to JSON or a Chrome trace (chrome://tracing, perfetto).
+
+tracer = Tracer()
+qe.run(launcher=Launcher(tracer=tracer))
+tracer.write("run.trace.json")
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Tracer:
+    """
+    Records spans and counters (thread safe)
+
+    callbacks - functions called with each finished span
+                {'name', 'start', 'duration', 'thread', 'args'}
+                (times in seconds since the tracer was created)
+    """
+    def __init__(self, callbacks=None):
+        self.spans = []
+        self.counters = {}
+        self.callbacks = list(callbacks or [])
+        self._samples = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **args):
+        """Records the time spent in the with block as span name
+
+        with tracer.span("read_out_file", nbytes=1024):
+            ...
+        """
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            record = {"name": name,
+                      "start": start - self._origin,
+                      "duration": end - start,
+                      "thread": threading.current_thread().ident,
+                      "args": args}
+            with self._lock:
+                self.spans.append(record)
+            for callback in self.callbacks:
+                callback(record)
+
+    def count(self, name, value=1):
+        """Adds value to counter name
+
+        """
+        with self._lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            self._samples.append((time.perf_counter() - self._origin, name, total))
+
+    def summary(self):
+        """Returns {name: {'count', 'total', 'max'}} of the spans
+        (seconds)
+
+        """
+        summary = {}
+        for record in self.spans:
+            entry = summary.setdefault(record["name"], {"count": 0, "total": 0.0, "max": 0.0})
+            entry["count"] += 1
+            entry["total"] += record["duration"]
+            entry["max"] = max(entry["max"], record["duration"])
+        return summary
+
+    def to_dict(self):
+        return {"spans": list(self.spans),
+                "counters": dict(self.counters),
+                "summary": self.summary()}
+
+    def to_chrome_trace(self):
+        """Returns the spans and counters in the Chrome trace event
+        format (times in microseconds)
+
+        """
+        pid = os.getpid()
+        events = []
+        for record in self.spans:
+            events.append({"name": record["name"], "ph": "X", "pid": pid,
+                           "tid": record["thread"],
+                           "ts": record["start"] * 1e6,
+                           "dur": record["duration"] * 1e6,
+                           "args": record["args"]})
+        for timestamp, name, total in self._samples:
+            events.append({"name": name, "ph": "C", "pid": pid,
+                           "ts": timestamp * 1e6, "args": {name: total}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, filename, trace_format="chrome"):
+        """Writes the trace to filename as a Chrome trace ('chrome')
+        or plain spans, counters and summary ('json')
+
+        """
+        if trace_format == "chrome":
+            trace = self.to_chrome_trace()
+        elif trace_format == "json":
+            trace = self.to_dict()
+        else:
+            error_str = "trace format {0} must be chrome or json"
+            raise Exception(error_str.format(trace_format))
+
+        with open(filename, "w") as f:
+            json.dump(trace, f, default=str)
+
+
+@contextmanager
+def _null_span():
+    yield {}
+
+
+def span(tracer, name, **args):
+    """tracer.span(name, **args) or a no-op if tracer is None
+
+    """
+    if tracer is None:
+        return _null_span()
+    return tracer.span(name, **args)
+
+
+def count(tracer, name, value=1):
+    """tracer.count(name, value) or a no-op if tracer is None
+
+    """
+    if tracer is not None:
+        tracer.count(name, value)
@@ -29,4 +29,5 @@ setup(name='python-qe',
       platforms=['linux'],
       packages=packages,
       package_dir=package_dir,
+      package_data={'pyqe': ['data/*.out']},
       long_description=long_description)
@@ -0,0 +1,17 @@
+import pytest
+
+from pyqe.espresso import PWBase
+
+
+@pytest.fixture
+def si():
+    """Two atom silicon scf input (fcc, ibrav=2)"""
+    qe = PWBase()
+    qe.control.add_keypairs({"calculation": "scf", "prefix": "si"})
+    qe.system.add_keypairs({"ibrav": 2, "celldm(1)": 10.26, "nat": 2,
+                            "ntyp": 1, "ecutwfc": 20.0})
+    qe.electrons.add_keypairs({"conv_thr": 1e-8})
+    qe.atomic_species.add_atom_type("Si", 28.086, "Si.pz-vbc.UPF")
+    qe.atomic_positions.set_positions(["Si", "Si"], [[0.0, 0.0, 0.0], [0.25, 0.25, 0.25]], "alat")
+    qe.k_points.from_monkhorst_pack([4, 4, 4], [1, 1, 1])
+    return qe
@@ -0,0 +1,78 @@
+import json
+import zipfile
+
+import numpy as np
+import pytest
+
+from pyqe import fakepw
+from pyqe.archive import save_results, load_results, archive_format
+from pyqe.launch import Launcher
+
+
+def test_round_trip(tmp_path):
+    results = {
+        "energy": -15.8,
+        "name": "si",
+        "none": None,
+        "eigenvalues": [float(i) for i in range(20)],
+        "occupations": tuple(range(20)),
+        "short": [1, 2],
+        "mixed": [1, 2.0] * 10,
+        "nested": {"forces": np.arange(6.0).reshape(2, 3),
+                   "empty": np.zeros((0, 3)),
+                   "strings": np.array(["a", "b"])},
+        "__pyqe_array__": {"__pyqe_dict__": 1},
+    }
+    filename = str(tmp_path / "results.npz")
+    save_results(results, filename)
+
+    for mmap in (True, False):
+        loaded = load_results(filename, mmap)
+        assert loaded["energy"] == -15.8
+        assert loaded["name"] == "si"
+        assert loaded["none"] is None
+        assert loaded["eigenvalues"] == results["eigenvalues"]
+        assert type(loaded["eigenvalues"][0]) is float
+        assert loaded["occupations"] == results["occupations"]
+        assert loaded["short"] == [1, 2]
+        assert loaded["mixed"] == results["mixed"]
+        assert np.array_equal(loaded["nested"]["forces"], results["nested"]["forces"])
+        assert loaded["nested"]["empty"].shape == (0, 3)
+        assert loaded["nested"]["strings"].tolist() == ["a", "b"]
+        assert loaded["__pyqe_array__"] == {"__pyqe_dict__": 1}
+
+    forces = load_results(filename)["nested"]["forces"]
+    assert isinstance(forces, np.memmap)
+    with pytest.raises(ValueError):
+        forces[0, 0] = 1.0
+
+
+def test_invalid_archives(tmp_path):
+    with pytest.raises(Exception):
+        save_results({1: "integer key"}, str(tmp_path / "bad.npz"))
+
+    filename = str(tmp_path / "other.npz")
+    with zipfile.ZipFile(filename, "w") as archive:
+        archive.writestr("header.json", json.dumps({"format": "other", "results": {}}))
+    with pytest.raises(Exception, match="not a pyqe results archive"):
+        load_results(filename)
+
+    filename = str(tmp_path / "old.npz")
+    with zipfile.ZipFile(filename, "w") as archive:
+        archive.writestr("header.json", json.dumps(
+            {"format": archive_format, "version": 1, "results": {}}))
+    with pytest.raises(Exception, match="archive version 1"):
+        load_results(filename)
+
+
+def test_run_results(si, tmp_path):
+    results = si.run(launcher=Launcher(executable=fakepw.command(), cwd=str(tmp_path)))
+    filename = str(tmp_path / "run.npz")
+    save_results(results, filename)
+
+    loaded = load_results(filename)
+    density = loaded["data-file"]["charge-density"]
+    assert isinstance(density, np.memmap)
+    assert np.array_equal(density, results["data-file"]["charge-density"])
+    assert loaded["calculation"]["total energy"] == results["calculation"]["total energy"]
+    assert loaded["timing"] == results["timing"]
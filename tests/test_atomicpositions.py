@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from pyqe.cards import AtomicPositions
+from pyqe.io import read_in_string
+
+
+def test_to_string_round_trip_is_exact():
+    positions = np.random.RandomState(0).uniform(-1.0, 1.0, (20, 3))
+    positions[0] = [1e-12, 1.0 / 3.0, -2.5e7]
+    atoms = AtomicPositions()
+    atoms.set_positions(["Si", "O"] * 10, positions, "crystal",
+                        if_pos=positions > 0)
+
+    qe = read_in_string(atoms.to_string())
+    assert qe.atomic_positions.option == "crystal"
+    assert qe.atomic_positions.symbols == atoms.symbols
+    assert np.array_equal(qe.atomic_positions.positions, positions)
+    assert np.array_equal(qe.atomic_positions.if_pos, positions > 0)
+
+
+def test_add_atom_position_matches_set_positions():
+    atoms = AtomicPositions()
+    atoms.add_atom_position("Si", [0.0, 0.0, 0.0], "alat")
+    atoms.add_atom_position("Ge", [0.25, 0.25, 0.25], "alat", if_pos=[1, 0, 1])
+
+    bulk = AtomicPositions()
+    bulk.set_positions(["Si", "Ge"], [[0.0] * 3, [0.25] * 3], "alat",
+                       if_pos=[[1, 1, 1], [1, 0, 1]])
+    assert atoms.to_string() == bulk.to_string()
+    assert atoms.species == ["Si", "Ge"]
+
+
+def test_atom_positions_are_read_only():
+    atoms = AtomicPositions()
+    atoms.set_positions(["Si"], [[0.0, 0.0, 0.0]])
+    symbol, position = atoms.atom_positions[0]
+    assert symbol == "Si"
+    with pytest.raises(ValueError):
+        position[0] = 1.0
+    atoms.positions[0, 0] = 1.0
+    assert atoms.atom_positions[0][1][0] == 1.0
+
+
+def test_invalid_positions():
+    atoms = AtomicPositions()
+    with pytest.raises(Exception):
+        atoms.set_positions(["Si"], [[0.0, 0.0]])
+    with pytest.raises(Exception):
+        atoms.set_positions(["Si", "Si"], [[0.0, 0.0, 0.0]])
+    with pytest.raises(Exception):
+        atoms.set_positions(["Si"], [[0.0, 0.0, 0.0]], "meters")
+    with pytest.raises(Exception):
+        atoms.add_atom_position("Sil", [0.0, 0.0, 0.0])
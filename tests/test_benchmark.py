@@ -0,0 +1,50 @@
+import copy
+import os
+
+import pytest
+
+from pyqe.benchmark import (run_benchmarks, format_results, expect, data_dir,
+                            reference_outputs, check_reference_output)
+from pyqe.io import read_out_file
+
+
+def test_run_benchmarks():
+    results = run_benchmarks("small", repeat=1)
+    names = [result["name"] for result in results]
+    assert "read_out_file[scf]" in names
+    assert "read_out_file[si.scf.out]" in names
+    assert "read_in_string" in names
+    assert all(result["best"] > 0.0 for result in results)
+
+    table = format_results(results)
+    assert len(table.splitlines()) == len(results) + 1
+
+    assert [result["name"] for result in run_benchmarks("small", 1, "cube")] == \
+        ["write_cube[bohr]", "write_cube[angstrom]"]
+    with pytest.raises(Exception):
+        run_benchmarks("huge")
+
+
+def test_reference_output_check_detects_wrong_results():
+    with open(os.path.join(data_dir, "si.scf.out")) as f:
+        results = read_out_file(f.read())
+    check = check_reference_output(reference_outputs["si.scf.out"])
+    check(results)
+
+    wrong = copy.deepcopy(results)
+    wrong["calculation"]["total energy"] += 1e-4
+    with pytest.raises(Exception):
+        check(wrong)
+    wrong = copy.deepcopy(results)
+    wrong["header"]["number kpoints"] = 20
+    with pytest.raises(Exception):
+        check(wrong)
+
+
+def test_expect():
+    expect("number", 1.0 + 1e-8, 1.0)
+    expect("list", [1, 2], [1, 2])
+    with pytest.raises(Exception):
+        expect("number", 1.1, 1.0)
+    with pytest.raises(Exception):
+        expect("shape", [1.0, 2.0], 1.0)
@@ -0,0 +1,79 @@
+import os
+import shutil
+
+import numpy as np
+
+from pyqe.benchmark import data_dir
+from pyqe.bulk import (find_files, parse_files, map_files, write_jsonl, read_jsonl,
+                       write_npz, to_builtin, main)
+from pyqe.synthetic import SyntheticRun
+
+
+def make_outputs(directory):
+    shutil.copy(os.path.join(data_dir, "si.scf.out"), str(directory / "b.out"))
+    (directory / "sub").mkdir()
+    run = SyntheticRun("scf", seed=0)
+    (directory / "sub" / "a.out").write_text(run.output())
+    (directory / "sub" / "notes.txt").write_text("not an output")
+    (directory / "c.out").write_text("truncated")
+
+
+def square(value):
+    return value * value
+
+
+def test_find_files(tmp_path):
+    make_outputs(tmp_path)
+    names = [os.path.relpath(path, str(tmp_path)) for path in find_files([str(tmp_path)])]
+    assert names == ["b.out", "c.out", os.path.join("sub", "a.out")]
+    assert len(list(find_files([str(tmp_path)], ("*.txt", "*.out")))) == 4
+    assert list(find_files([str(tmp_path / "c.out")])) == [str(tmp_path / "c.out")]
+
+
+def test_map_files():
+    assert sorted(map_files(square, range(10), processes=2, chunksize=2)) == \
+        [i * i for i in range(10)]
+    assert list(map_files(square, [3], processes=4)) == [9]
+
+
+def test_parse_files(tmp_path):
+    make_outputs(tmp_path)
+    records = {os.path.basename(record["path"]): record
+               for record in parse_files([str(tmp_path)], processes=2)}
+    assert records["b.out"]["results"]["calculation"]["total energy"] == -15.79747179
+    assert "results" in records["a.out"]
+    assert "error" in records["c.out"]
+
+
+def test_jsonl_round_trip(tmp_path):
+    records = [{"path": "a", "results": {"energy": np.float64(-1.5),
+                                         "forces": np.zeros((2, 3))}},
+               {"path": "b", "error": "Exception: bad"}]
+    for filename in ("records.jsonl", "records.jsonl.gz"):
+        path = str(tmp_path / filename)
+        assert write_jsonl(records, path) == 2
+        assert list(read_jsonl(path)) == to_builtin(records)
+
+
+def test_write_npz(tmp_path):
+    records = [{"path": "a", "results": {"energy": -1.5, "kpoints": [[0, 0, 0]],
+                                         "header": {"name": "si"}}},
+               {"path": "b", "error": "Exception: bad"}]
+    path = str(tmp_path / "records.npz")
+    assert write_npz(records, path) == 2
+    with np.load(path) as archive:
+        assert archive["paths"].tolist() == ["a", "b"]
+        assert archive["errors"].tolist() == ["", "Exception: bad"]
+        assert archive["0/results/energy"] == -1.5
+        assert archive["0/results/kpoints"].shape == (1, 3)
+        assert str(archive["0/results/header/name"]) == '"si"'
+
+
+def test_main(tmp_path, capsys):
+    make_outputs(tmp_path)
+    output = str(tmp_path / "results.jsonl.gz")
+    assert main([str(tmp_path), "-o", output, "--processes", "1"]) == 0
+    assert len(list(read_jsonl(output))) == 3
+    assert "3 files (1 failed)" in capsys.readouterr().out
+
+    assert main([str(tmp_path / "c.out"), "-o", str(tmp_path / "failed.npz")]) == 1
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from pyqe.cards import KPoints
+from pyqe.cost import (good_fft_order, fft_dimensions, number_plane_waves,
+                       number_electrons, number_bands, number_kpoints, estimate_cost)
+
+
+valence = {"Si": 4.0}
+
+
+def test_good_fft_order():
+    assert good_fft_order(19) == 20
+    assert good_fft_order(13) == 14
+    assert good_fft_order(97) == 98
+    assert good_fft_order(64) == 64
+
+
+def test_grid_and_plane_waves_match_pw(si):
+    # tests/data/si.scf.out: alat 10.2, ecutwfc 18, ecutrho 72
+    si.system.add_keypairs({"celldm(1)": 10.2, "ecutwfc": 18.0})
+    cell = si.get_cell()
+    assert fft_dimensions(cell, 72.0) == [20, 20, 20]
+    # pw.x reports 335 - 343 plane waves per kpoint
+    assert 330 < number_plane_waves(265.302, 18.0) < 350
+
+
+def test_electrons_bands(si, tmp_path):
+    assert number_electrons(si, valence) == 8.0
+    assert number_bands(si, 8.0) == 4
+
+    si.system.add_keypairs({"occupations": "smearing"})
+    assert number_bands(si, 8.0) == 8
+    si.system.add_keypairs({"nbnd": 12})
+    assert number_bands(si, 8.0) == 12
+
+    (tmp_path / "Si.pz-vbc.UPF").write_text(
+        '<PP_HEADER\n   z_valence="4.000000000000000E+000"\n/>\n')
+    si.control.add_keypairs({"pseudo_dir": str(tmp_path)})
+    si.system.add_keypairs({"tot_charge": 1.0})
+    assert number_electrons(si) == 7.0
+
+    si.control.add_keypairs({"pseudo_dir": str(tmp_path / "missing")})
+    with pytest.raises(Exception):
+        number_electrons(si)
+
+
+def test_number_kpoints(si):
+    assert number_kpoints(si) == 10
+    si.system.add_keypairs({"nosym": True})
+    assert number_kpoints(si) == 32
+    si.system.add_keypairs({"nspin": 2, "starting_magnetization(1)": 0.5})
+    assert number_kpoints(si) == 64
+
+    si.k_points.from_list([[0.0, 0.0, 0.0], [0.5, 0.0, 0.0], [0.5, 0.5, 0.0]],
+                          [10, 5, 1], "crystal_b")
+    assert number_kpoints(si) == 2 * 16
+
+    gamma = KPoints()
+    gamma.option = "gamma"
+    assert number_kpoints(si.derive(k_points=gamma, system={"nspin": 1})) == 1
+
+
+def test_estimate_cost(si):
+    cost = estimate_cost(si, valence=valence)
+    assert cost["number kpoints"] == 10
+    assert cost["number bands"] == 4
+    assert cost["fft dimensions"] == fft_dimensions(si.get_cell(), 80.0)
+
+    # pools split kpoints, ranks within a pool split the arrays
+    pools = estimate_cost(si, nranks=2, npool=2, valence=valence)
+    ranks = estimate_cost(si, nranks=2, npool=1, valence=valence)
+    assert pools["memory per rank"] < cost["memory per rank"]
+    assert ranks["memory per rank"] < cost["memory per rank"]
+    assert pools["runtime score"] == cost["runtime score"]
+
+    larger = estimate_cost(si.derive(system={"ecutwfc": 40.0}), valence=valence)
+    assert larger["plane waves"] > cost["plane waves"]
+    assert larger["memory"] > cost["memory"]
+    assert larger["runtime score"] > cost["runtime score"]
+
+    with pytest.raises(Exception):
+        estimate_cost(si, nranks=3, npool=2, valence=valence)
@@ -0,0 +1,108 @@
+import os
+import shutil
+
+import pytest
+
+from pyqe.benchmark import data_dir
+from pyqe.database import RunDatabase, file_hash, run_record_with_hash, chemical_formula
+from pyqe.synthetic import SyntheticRun
+
+
+@pytest.fixture
+def outputs(tmp_path):
+    """Directory of pw.x outputs: the Si fixture, synthetic relax
+    runs and a truncated output"""
+    shutil.copy(os.path.join(data_dir, "si.scf.out"), str(tmp_path / "si.out"))
+    for i in range(3):
+        run = SyntheticRun("relax", nat=4, ntyp=2, seed=i)
+        (tmp_path / "relax").mkdir(exist_ok=True)
+        (tmp_path / "relax" / "{0}.out".format(i)).write_text(run.output())
+    (tmp_path / "broken.out").write_text("     Program PWSCF v.5.4.0 starts\n")
+    return tmp_path
+
+
+def test_chemical_formula():
+    assert chemical_formula(["O", "Ga", "O", "Ga", "O"]) == "Ga2O3"
+    assert chemical_formula(["Si"]) == "Si"
+
+
+def test_index_and_query(outputs):
+    db = RunDatabase()
+    assert db.index([str(outputs)], processes=2) == \
+        {"parsed": 5, "failed": 1, "unchanged": 0}
+    assert len(db) == 5
+
+    si, = db.query(species=["Si"], only_species=True)
+    assert si["formula"] == "Si2"
+    assert si["calculation"] == "scf"
+    assert si["energy"] == -15.79747179
+    assert si["nks"] == 10
+    assert si["scf_iterations"] == 5
+    assert si["fft_dimensions"] == [20, 20, 20]
+    assert si["wall_time"] == 0.22
+    assert si["hash"] is None
+
+    relax = db.query("calculation = ? AND nat = ?", ("relax", 4))
+    assert len(relax) == 3
+    assert all(row["ionic_steps"] == 3 for row in relax)
+    assert len(db.query("ecutwfc > ?", (100,))) == 0
+
+    broken, = db.query("error IS NOT NULL", errors=True)
+    assert broken["path"].endswith("broken.out")
+    db.close()
+
+
+def test_reindex_by_mtime(outputs):
+    db = RunDatabase(str(outputs / "runs.sqlite"))
+    db.index([str(outputs)], processes=1)
+    assert db.index([str(outputs)]) == {"parsed": 0, "failed": 0, "unchanged": 5}
+
+    os.utime(str(outputs / "si.out"), (1e9, 1e9))
+    assert db.index([str(outputs)]) == {"parsed": 1, "failed": 0, "unchanged": 4}
+    db.close()
+
+    # the database persists in the file
+    assert len(RunDatabase(str(outputs / "runs.sqlite"))) == 5
+
+
+def test_reindex_by_hash(outputs):
+    db = RunDatabase()
+    db.index([str(outputs)], processes=2, check="hash")
+    path = str(outputs / "si.out")
+    si, = db.query("path = ?", (path,))
+    assert si["hash"] == file_hash(path)
+
+    # same contents, new mtime: not parsed again but the mtime is updated
+    os.utime(path, (1e9, 1e9))
+    assert db.index([str(outputs)], processes=2, check="hash") == \
+        {"parsed": 0, "failed": 0, "unchanged": 5}
+    assert db.query("path = ?", (path,))[0]["mtime"] == 1e9
+
+    # same size, other contents
+    with open(path) as f:
+        contents = f.read()
+    with open(path, "w") as f:
+        f.write(contents.replace("-15.79747179", "-15.79747170"))
+    os.utime(path, (2e9, 2e9))
+    assert db.index([str(outputs)], processes=2, check="hash") == \
+        {"parsed": 1, "failed": 0, "unchanged": 4}
+    assert db.query("path = ?", (path,))[0]["energy"] == -15.7974717
+
+    with pytest.raises(Exception):
+        db.index([str(outputs)], check="size")
+
+
+def test_hash_is_computed_by_the_worker(outputs):
+    path = str(outputs / "si.out")
+    record = run_record_with_hash(path)
+    assert record["hash"] == file_hash(path)
+    assert record["energy"] == -15.79747179
+
+
+def test_prune(outputs):
+    db = RunDatabase()
+    db.index([str(outputs)], processes=1)
+    os.remove(str(outputs / "relax" / "0.out"))
+    assert db.prune() == 1
+    assert len(db) == 4
+    assert len(db.query(species=["Si"])) == 3
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from pyqe.density import integrate, axis_length, axis_coordinates, planar_average, \
+    macroscopic_average, interpolate_fft, sample, dipole, cell_from_header
+from pyqe.lattice import cell_volume
+
+
+in_plane = [np.array([5.0, 0.0, 0.0]), np.array([1.0, 6.0, 0.0])]
+normal = np.array([0.5, 0.3, 20.0])
+
+
+def slab_cell(axis, left_handed=False):
+    """Returns the slab cell with the normal vector at row axis"""
+    a, b = in_plane[::-1] if left_handed else in_plane
+    rows = [a, b, normal]
+    return np.array([rows[(i - axis + 2) % 3] for i in range(3)])
+
+
+def slab_density(cell, axis, nelec, center=0.5, n=80, sigma=1.0):
+    """Returns a gaussian slab of nelec electrons at fractional center
+    along axis"""
+    length = axis_length(cell, axis)
+    z = (np.arange(n) / n - center) * length
+    profile = np.exp(-z**2 / (2 * sigma**2))
+    shape = [4, 4, 4]
+    shape[axis] = n
+    profile_shape = [1, 1, 1]
+    profile_shape[axis] = n
+    density = np.broadcast_to(profile.reshape(profile_shape), shape).copy()
+    return density * nelec / integrate(density, cell)
+
+
+def test_cell_from_header():
+    header = {"crystal axes": [[-0.5, 0.0, 0.5], [0.0, 0.5, 0.5], [-0.5, 0.5, 0.0]],
+              "lattice parameter": 10.2}
+    assert np.allclose(cell_from_header(header)[0], [-5.1, 0.0, 5.1])
+
+
+def test_integrate_and_averages():
+    cell = slab_cell(2)
+    density = np.full((4, 5, 6), 0.25)
+    assert integrate(density, cell) == pytest.approx(0.25 * cell_volume(cell))
+    assert axis_length(cell, 2) == pytest.approx(20.0)
+    assert np.allclose(axis_coordinates(cell, density.shape, 2), np.arange(6) * 20.0 / 6)
+
+    density = np.arange(4 * 5 * 6, dtype=float).reshape(4, 5, 6)
+    for axis in range(3):
+        average = planar_average(density, axis)
+        assert average.shape == (density.shape[axis],)
+        assert np.allclose(average, np.moveaxis(density, axis, 0).reshape(density.shape[axis], -1).mean(1))
+
+
+def test_macroscopic_average():
+    length, n = 20.0, 100
+    z = np.arange(n) * length / n
+    average = 3.0 + np.cos(2 * np.pi * z / 5.0)
+    # a window of the period removes the oscillation
+    assert np.allclose(macroscopic_average(average, length, 5.0), 3.0)
+    # two windows applied in turn (superlattice)
+    average = 3.0 + np.cos(2 * np.pi * z / 5.0) + np.cos(2 * np.pi * z / 4.0)
+    assert np.allclose(macroscopic_average(average, length, [5.0, 4.0]), 3.0)
+
+
+@pytest.mark.parametrize("shape,fine", [((8, 6, 5), (16, 12, 15)), ((7, 9, 4), (14, 9, 8))])
+def test_interpolate_fft(shape, fine):
+    def function(shape):
+        x, y, z = np.meshgrid(*[np.arange(n) / n for n in shape], indexing="ij")
+        return 1.0 + np.cos(2 * np.pi * x) + 0.5 * np.sin(2 * np.pi * (y - z)) + \
+            0.25 * np.cos(2 * np.pi * (x + y + z))
+
+    interpolated = interpolate_fft(function(shape), fine)
+    assert interpolated.shape == fine
+    assert np.allclose(interpolated, function(fine))
+
+    with pytest.raises(Exception, match="fewer points"):
+        interpolate_fft(function(shape), (4, 4, 4))
+    with pytest.raises(Exception, match="dimensions"):
+        interpolate_fft(function(shape), (16, 12))
+
+
+def test_sample():
+    cell = slab_cell(2)
+    density = np.random.RandomState(0).uniform(size=(4, 5, 6))
+
+    # grid points (cartesian and fractional) and periodic images
+    fractional = np.array([[0.0, 0.0, 0.0], [0.25, 0.4, 0.5], [1.25, -0.6, 0.5]])
+    expected = [density[0, 0, 0], density[1, 2, 3], density[1, 2, 3]]
+    assert np.allclose(sample(density, cell, fractional, cartesian=False), expected)
+    assert np.allclose(sample(density, cell, np.dot(fractional, cell)), expected)
+
+    # half way between grid points along x
+    assert sample(density, cell, [0.125, 0.0, 0.0], cartesian=False)[0] == \
+        pytest.approx(0.5 * (density[0, 0, 0] + density[1, 0, 0]))
+
+
+@pytest.mark.parametrize("left_handed", [False, True])
+@pytest.mark.parametrize("axis", [0, 1, 2])
+def test_dipole(axis, left_handed):
+    cell = slab_cell(axis, left_handed)
+    nelec, shift = 8.0, 0.05
+    density = slab_density(cell, axis, nelec)
+    length = axis_length(cell, axis)
+    assert length == pytest.approx(20.0)
+
+    def ion(center):
+        fractional = np.array([0.3, 0.7, 0.2])
+        fractional[axis] = center
+        return [np.dot(fractional, cell)]
+
+    # electrons alone (measured from the vacuum)
+    assert dipole(density, cell, axis) == pytest.approx(-nelec * 0.5 * length)
+
+    # neutral symmetric slab
+    assert abs(dipole(density, cell, axis, ion(0.5), [nelec])) < 1e-8
+
+    # ions displaced along +cell[axis] give a positive dipole
+    moment = dipole(density, cell, axis, ion(0.5 + shift), [nelec])
+    assert moment == pytest.approx(nelec * shift * length)
+
+    with pytest.raises(Exception, match="charges"):
+        dipole(density, cell, axis, ion(0.5))
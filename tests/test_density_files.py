@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from pyqe.io import read_charge_density_file, write_cube, read_cube, write_xsf
+from pyqe.lattice import bohr
+from pyqe.synthetic import _write_charge_density_file
+
+
+cell = np.array([[6.0, 0.0, 0.0], [1.0, 7.0, 0.0], [0.5, 0.5, 8.0]])
+positions = np.array([[0.0, 0.0, 0.0], [1.5, 2.0, 2.5]])
+symbols = ["Si", "O"]
+
+
+def density(shape=(4, 5, 6)):
+    return np.random.RandomState(0).uniform(0.1, 1.0, size=shape)
+
+
+def test_charge_density_round_trip(tmp_path):
+    rho = density()
+    filename = str(tmp_path / "charge-density.dat")
+    _write_charge_density_file(filename, rho)
+
+    read = read_charge_density_file(filename)
+    assert read.shape == rho.shape
+    assert np.array_equal(read, rho)
+
+
+def test_charge_density_missing_slices(tmp_path):
+    filename = str(tmp_path / "charge-density.dat")
+    _write_charge_density_file(filename, density())
+    with open(filename, "rb") as f:
+        content = f.read()
+    with open(filename, "wb") as f:
+        f.write(content.replace(b'nr3="6"', b'nr3="7"'))
+
+    with pytest.raises(Exception, match="6 of 7 z slices"):
+        read_charge_density_file(filename)
+
+
+@pytest.mark.parametrize("angstrom", [False, True])
+def test_cube_round_trip(tmp_path, angstrom):
+    rho = density()
+    filename = str(tmp_path / "density.cube")
+    write_cube(filename, rho, cell, positions, symbols, comment="test",
+               origin=(0.5, 0.0, 0.0), angstrom=angstrom)
+
+    with open(filename) as f:
+        lines = f.readlines()
+    voxels = [int(line.split()[0]) for line in lines[3:6]]
+    assert voxels == ([-4, -5, -6] if angstrom else [4, 5, 6])
+    if angstrom:
+        assert float(lines[3].split()[1]) == pytest.approx(6.0 / 4 * bohr, abs=1e-6)
+
+    cube = read_cube(filename)
+    assert cube["comment"] == "test"
+    assert cube["numbers"] == [14, 8]
+    assert np.allclose(cube["density"], rho, rtol=1e-5)
+    assert np.allclose(cube["cell"], cell, atol=1e-5)
+    assert np.allclose(cube["positions"], positions, atol=1e-5)
+    assert np.allclose(cube["origin"], [0.5, 0.0, 0.0], atol=1e-5)
+
+
+def test_cube_errors(tmp_path):
+    with pytest.raises(Exception, match="number of symbols"):
+        write_cube(str(tmp_path / "bad.cube"), density(), cell, positions, ["Si"])
+
+    filename = str(tmp_path / "short.cube")
+    write_cube(filename, density(), cell)
+    with open(filename) as f:
+        lines = f.readlines()
+    with open(filename, "w") as f:
+        f.writelines(lines[:-1])
+    with pytest.raises(Exception, match="values but grid"):
+        read_cube(filename)
+
+
+def test_xsf(tmp_path):
+    rho = density()
+    filename = str(tmp_path / "density.xsf")
+    write_xsf(filename, rho, cell, positions, symbols)
+
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    assert np.allclose([[float(_) for _ in line.split()] for line in lines[2:5]], cell * bohr)
+    assert lines[6].split() == ["2", "1"]
+    assert lines[7].split()[0] == "14" and lines[8].split()[0] == "8"
+
+    start = lines.index(" BEGIN_DATAGRID_3D_charge_density")
+    assert lines[start + 1].split() == ["5", "6", "7"]
+    assert np.allclose([[float(_) for _ in line.split()] for line in lines[start + 3:start + 6]],
+                       cell * bohr)
+    end = lines.index(" END_DATAGRID_3D")
+    values = np.array(" ".join(lines[start + 6:end]).split(), dtype=float)
+    grid = values.reshape((5, 6, 7), order="F")
+    # periodic general grid: the end points repeat the first points
+    assert np.allclose(grid[:4, :5, :6], rho, rtol=1e-6)
+    assert np.allclose(grid[4], grid[0]) and np.allclose(grid[:, 5], grid[:, 0])
+    assert np.allclose(grid[:, :, 6], grid[:, :, 0])
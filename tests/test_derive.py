@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from pyqe.cards import KPoints
+
+
+def test_derive_applies_changes(si):
+    kpoints = KPoints()
+    kpoints.from_monkhorst_pack([6, 6, 6], [0, 0, 0])
+    derived = si.derive(system={"ecutwfc": 30.0}, k_points=kpoints)
+
+    assert derived.system.get_current_value("ecutwfc") == 30.0
+    assert si.system.get_current_value("ecutwfc") == 20.0
+    assert derived.k_points is kpoints
+    assert "6 6 6 0 0 0" in derived.to_string()
+    assert "4 4 4 1 1 1" in si.to_string()
+
+
+def test_derive_isolated_from_parent(si):
+    derived = si.derive(system={"ecutwfc": 30.0})
+
+    si.atomic_positions.set_positions(["Si"], [[0.1, 0.1, 0.1]], "alat")
+    si.control.add_keypairs({"prefix": "parent"})
+    assert derived.atomic_positions.num_atoms() == 2
+    assert derived.control.get_current_value("prefix") == "si"
+
+    derived.atomic_positions.positions[0, 0] = 0.5
+    derived.electrons.add_keypairs({"conv_thr": 1e-6})
+    assert np.allclose(si.atomic_positions.positions, [[0.1, 0.1, 0.1]])
+    assert si.electrons.get_current_value("conv_thr") == 1e-8
+
+
+def test_derive_renders_like_built_input(si):
+    derived = si.derive(system={"ecutwfc": 30.0})
+    si.system.add_keypairs({"ecutwfc": 30.0})
+    assert derived.to_string() == si.to_string()
+
+
+def test_derive_rejects_invalid_changes(si):
+    with pytest.raises(Exception):
+        si.derive(k_points="not a card")
+    with pytest.raises(Exception):
+        si.derive(nonsense={"a": 1})
@@ -0,0 +1,48 @@
+import os
+
+from pyqe import fakepw
+from pyqe.io import read_out_file
+from pyqe.launch import Launcher
+
+
+def test_command_runs_outside_the_checkout(si, tmp_path, monkeypatch):
+    # uninstalled checkout: pyqe is only importable through the command
+    monkeypatch.delenv("PYTHONPATH", raising=False)
+    launcher = Launcher(executable=fakepw.command(steps=2), cwd=str(tmp_path))
+    execution = launcher.execute(launcher.command(si), launcher.render(si).encode(),
+                                 str(tmp_path))
+    assert execution["returncode"] == 0, execution["stderr"].decode()
+
+    results = read_out_file(execution["stdout"].decode())
+    assert results["header"]["number atoms/cell"] == 2
+    assert os.path.isfile(str(tmp_path / "si.save" / "data-file.xml"))
+
+
+def test_run_matches_input(si, tmp_path):
+    relax = si.derive(control={"calculation": "relax", "nstep": 10})
+    launcher = Launcher(executable=fakepw.command(steps=2), cwd=str(tmp_path),
+                        postfix=["-nk", "2"])
+    results = relax.run(launcher=launcher)
+    assert len(results["calculation"]["iterations"]) == 2
+    assert results["header"]["number kpoints"] == 10
+    assert results["header"]["kinetic-energy cutoff"] == 20.0
+    assert [species[0] for species in results["header"]["atomic species"]] == ["Si"]
+
+
+def test_input_file_and_options_from_environment(si, tmp_path):
+    infile = str(tmp_path / "si.in")
+    si.to_file(infile)
+    launcher = Launcher(executable=fakepw.command(), env={"PYQE_FAKEPW_FAIL": "1"},
+                        cwd=str(tmp_path))
+    execution = launcher.execute(launcher.command(si, infile), None, str(tmp_path))
+    assert execution["returncode"] == 1
+    assert os.path.isfile(str(tmp_path / "CRASH"))
+
+
+def test_invalid_input_crashes(tmp_path):
+    launcher = Launcher(executable=fakepw.command())
+    execution = launcher.execute(launcher.executable, b" &system\n  nat = -1\n /\n",
+                                 str(tmp_path))
+    assert execution["returncode"] == 1
+    with open(str(tmp_path / "CRASH")) as f:
+        assert "read_namelists" in f.read()
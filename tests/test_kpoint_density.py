@@ -0,0 +1,30 @@
+import numpy as np
+
+from pyqe.lattice import density_monkhorst_pack_grid, reciprocal_lattice, bohr
+
+
+def test_density_monkhorst_pack_grid():
+    cell = np.diag([10.0, 20.0, 40.0])
+    # 2 pi / L kpoints per 1/angstrom
+    lengths = 2.0 * np.pi / (np.diag(cell) * bohr)
+    assert density_monkhorst_pack_grid(cell, 3.0) == \
+        [int(_) for _ in np.ceil(lengths * 3.0)] == [4, 2, 1]
+    assert density_monkhorst_pack_grid(cell, 3.0, even=True) == [4, 2, 2]
+    assert density_monkhorst_pack_grid(cell, 1e-3) == [1, 1, 1]
+
+
+def test_density_grid_is_exact_at_integer_densities():
+    cell = np.diag([10.0, 10.0, 10.0])
+    length = np.linalg.norm(reciprocal_lattice(cell)[0]) / bohr
+    assert density_monkhorst_pack_grid(cell, 4.0 / length) == [4, 4, 4]
+
+
+def test_set_kpoint_density(si):
+    si.set_kpoint_density(2.0, offset=(1, 1, 1))
+    assert si.k_points.option == "automatic"
+    # |b| = 2 pi sqrt(3) / alat for fcc
+    assert si.k_points.config == [[5, 5, 5], [1, 1, 1]]
+
+    si.set_kpoint_density(2.0, even=True)
+    assert si.k_points.config == [[6, 6, 6], [0, 0, 0]]
+    assert si.to_string().endswith("K_POINTS (automatic)\n   6 6 6 0 0 0\n")
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from pyqe.cards import KPoints
+from pyqe.io import read_in_string
+
+
+def test_monkhorst_pack():
+    kpoints = KPoints()
+    kpoints.from_monkhorst_pack([4, 4, 2], [1, 1, 0])
+    assert kpoints.to_string().split() == \
+        ["K_POINTS", "(automatic)", "4", "4", "2", "1", "1", "0"]
+    with pytest.raises(Exception):
+        kpoints.from_monkhorst_pack([4, 4], [0, 0, 0])
+
+
+def test_list_round_trip_is_exact():
+    random = np.random.RandomState(1)
+    points = random.uniform(-0.5, 0.5, (30, 3))
+    points[0] = [1.0 / 3.0, 1e-9, 0.0]
+    weights = random.uniform(0.0, 1.0, 30)
+
+    kpoints = KPoints()
+    kpoints.from_list(points, weights, "crystal")
+    qe = read_in_string(kpoints.to_string())
+    assert qe.k_points.option == "crystal"
+    assert np.array_equal(qe.k_points.kpoints, points)
+    assert np.array_equal(qe.k_points.weights, weights)
+
+
+def test_list_defaults_and_errors():
+    kpoints = KPoints()
+    kpoints.from_list([[0.0, 0.0, 0.0], [0.5, 0.0, 0.0]])
+    assert kpoints.option == "tpiba"
+    assert kpoints.weights.tolist() == [1.0, 1.0]
+    kpoints.validate()
+
+    with pytest.raises(Exception):
+        kpoints.from_list([[0.0, 0.0]])
+    with pytest.raises(Exception):
+        kpoints.from_list([[0.0, 0.0, 0.0]], [1.0, 2.0])
+    with pytest.raises(Exception):
+        kpoints.from_list([[0.0, 0.0, 0.0]], option="automatic")
+
+
+def test_band_path_labels(si):
+    kpoints = KPoints()
+    kpoints.from_band_path(si.get_cell(), 5.0, "GXW|LG")
+    labels = kpoints.labels
+    assert [label for index, label in labels] == ["G", "X", "W", "L", "G"]
+    assert labels[0][0] == 0 and labels[-1][0] == len(kpoints.kpoints) - 1
+
+    # special points in crystal coordinates of the fcc reciprocal lattice
+    np.testing.assert_allclose(kpoints.kpoints[labels[1][0]], [0.0, 0.5, 0.5], atol=1e-12)
+    np.testing.assert_allclose(kpoints.kpoints[labels[3][0]], [0.0, 0.5, 0.0], atol=1e-12)
+
+    # labels are written as comments after their kpoints
+    lines = kpoints.to_string().splitlines()[2:]
+    assert [line.split("!")[1].strip() for line in lines if "!" in line] == \
+        ["G", "X", "W", "L", "G"]
+    assert lines[labels[2][0]].endswith("! W")
+
+    qe = read_in_string(kpoints.to_string())
+    assert np.array_equal(qe.k_points.kpoints, kpoints.kpoints)
+
+
+def test_band_path_errors_and_labels_reset(si):
+    kpoints = KPoints()
+    with pytest.raises(Exception):
+        kpoints.from_band_path(si.get_cell(), 5.0, "GX|L")
+    with pytest.raises(Exception):
+        kpoints.from_band_path(si.get_cell(), 5.0, "GZ")
+
+    kpoints.from_band_path(si.get_cell(), 5.0)
+    assert kpoints.labels
+    kpoints.from_monkhorst_pack([2, 2, 2], [0, 0, 0])
+    assert kpoints.labels is None
+    kpoints.from_band_path(si.get_cell(), 5.0)
+    kpoints.from_list([[0.0, 0.0, 0.0]])
+    assert kpoints.labels is None
+    assert "!" not in kpoints.to_string()
@@ -0,0 +1,106 @@
+import pytest
+
+from pyqe.launch import plan_launch, divisors
+
+
+valence = {"Si": 4.0}
+
+
+def test_divisors():
+    assert divisors(12) == [1, 2, 3, 4, 6, 12]
+    assert divisors(1) == [1]
+
+
+def test_plan_serial(si):
+    plan = plan_launch(si, 1, valence)
+    assert plan["prefix"] == []
+    assert plan["postfix"] == ["-nk", "1", "-nt", "1"]
+
+
+@pytest.mark.parametrize("ncores", [2, 10, 16, 64])
+def test_plan_pools(si, ncores):
+    plan = plan_launch(si, ncores, valence)
+    assert plan["np"] == ncores
+    assert plan["prefix"] == ["mpirun", "-np", str(ncores)]
+    assert ncores % plan["nk"] == 0
+    # 10 irreducible kpoints: never more pools than kpoints
+    assert 1 < plan["nk"] <= 10
+    assert plan["postfix"][:2] == ["-nk", str(plan["nk"])]
+    assert "-nd" not in plan["postfix"]
+    assert plan_launch(si, ncores, valence, max_pools=1)["nk"] == 1
+
+
+def test_plan_diagonalization(si):
+    gamma = si.derive(system={"nbnd": 400})
+    gamma.k_points.option = "gamma"
+    plan = plan_launch(gamma, 64, valence, mpi_command=["srun", "-n", "{np}"])
+    assert plan["prefix"] == ["srun", "-n", "64"]
+    assert plan["nk"] == 1
+    assert plan["nd"] == 64
+    assert plan["postfix"][-2:] == ["-nd", "64"]
+
+
+def test_plan_errors(si):
+    with pytest.raises(Exception):
+        plan_launch(si, 0, valence)
+
+
+def test_launcher_command(si):
+    from pyqe.launch import Launcher
+
+    launcher = Launcher("pw.x", prefix=["nice"], postfix=["-ndiag", "1"])
+    assert launcher.command(si) == ["nice", "pw.x", "-ndiag", "1"]
+    assert launcher.command(si, "/tmp/si.in") == \
+        ["nice", "pw.x", "-i", "/tmp/si.in", "-ndiag", "1"]
+
+    planned = Launcher(["/opt/qe/bin/pw.x"], cores=2, mpi_command=["srun", "-n", "{np}"])
+    # plan_launch falls back when the pseudopotentials are missing
+    assert planned.command(si) == \
+        ["srun", "-n", "2", "/opt/qe/bin/pw.x", "-nk", "2", "-nt", "1"]
+
+
+def test_launcher_defaults_from_config(monkeypatch):
+    from pyqe import config
+    from pyqe.launch import Launcher
+
+    monkeypatch.setattr(config, "prefix", ["taskset", "-c", "0"])
+    monkeypatch.setattr(config, "card_space", " ")
+    launcher = Launcher()
+    assert launcher.prefix == ["taskset", "-c", "0"]
+    assert launcher.card_space == " "
+    # later config changes do not change existing launchers
+    monkeypatch.setattr(config, "prefix", [])
+    assert launcher.prefix == ["taskset", "-c", "0"]
+
+    with pytest.raises(Exception):
+        Launcher(cleanup="sometimes")
+
+
+def test_launcher_environment_and_render(si, monkeypatch):
+    from pyqe.launch import Launcher
+
+    monkeypatch.setenv("PYQE_TEST_INHERITED", "1")
+    assert Launcher().environment() is None
+    env = Launcher(env={"OMP_NUM_THREADS": "1"}).environment()
+    assert env["OMP_NUM_THREADS"] == "1"
+    assert env["PYQE_TEST_INHERITED"] == "1"
+
+    launcher = Launcher(namelist_space="  ", card_space="\t")
+    assert launcher.render(si) == si.to_string(True, "  ", "\t")
+    assert "\n  calculation = 'scf'" in launcher.render(si)
+
+
+def test_launcher_execute():
+    import sys
+    from pyqe.launch import Launcher
+
+    script = ("import os, sys; data = sys.stdin.read(); "
+              "sys.stdout.write(data.upper() + os.environ['PYQE_TEST']); "
+              "sys.stderr.write('warning'); sys.exit(3)")
+    launcher = Launcher(env={"PYQE_TEST": "!"})
+    execution = launcher.execute([sys.executable, "-c", script], b"input")
+    assert execution["status"] == "completed"
+    assert execution["returncode"] == 3
+    assert execution["stdout"] == b"INPUT!"
+    assert execution["stderr"] == b"warning"
+    assert execution["resources"]["wall time"] > 0.0
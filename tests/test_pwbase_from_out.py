@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+
+from pyqe.benchmark import data_dir
+from pyqe.io import read_out_file, read_in_string, pwbase_from_out
+
+
+def read_si_out():
+    with open(os.path.join(data_dir, "si.scf.out")) as f:
+        return read_out_file(f.read())
+
+
+def test_pwbase_from_out():
+    qe = pwbase_from_out(read_si_out())
+
+    assert qe.system.get_current_value("ibrav") == 0
+    assert qe.system.get_current_value("celldm", (1,)) == 10.2
+    assert qe.system.get_current_value("nat") == 2
+    assert qe.system.get_current_value("ecutwfc") == 18.0
+    assert qe.system.get_current_value("ecutrho") == 72.0
+    assert qe.system.get_current_value("nbnd") == 4
+    assert qe.electrons.get_current_value("conv_thr") == 1e-8
+    assert qe.control.get_current_value("pseudo_dir") == "."
+    assert qe.atomic_species.to_string().split() == \
+        ["ATOMIC_SPECIES", "Si", "28.086", "Si.pz-vbc.UPF"]
+
+    np.testing.assert_allclose(qe.get_cell(), 10.2 * np.array(
+        [[-0.5, 0.0, 0.5], [0.0, 0.5, 0.5], [-0.5, 0.5, 0.0]]))
+
+    # printed cartesian k-points converted to crystal coordinates
+    assert qe.k_points.option == "crystal"
+    assert qe.k_points.kpoints.shape == (10, 3)
+    np.testing.assert_allclose(qe.k_points.kpoints[1], [0.125, 0.125, 0.375])
+    np.testing.assert_allclose(qe.k_points.weights.sum(), 2.0)
+
+
+def test_pwbase_from_out_renders_valid_input():
+    qe = pwbase_from_out(read_si_out())
+    rebuilt = read_in_string(qe.to_string())
+    assert rebuilt.to_string() == qe.to_string()
@@ -0,0 +1,80 @@
+import gc
+import weakref
+
+import pytest
+
+from pyqe.espresso import PWBase
+from pyqe.io import read_in_string, read_in_file
+
+
+input_str = """
+ &CONTROL
+    calculation = 'relax'  ! comment with a / slash
+    Prefix = "si", pseudo_dir = './'
+ /
+ &system
+    ibrav = 2, celldm(1) = 10.26d0, nat = 2, ntyp = 1
+    ecutwfc = 2.0D1
+    nosym = .true.
+ /
+ &ELECTRONS
+    conv_thr = 1.0d-8
+ /
+ &IONS
+ /
+ATOMIC_SPECIES
+ Si 28.086 Si.pz-vbc.UPF
+ATOMIC_POSITIONS {alat}
+ Si 0.00 0.00 0.00 0 0 0
+ Si 0.25 0.25 0.25
+K_POINTS automatic
+ 4 4 4 1 1 1
+"""
+
+
+def test_read_in_string_values():
+    qe = read_in_string(input_str)
+    assert qe.control.get_current_value("calculation") == "relax"
+    assert qe.control.get_current_value("prefix") == "si"
+    assert qe.system.get_current_value("celldm", (1,)) == 10.26
+    assert qe.system.get_current_value("ecutwfc") == 20.0
+    assert qe.system.get_current_value("nosym") is True
+    assert qe.electrons.get_current_value("conv_thr") == 1e-8
+    assert qe.atomic_positions.option == "alat"
+    assert qe.atomic_positions.symbols == ["Si", "Si"]
+    assert qe.atomic_positions.if_pos.tolist() == [[False] * 3, [True] * 3]
+    assert qe.k_points.option == "automatic"
+    assert qe.k_points.config == [[4, 4, 4], [1, 1, 1]]
+
+
+def test_render_parse_round_trip(si, tmp_path):
+    rendered = si.to_string()
+    assert read_in_string(rendered).to_string() == rendered
+
+    filename = str(tmp_path / "pw.in")
+    si.to_file(filename)
+    assert read_in_file(filename).to_string() == rendered
+
+
+def test_read_in_string_errors():
+    with pytest.raises(Exception):
+        read_in_string(" &system\n  not_a_key = 1\n /\n")
+    with pytest.raises(Exception):
+        read_in_string(" &system\n  ecutwfc = 'abc'\n /\n")
+    with pytest.raises(Exception):
+        read_in_string(" &system\n  ibrav = 99\n /\n")
+    with pytest.raises(Exception):
+        read_in_string("OCCUPATIONS\n 1.0\n")
+
+
+def test_namelist_schema_does_not_keep_instances_alive():
+    first = PWBase()
+    reference = weakref.ref(first.control)
+    second = PWBase()
+    del first
+    gc.collect()
+    assert reference() is None
+
+    # default functions see the keypairs of their own namelist
+    second.control.add_keypairs({"calculation": "relax"})
+    assert PWBase().control.get_current_value("calculation") == "scf"
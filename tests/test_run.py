@@ -0,0 +1,139 @@
+import os
+import threading
+
+import pytest
+
+from pyqe import fakepw
+from pyqe.launch import Launcher, RunError
+
+
+def fake_launcher(fail=False, sleep=None, **kwargs):
+    return Launcher(executable=fakepw.command(sleep=sleep, fail=fail), **kwargs)
+
+
+def test_scratch_run_is_cleaned_up(si, tmp_path):
+    launcher = fake_launcher(scratch=str(tmp_path))
+    results = si.run(launcher=launcher)
+    assert results["calculation"]["total energy"] < 0.0
+    assert results["data-file"]
+    assert "workdir" not in results
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_scratch_run_retains_files(si, tmp_path):
+    launcher = fake_launcher(scratch=str(tmp_path), retain=["*.save/data-file.xml"])
+    results = si.run(launcher=launcher)
+    workdir = results["workdir"]
+    assert os.path.dirname(workdir) == str(tmp_path)
+    retained = [os.path.relpath(os.path.join(root, filename), workdir)
+                for root, dirnames, filenames in os.walk(workdir)
+                for filename in filenames]
+    assert retained == [os.path.join("si.save", "data-file.xml")]
+
+
+def test_scratch_input_is_derived(si, tmp_path):
+    si.control.add_keypairs({"pseudo_dir": "pseudo"})
+    launcher = fake_launcher(scratch=str(tmp_path), cwd="/data/runs")
+    workdir, qe = launcher.prepare(si)
+    assert os.path.dirname(workdir) == str(tmp_path)
+    assert qe.control.get_current_value("outdir") == workdir
+    assert qe.control.get_current_value("pseudo_dir") == "/data/runs/pseudo/"
+    assert si.control.get_current_value("outdir") == "./"
+
+
+def test_crash_raises_run_error(si, tmp_path):
+    launcher = fake_launcher(fail=True, scratch=str(tmp_path))
+    with pytest.raises(RunError) as error:
+        si.run(launcher=launcher)
+    error = error.value
+    assert error.returncode == 1
+    assert "too many bands are not converged" in error.crash
+    assert "c_bands" in error.stdout
+    assert error.command[-1] == "--fail"
+    # kept for inspection (cleanup on_success)
+    assert os.path.isfile(os.path.join(error.workdir, "CRASH"))
+    assert "CRASH" in str(error)
+
+    launcher = fake_launcher(fail=True, scratch=str(tmp_path), cleanup="always")
+    with pytest.raises(RunError) as error:
+        si.run(launcher=launcher)
+    assert error.value.workdir is None
+    assert len(os.listdir(str(tmp_path))) == 1
+
+
+def test_input_file_run(si, tmp_path):
+    infile = str(tmp_path / "si.in")
+    outfile = str(tmp_path / "si.out")
+    results = si.run(infile=infile, outfile=outfile,
+                     launcher=fake_launcher(scratch=str(tmp_path)))
+    with open(infile) as f:
+        assert "prefix = 'si'" in f.read()
+    with open(outfile) as f:
+        assert "JOB DONE" in f.read()
+    assert results["header"]["number atoms/cell"] == 2
+
+
+def test_concurrent_scratch_runs(si, tmp_path):
+    launcher = fake_launcher(scratch=str(tmp_path), retain=["*.save/data-file.xml"])
+    inputs = [si.derive(system={"ecutwfc": 20.0 + i}) for i in range(4)]
+    results = [None] * len(inputs)
+
+    def run(i):
+        results[i] = inputs[i].run(launcher=launcher)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(inputs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(result["workdir"] for result in results)) == len(inputs)
+    assert [result["header"]["kinetic-energy cutoff"] for result in results] == \
+        [20.0, 21.0, 22.0, 23.0]
+
+
+def test_timeout(si):
+    import time
+
+    launcher = fake_launcher(sleep=30, timeout=0.5, kill_grace=1.0)
+    start = time.time()
+    with pytest.raises(RunError) as error:
+        si.run(launcher=launcher)
+    assert time.time() - start < 10
+    assert "timed out after 0.5 seconds" in str(error.value)
+    assert error.value.returncode < 0
+
+
+def test_cancel(si):
+    cancel = threading.Event()
+    timer = threading.Timer(0.5, cancel.set)
+    timer.start()
+    try:
+        with pytest.raises(RunError) as error:
+            si.run(launcher=fake_launcher(sleep=30), cancel=cancel)
+    finally:
+        timer.cancel()
+    assert "cancelled" in str(error.value)
+
+
+def test_kill_after_grace():
+    import signal
+    import sys
+
+    script = ("import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+              "print('ready', flush=True); time.sleep(30)")
+    launcher = Launcher(timeout=0.5, kill_grace=0.5)
+    execution = launcher.execute([sys.executable, "-c", script])
+    assert execution["status"] == "timeout"
+    assert execution["returncode"] == -signal.SIGKILL
+    assert execution["stdout"] == b"ready\n"
+
+
+def test_resources(si, tmp_path):
+    launcher = Launcher(executable=fakepw.command(compute=0.5), cwd=str(tmp_path))
+    results = si.run(launcher=launcher)
+    resources = results["resources"]
+    assert resources["user time"] > 0.3
+    assert resources["wall time"] >= resources["user time"] * 0.5
+    assert resources["max rss"] > 1024 * 1024
+    assert results["time"] == resources["wall time"]
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+
+from pyqe.benchmark import data_dir
+from pyqe.io import read_out_file, read_out_scf_convergence
+
+
+def test_scf_convergence_of_pw_output():
+    with open(os.path.join(data_dir, "si.scf.out")) as f:
+        calculation = read_out_file(f.read())["calculation"]
+    convergence = calculation["scf convergence"]
+
+    assert convergence["iteration"].tolist() == [1, 2, 3, 4, 5]
+    np.testing.assert_allclose(convergence["energy"],
+                               [-15.79441848, -15.79698237, -15.79744108,
+                                -15.79746925, -15.79747179])
+    assert convergence["energy"][-1] == calculation["total energy"]
+    np.testing.assert_allclose(convergence["estimated scf accuracy"],
+                               [0.06376006, 0.00223911, 0.00007441, 0.00000429, 0.00000009])
+    np.testing.assert_allclose(convergence["ethr"], [1e-2, 7.97e-4, 2.8e-5, 9.3e-7, 5.36e-8])
+    np.testing.assert_allclose(convergence["beta"], 0.7)
+    np.testing.assert_allclose(convergence["cpu time"], [0.1, 0.1, 0.2, 0.2, 0.2])
+
+
+def test_missing_values_are_nan():
+    block = """
+     iteration #  1     ecut=    30.00 Ry     beta= 0.30
+     Davidson diagonalization with overlap
+     ethr =  1.00D-02,  avg # of iterations =  2.0
+
+     iteration #  2     ecut=    30.00 Ry     beta= 0.30
+     total energy              =     -10.5 Ry
+     estimated scf accuracy    <       1.0D-03 Ry
+"""
+    convergence = read_out_scf_convergence(block)
+    assert convergence["iteration"].tolist() == [1, 2]
+    assert np.isnan(convergence["energy"][0])
+    assert convergence["energy"][1] == -10.5
+    assert convergence["ethr"][0] == 1e-2
+    assert np.isnan(convergence["ethr"][1])
+    assert convergence["estimated scf accuracy"][1] == 1e-3
+    assert convergence["beta"].tolist() == [0.3, 0.3]
+
+
+def test_no_iterations():
+    convergence = read_out_scf_convergence("no scf here")
+    assert convergence["iteration"].shape == (0,)
+    assert convergence["energy"].shape == (0,)
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from pyqe.launch import Launcher
+from pyqe.sweep import Sweep
+
+
+def test_cartesian_sweep(si):
+    sweep = Sweep(si, {"system.ecutwfc": [20.0, 30.0], "electrons.mixing_beta": [0.3, 0.7]})
+    points = list(sweep)
+    assert len(sweep) == len(points) == 4
+    for point, qe in points:
+        assert qe.system.get_current_value("ecutwfc") == point["system.ecutwfc"]
+        assert qe.electrons.get_current_value("mixing_beta") == point["electrons.mixing_beta"]
+
+
+def test_zip_and_latin_hypercube(si):
+    sweep = Sweep(si, {"system.ecutwfc": [20.0, 30.0, 40.0], "system.nbnd": [8, 10, 12]}, "zip")
+    assert [point["system.nbnd"] for point in sweep.points()] == [8, 10, 12]
+
+    with pytest.raises(Exception):
+        Sweep(si, {"system.ecutwfc": [20.0], "system.nbnd": [8, 10]}, "zip")
+
+    sweep = Sweep(si, {"system.ecutwfc": [20.0, 25.0, 30.0, 35.0]}, "latin-hypercube",
+                  samples=4, seed=1)
+    assert sorted(point["system.ecutwfc"] for point in sweep.points()) == [20.0, 25.0, 30.0, 35.0]
+
+
+def test_sweep_renders_base_changes_after_construction(si):
+    sweep = Sweep(si, {"system.ecutwfc": [30.0]})
+    si.atomic_positions.set_positions(["Si", "Si"], [[0.0, 0.0, 0.0], [0.3, 0.3, 0.3]], "alat")
+    si.control.add_keypairs({"prefix": "changed"})
+
+    point, qe = next(iter(sweep))
+    rendered = sweep.to_string(qe)
+    assert "0.3" in rendered
+    assert "prefix = 'changed'" in rendered
+    assert rendered == qe.to_string()
+
+
+def test_sweep_uses_launcher_spacing(si, tmp_path):
+    sweep = Sweep(si, {"system.ecutwfc": [30.0]})
+    point, qe = next(iter(sweep))
+    assert sweep.to_string(qe, namelist_space="  ", card_space=" ") == \
+        qe.to_string(True, "  ", " ")
+
+    launcher = Launcher(namelist_space="    ", card_space="  ")
+    [[path, point]] = sweep.to_directory(str(tmp_path), launcher=launcher)
+    with open(path) as f:
+        assert f.read() == launcher.render(qe)
+    assert os.path.dirname(path) == os.path.join(str(tmp_path), "00000")
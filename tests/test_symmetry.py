@@ -0,0 +1,65 @@
+import numpy as np
+
+from pyqe.cards import KPoints
+from pyqe.lattice import space_group_operations, irreducible_monkhorst_pack
+
+
+fcc = 10.26 * np.array([[-0.5, 0.0, 0.5], [0.0, 0.5, 0.5], [-0.5, 0.5, 0.0]])
+diamond = [[0.0, 0.0, 0.0], [0.25, 0.25, 0.25]]
+
+
+def supercell(n):
+    index = np.indices((n, n, n)).reshape(3, -1).T
+    positions = [(index + position) / n for position in diamond]
+    return n * fcc, np.concatenate(positions)
+
+
+def test_space_group_operations():
+    rotations, translations = space_group_operations(fcc, diamond, [14, 14])
+    assert len(rotations) == 48
+    # zincblende loses inversion
+    rotations, translations = space_group_operations(fcc, diamond, [31, 33])
+    assert len(rotations) == 24
+    assert np.allclose(translations, 0.0)
+    # a third (displaced) atom breaks all symmetry
+    rotations, translations = space_group_operations(
+        fcc, diamond + [[0.6, 0.55, 0.1]], [14, 14, 8])
+    assert np.array_equal(rotations, [np.identity(3)])
+
+
+def test_space_group_operations_of_large_cell():
+    cell, positions = supercell(8)
+    rotations, translations = space_group_operations(cell, positions, np.full(len(positions), 14))
+    assert len(positions) == 1024
+    assert len(rotations) == 48
+
+    # the operations map the crystal onto itself
+    for rotation, translation in zip(rotations[:4], translations[:4]):
+        moved = np.dot(positions, rotation.T) + translation
+        order = np.lexsort(np.round(np.mod(moved, 1.0) * 16).T % 16)
+        reference = np.lexsort(np.round(np.mod(positions, 1.0) * 16).T % 16)
+        diff = moved[order] - positions[reference]
+        assert np.allclose(diff - np.round(diff), 0.0)
+
+
+def test_irreducible_monkhorst_pack():
+    kpoints, weights = irreducible_monkhorst_pack([4, 4, 4], [0, 0, 0], fcc, diamond, [14, 14])
+    assert len(kpoints) == 8
+    assert np.isclose(weights.sum(), 1.0)
+
+    kpoints, weights = irreducible_monkhorst_pack([4, 4, 4], [1, 1, 1], fcc, diamond, [14, 14])
+    assert len(kpoints) == 10
+
+    kpoints, weights = irreducible_monkhorst_pack([4, 4, 4], [0, 0, 0], fcc, diamond, [14, 14],
+                                                  symmetry=False)
+    assert len(kpoints) == 36
+
+
+def test_from_irreducible_monkhorst_pack(si):
+    kpoints = KPoints()
+    kpoints.from_irreducible_monkhorst_pack([4, 4, 4], [1, 1, 1], si.get_cell(),
+                                            si.atomic_positions, alat=10.26)
+    assert kpoints.option == "crystal"
+    assert len(kpoints.kpoints) == 10
+    assert sorted(np.round(kpoints.weights * 32).astype(int).tolist()) == \
+        [1, 1, 3, 3, 3, 3, 3, 3, 6, 6]
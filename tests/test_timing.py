@@ -0,0 +1,58 @@
+import os
+
+from pyqe.benchmark import data_dir
+from pyqe.io import read_out_file, read_out_footer, aggregate_timings, qe_time
+
+
+footer = """
+     init_run     :      0.05s CPU      0.05s WALL (       1 calls)
+     electrons    :   1h 2m CPU   1h 3m WALL (       1 calls)
+
+     Called by electrons:
+     c_bands      :      0.07s CPU      0.08s WALL (       5 calls)
+
+     Called by *egterg:
+     h_psi        :      0.05s CPU      0.05s WALL (     162 calls)
+
+     Called by *cgcg:
+     h_psi        :      1.50s CPU      1.60s WALL (      40 calls)
+
+     General routines
+     fftw         :      0.04s CPU      0.04s WALL (    2284 calls)
+
+     PWSCF        :   1h 2m CPU   1h 3m WALL
+"""
+
+
+def test_qe_time():
+    assert qe_time("0.15s") == 0.15
+    assert qe_time("2m 3.45s") == 123.45
+    assert qe_time("1h23m") == 4980.0
+
+
+def test_read_out_footer_keeps_repeated_routines():
+    timing = read_out_footer(footer)
+    assert [entry["caller"] for entry in timing["h_psi"]] == ["*egterg", "*cgcg"]
+    assert [entry["calls"] for entry in timing["h_psi"]] == [162, 40]
+    assert timing["electrons"] == [{"cpu": 3720.0, "wall": 3780.0, "calls": 1, "caller": None}]
+    assert timing["c_bands"][0]["caller"] == "electrons"
+    assert timing["fftw"][0]["caller"] is None
+    assert timing["PWSCF"][0]["calls"] == 1
+
+
+def test_timing_of_pw_output():
+    with open(os.path.join(data_dir, "si.scf.out")) as f:
+        timing = read_out_file(f.read())["timing"]
+    assert timing["PWSCF"] == [{"cpu": 0.2, "wall": 0.22, "calls": 1, "caller": None}]
+    assert timing["cegterg"][0] == {"cpu": 0.06, "wall": 0.07, "calls": 50, "caller": "c_bands"}
+    assert timing["h_psi:vloc"][0]["caller"] == "h_psi"
+    assert timing["fft_scatter"][0]["calls"] == 2306
+    assert all(len(entries) == 1 for entries in timing.values())
+
+
+def test_aggregate_timings():
+    total = aggregate_timings([read_out_footer(footer)] * 3)
+    assert [entry["caller"] for entry in total["h_psi"]] == ["*egterg", "*cgcg"]
+    assert total["h_psi"][1]["calls"] == 120
+    assert total["h_psi"][1]["runs"] == 3
+    assert abs(total["PWSCF"][0]["wall"] - 3 * 3780.0) < 1e-9
@@ -0,0 +1,82 @@
+import json
+import threading
+
+import pytest
+
+from pyqe import fakepw
+from pyqe.launch import Launcher
+from pyqe.trace import Tracer, span, count
+
+
+def test_spans_counters_and_summary():
+    finished = []
+    tracer = Tracer(callbacks=[finished.append])
+    with tracer.span("parse", nbytes=10) as args:
+        args["lines"] = 2
+    with pytest.raises(ValueError):
+        with tracer.span("parse"):
+            raise ValueError
+    tracer.count("bytes", 10)
+    tracer.count("bytes", 5)
+
+    assert [record["name"] for record in finished] == ["parse", "parse"]
+    assert finished[0]["args"] == {"nbytes": 10, "lines": 2}
+    assert tracer.counters == {"bytes": 15}
+    summary = tracer.summary()["parse"]
+    assert summary["count"] == 2
+    assert summary["max"] <= summary["total"]
+
+
+def test_helpers_without_tracer():
+    with span(None, "anything", value=1) as args:
+        assert args == {}
+    count(None, "bytes", 10)
+
+
+def test_threads():
+    tracer = Tracer()
+
+    def work():
+        for i in range(100):
+            with tracer.span("work"):
+                tracer.count("items")
+
+    threads = [threading.Thread(target=work) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(tracer.spans) == 400
+    assert tracer.counters["items"] == 400
+    assert len(set(record["thread"] for record in tracer.spans)) > 1
+
+
+def test_write(tmp_path):
+    tracer = Tracer()
+    with tracer.span("render input"):
+        tracer.count("bytes", 3)
+
+    filename = str(tmp_path / "trace.json")
+    tracer.write(filename)
+    with open(filename) as f:
+        events = json.load(f)["traceEvents"]
+    assert [event["ph"] for event in events] == ["X", "C"]
+    assert events[1]["args"] == {"bytes": 3}
+
+    tracer.write(filename, "json")
+    with open(filename) as f:
+        assert json.load(f)["summary"]["render input"]["count"] == 1
+    with pytest.raises(Exception):
+        tracer.write(filename, "xml")
+
+
+def test_run_is_traced(si, tmp_path):
+    tracer = Tracer()
+    si.run(launcher=Launcher(executable=fakepw.command(), cwd=str(tmp_path), tracer=tracer))
+    names = [record["name"] for record in tracer.spans]
+    for name in ("prepare", "render input", "pw.x", "read_out_file", "read_out_header",
+                 "read_out_footer", "read_data_file", "cleanup"):
+        assert name in names
+    pw = tracer.spans[names.index("pw.x")]
+    assert pw["args"]["command"].startswith(fakepw.command()[0])
+    assert tracer.counters["bytes stdout"] == tracer.counters["bytes parsed"]